@@ -0,0 +1,46 @@
+"""
+Times the determination of symmetry, completeness, ties and balancedness of a pair of discretised matchings,
+with the original checks on preference lists against `compute_features_vectorised`.
+
+Usage: python benchmarks/features.py [columns_per_side]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from matching_hub.stable_marriage_helper import (
+	build_preference_lists, check_has_ties, check_is_balanced, check_is_complete, check_is_symmetric, compute_features_vectorised
+)
+
+def original_features(matches, flip_input_matches):
+	pref_of_source, infer_pref_of_target = build_preference_lists(matches)
+	pref_of_target, infer_pref_of_source = build_preference_lists(flip_input_matches)
+	return (
+		check_is_symmetric(pref_of_source, infer_pref_of_source, pref_of_target, infer_pref_of_target),
+		check_is_complete(pref_of_source, pref_of_target),
+		check_has_ties(pref_of_source) or check_has_ties(pref_of_target),
+		check_is_balanced(pref_of_source, pref_of_target)
+	)
+
+def main(columns):
+	rng = random.Random(0)
+	# complete matchings with levels as found after discretisation, and the symmetric flipped matchings
+	matches = {(("source", f"s{i}"), ("target", f"t{j}")): rng.randint(1, 10) for i in range(columns) for j in range(columns)}
+	flip_input_matches = {(target, source): level for (source, target), level in matches.items()}
+
+	start = time.perf_counter()
+	expected = tuple(map(bool, original_features(matches, flip_input_matches)))
+	before = time.perf_counter() - start
+
+	start = time.perf_counter()
+	actual = compute_features_vectorised(matches, flip_input_matches)
+	after = time.perf_counter() - start
+
+	assert actual == expected
+	print(f"{len(matches)} entries: {before:.2f} s -> {after:.2f} s")
+
+if __name__ == "__main__":
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 150)
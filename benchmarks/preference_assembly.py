@@ -0,0 +1,56 @@
+"""
+Times assembling the pairs, men and women of the stable marriage problem from matchings with the current functions of
+`database_side` against their original implementations of the quantum_love excerpt. Both must assemble the same result.
+
+Usage: python benchmarks/preference_assembly.py
+"""
+import os
+import random
+import sys
+import time
+
+root_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(root_path, "src"))
+sys.path.insert(0, os.path.join(root_path, "tests"))
+
+import pandas as pd
+
+import quantum_love_original
+from matching_hub.quantum_love import database_side
+
+replaced_functions = ("add_preferences", "cleanup_preferences", "get_possible_pairs_as_tuples")
+
+def random_scenario(rng, columns):
+	# complete matchings of both directions, with probabilities discretised into levels
+	sources = [f"s{i}" for i in range(columns)]
+	targets = [f"t{j}" for j in range(columns)]
+	matches = {}
+	for source in sources:
+		for target in targets:
+			matches[(("source", source), ("target", target))] = rng.randint(1, 20)
+			matches[(("target", target), ("source", source))] = rng.randint(1, 20)
+	return matches, pd.DataFrame(columns=sources), pd.DataFrame(columns=targets)
+
+def assemble(scenario, functions):
+	current_functions = {name: getattr(database_side, name) for name in replaced_functions}
+	for name in replaced_functions:
+		setattr(database_side, name, getattr(functions, name))
+	try:
+		start = time.perf_counter()
+		result = database_side.get_pairs_and_men_and_women_with_preferences(*scenario)
+		return repr(result), time.perf_counter() - start
+	finally:
+		for name, function in current_functions.items():
+			setattr(database_side, name, function)
+
+def main():
+	rng = random.Random(0)
+	for columns in (40, 60, 80):
+		scenario = random_scenario(rng, columns)
+		expected, before = assemble(scenario, quantum_love_original)
+		actual, after = assemble(scenario, database_side)
+		assert actual == expected
+		print(f"{columns} columns per side: {before:.3f} s -> {after:.3f} s")
+
+if __name__ == "__main__":
+	main()
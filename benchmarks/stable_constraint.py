@@ -0,0 +1,68 @@
+"""
+Times building the stable constraint of the stable marriage QUBO with `compute_stable_constraint` against the original
+implementation of the quantum_love excerpt, on random instances with ties and asymmetric preferences.
+Both must produce the same model.
+
+Usage: python benchmarks/stable_constraint.py [number_of_instances]
+"""
+import os
+import random
+import sys
+import time
+
+root_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(root_path, "src"))
+sys.path.insert(0, os.path.join(root_path, "tests"))
+
+import pandas as pd
+from docplex.mp.model import Model
+
+import quantum_love_original
+from matching_hub.quantum_love import database_side, docplex_quantum_side
+
+def random_instance(rng, columns):
+	sources = [f"s{i}" for i in range(columns)]
+	targets = [f"t{j}" for j in range(columns)]
+	levels = rng.choice([2, 3, 10])
+	matches = {}
+	for source in sources:
+		for target in targets:
+			matches[(("source", source), ("target", target))] = rng.randint(1, levels)
+			matches[(("target", target), ("source", source))] = rng.randint(1, levels)
+	possible_pairs, _, _ = database_side.get_pairs_and_men_and_women_with_preferences(matches, pd.DataFrame(columns=sources), pd.DataFrame(columns=targets))
+	return possible_pairs
+
+def build_stable_constraint(possible_pairs, compute_stable_constraint):
+	# the variables and the arguments as set up by `setup_docplex_model`
+	model = Model("Stable Marriage Problem")
+	pairs = model.binary_var_list([(x[0][0], x[1][0]) for x in possible_pairs], 0, 1, "")
+	possible_men = []
+	possible_women = []
+	for pair, (man, woman) in zip(pairs, possible_pairs):
+		pair.m = man
+		pair.w = woman
+		if man[0] not in (possible_man[0] for possible_man in possible_men):
+			possible_men.append(man)
+		if woman[0] not in (possible_woman[0] for possible_woman in possible_women):
+			possible_women.append(woman)
+	start = time.perf_counter()
+	stable_constraint = compute_stable_constraint(min(len(possible_men), len(possible_women)), pairs, possible_men, possible_women)
+	elapsed = time.perf_counter() - start
+	model.minimize(stable_constraint)
+	return model.export_as_lp_string(), elapsed
+
+def main(number_of_instances):
+	rng = random.Random(0)
+	for columns in (4, 8, 12):
+		before = after = 0
+		for _ in range(number_of_instances):
+			possible_pairs = random_instance(rng, columns)
+			expected, elapsed_before = build_stable_constraint(possible_pairs, quantum_love_original.compute_stable_constraint)
+			actual, elapsed_after = build_stable_constraint(possible_pairs, docplex_quantum_side.compute_stable_constraint)
+			assert actual == expected
+			before += elapsed_before
+			after += elapsed_after
+		print(f"{columns} columns per side, {number_of_instances} instances: {before:.2f} s -> {after:.2f} s")
+
+if __name__ == "__main__":
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
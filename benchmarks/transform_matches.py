@@ -0,0 +1,53 @@
+"""
+Times the conversion of ground-truth matrices of Schematch scenarios into matches, against the former cell-by-cell iteration.
+Both must produce the same matches, in the same order.
+
+Usage: python benchmarks/transform_matches.py
+"""
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from schema_matching_scenarios.scenario_catalogue import _ScenarioLoader
+
+def transform_matches_with_iterrows(ground_truth_matrix, source_table_name, source_headers, target_table_name, target_headers):
+	matches = []
+
+	for i, row in ground_truth_matrix.iterrows():
+		for j, value in row.items():
+			if value == 1:
+				match = {
+					"source_table": source_table_name,
+					"source_column": source_headers[i],
+					"target_table": target_table_name,
+					"target_column": target_headers[j]
+				}
+				matches.append(match)
+
+	return {"matches": matches}
+
+def random_ground_truth(rng, rows, columns):
+	# one match per source column, as read from the ground-truth csv files, i.e. without headers
+	matrix = np.zeros((rows, columns), dtype=int)
+	matrix[np.arange(rows), rng.integers(0, columns, rows)] = 1
+	return pd.DataFrame(matrix)
+
+def main():
+	rng = np.random.default_rng(0)
+	for rows, columns in [(5, 4), (60, 80), (300, 250)]:
+		ground_truth = random_ground_truth(rng, rows, columns)
+		arguments = (ground_truth, "source", [f"s{i}" for i in range(rows)], "target", [f"t{j}" for j in range(columns)])
+		assert _ScenarioLoader._transform_matches(*arguments) == transform_matches_with_iterrows(*arguments)
+
+		repeats = 20
+		before = timeit.timeit(lambda: transform_matches_with_iterrows(*arguments), number=repeats) / repeats
+		after = timeit.timeit(lambda: _ScenarioLoader._transform_matches(*arguments), number=repeats) / repeats
+		print(f"{rows}x{columns}: {before * 1000:.2f} ms -> {after * 1000:.2f} ms")
+
+if __name__ == "__main__":
+	main()
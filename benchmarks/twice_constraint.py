@@ -0,0 +1,59 @@
+"""
+Times building the twice constraint of the stable marriage QUBO with `compute_twice_constraint` against the original
+implementation of the quantum_love excerpt, on synthetic instances with incomplete preference lists and ties (ILT).
+Both must produce the same model.
+
+Usage: python benchmarks/twice_constraint.py
+"""
+import os
+import random
+import sys
+import time
+
+root_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(root_path, "src"))
+sys.path.insert(0, os.path.join(root_path, "tests"))
+
+import pandas as pd
+from docplex.mp.model import Model
+
+import quantum_love_original
+from matching_hub.quantum_love import database_side, docplex_quantum_side
+
+def random_ilt_instance(rng, columns, density):
+	# each column ranks a random part of the other side with few levels, and the other side ranks it back
+	sources = [f"s{i}" for i in range(columns)]
+	targets = [f"t{j}" for j in range(columns)]
+	matches = {}
+	for source in sources:
+		for target in targets:
+			if rng.random() < density:
+				matches[(("source", source), ("target", target))] = rng.randint(1, 3)
+				matches[(("target", target), ("source", source))] = rng.randint(1, 3)
+	possible_pairs, _, _ = database_side.get_pairs_and_men_and_women_with_preferences(matches, pd.DataFrame(columns=sources), pd.DataFrame(columns=targets))
+	return possible_pairs
+
+def build_twice_constraint(possible_pairs, compute_twice_constraint):
+	# the variables as set up by `setup_docplex_model`
+	model = Model("Stable Marriage Problem")
+	pairs = model.binary_var_list([(x[0][0], x[1][0]) for x in possible_pairs], 0, 1, "")
+	for pair, (man, woman) in zip(pairs, possible_pairs):
+		pair.m = man
+		pair.w = woman
+	start = time.perf_counter()
+	twice_constraint = compute_twice_constraint(1, pairs)
+	elapsed = time.perf_counter() - start
+	model.minimize(twice_constraint)
+	return model.export_as_lp_string(), elapsed
+
+def main():
+	rng = random.Random(0)
+	for columns, density in ((20, 0.47), (30, 0.48), (34, 0.49)):
+		possible_pairs = random_ilt_instance(rng, columns, density)
+		expected, before = build_twice_constraint(possible_pairs, quantum_love_original.compute_twice_constraint)
+		actual, after = build_twice_constraint(possible_pairs, docplex_quantum_side.compute_twice_constraint)
+		assert actual == expected
+		print(f"{len(possible_pairs)} variables: {before:.2f} s -> {after:.2f} s")
+
+if __name__ == "__main__":
+	main()
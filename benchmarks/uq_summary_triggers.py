@@ -0,0 +1,59 @@
+"""
+Times the triggers maintaining uq_summary while matchings are inserted, as by run, and while their hashes are set, as by compute-hash.
+
+Usage: python benchmarks/uq_summary_triggers.py [number_of_matchings]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from sqlalchemy import text
+from matching_hub.db_setup import init_db, sqlite_engine_builder
+
+def main(number_of_matchings):
+	random.seed(0)
+	with tempfile.TemporaryDirectory() as folder_path:
+		engine = init_db(sqlite_engine_builder(os.path.join(folder_path, "benchmark.mt")))
+		algorithm_ids = [str(uuid.uuid4()) for _ in range(20)]
+		dataset_ids = [str(uuid.uuid4()) for _ in range(number_of_matchings // len(algorithm_ids) + 1)]
+		with engine.begin() as connection:
+			for k, algorithm_id in enumerate(algorithm_ids):
+				connection.execute(text("INSERT INTO algorithm (id, name, parameters) VALUES (:id, :name, '{}')"), {"id": algorithm_id, "name": f"algorithm_{k}"})
+			for k, dataset_id in enumerate(dataset_ids):
+				connection.execute(
+					text("INSERT INTO dataset (id, name, ground_truth_size, source_column_count, target_column_count, matching_type) VALUES (:id, :name, 1, 2, 2, 'Unionable')"),
+					{"id": dataset_id, "name": f"dataset_{k}"}
+				)
+
+		matching_ids = [str(uuid.uuid4()) for _ in range(number_of_matchings)]
+		# matchings are inserted without hashes, one transaction each
+		start = time.perf_counter()
+		for k, matching_id in enumerate(matching_ids):
+			with engine.begin() as connection:
+				connection.execute(
+					text("INSERT INTO matching (id, algorithm_id, dataset_id, len_matchings, len_flip_input_matchings) VALUES (:id, :algorithm_id, :dataset_id, :len, :len)"),
+					{"id": matching_id, "algorithm_id": algorithm_ids[k % len(algorithm_ids)], "dataset_id": dataset_ids[k // len(algorithm_ids)], "len": random.randint(1, 20)}
+				)
+		print(f"{number_of_matchings} inserts: {time.perf_counter() - start:.2f}s")
+
+		# about one matching in four shares its hashes with another one
+		start = time.perf_counter()
+		for matching_id in matching_ids:
+			hash_value = str(random.randrange(number_of_matchings * 3 // 4))
+			with engine.begin() as connection:
+				connection.execute(
+					text("UPDATE matching SET hash_matchings_lev = :hash, hash_flip_input_matchings_lev = :hash WHERE id = :id"),
+					{"id": matching_id, "hash": hash_value}
+				)
+		print(f"{number_of_matchings} hash updates: {time.perf_counter() - start:.2f}s")
+
+		with engine.connect() as connection:
+			print(f"uq_summary rows: {connection.execute(text('SELECT COUNT(*) FROM uq_summary')).scalar()}")
+
+if __name__ == "__main__":
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 8000)
@@ -1,45 +1,168 @@
-from sqlalchemy import create_engine, text, inspect
+from sqlalchemy import create_engine, text, inspect, event
 from sqlalchemy.orm import sessionmaker
-from .models import Base
+from sqlalchemy.schema import CreateIndex
+from .models import Base, Matching
 
-def sqlite_engine_builder(db_name):
-	return lambda: create_engine(f'sqlite:///{db_name}')
+tuned_pragmas = {
+	"journal_mode": "WAL",
+	"synchronous": "NORMAL",
+	"mmap_size": 268435456, # 256 MiB
+	"cache_size": -65536, # 64 MiB
+	"temp_store": "MEMORY",
+	"busy_timeout": 30000 # milliseconds
+}
+
+def sqlite_engine_builder(db_name, tuned=False):
+	def __build():
+		engine = create_engine(f'sqlite:///{db_name}')
+		if tuned:
+			@event.listens_for(engine, "connect")
+			def __set_pragmas(dbapi_connection, connection_record):
+				cursor = dbapi_connection.cursor()
+				for pragma, value in tuned_pragmas.items():
+					cursor.execute(f"PRAGMA {pragma} = {value}")
+				cursor.close()
+		return engine
+	return __build
 
 def init_db(engine_builder):
 	engine = engine_builder()
+	__drop_uq_summary_view(engine)
+	is_uq_summary_new = 'uq_summary' not in inspect(engine).get_table_names()
 	Base.metadata.create_all(engine)
+	__add_missing_columns(engine)
+	__create_indexes(engine)
 	__create_summary_view(engine)
-	__drop_uq_summary_table(engine)
-	__create_uq_summary_view(engine)
+	__create_uq_summary_triggers(engine)
+	__create_ground_truth_trigger(engine)
+	if is_uq_summary_new:
+		__populate_uq_summary(engine)
 	return engine
 
 def get_session(engine):
 	Session = sessionmaker(bind=engine)
 	return Session()
 
-def __drop_uq_summary_table(engine):
-	inspector = inspect(engine)
-	views = inspector.get_view_names()
-	if 'uq_summary' not in views:
-		sql = """
-			DROP TABLE IF EXISTS uq_summary;
-		"""
-		with engine.connect() as connection:
-			connection.execute(text(sql))
-
-def __create_uq_summary_view(engine):
-	create_view_sql = """
-		CREATE VIEW IF NOT EXISTS uq_summary AS
-			SELECT *
-			FROM (
-				SELECT *, ROW_NUMBER() OVER (PARTITION BY hash_matchings_lev, hash_flip_input_matchings_lev ORDER BY len_matchings DESC) AS row_num
-				FROM summary
-				WHERE len_matchings > 0 and len_flip_input_matchings > 0
-			)
-			WHERE row_num = 1
+def __add_missing_columns(engine):
+	# create_all does not alter existing tables, so columns added to the models are added to session files created beforehand
+	# the inspector uses the same connection, so that the pool does not end up with a second one
+	with engine.begin() as connection:
+		inspector = inspect(connection)
+		for table in Base.metadata.sorted_tables:
+			existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+			for column in table.columns:
+				if column.name not in existing_columns:
+					column_type = column.type.compile(dialect=engine.dialect)
+					connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+def __create_indexes(engine):
+	# create_all only creates indexes along with new tables, so indexes are also added to session files created beforehand
+	with engine.begin() as connection:
+		for index in Matching.__table__.indexes:
+			connection.execute(CreateIndex(index, if_not_exists=True))
+
+def __drop_uq_summary_view(engine):
+	# uq_summary used to be a view over summary. it is replaced by a table maintained by triggers
+	if 'uq_summary' in inspect(engine).get_view_names():
+		with engine.begin() as connection:
+			connection.execute(text("DROP VIEW uq_summary"))
+
+uq_summary_columns = """
+	id, algorithm_id, dataset_id, hash_matchings_lev, hash_flip_input_matchings_lev,
+	len_matchings, len_flip_input_matchings, is_symmetric, is_balanced, is_complete, has_ties
+"""
+
+def __qualifies_for_uq_summary(row):
+	# a matching qualifies as in the summary view, i.e. its algorithm and scenario exist, and both of its directions have matches.
+	# matchings without hashes are not grouped
+	return f"""
+		{row}.len_matchings > 0 AND {row}.len_flip_input_matchings > 0
+		AND {row}.hash_matchings_lev IS NOT NULL AND {row}.hash_flip_input_matchings_lev IS NOT NULL
+		AND EXISTS (SELECT 1 FROM dataset WHERE id = {row}.dataset_id)
+		AND EXISTS (SELECT 1 FROM algorithm WHERE id = {row}.algorithm_id)
 	"""
-	with engine.connect() as connection:
-		connection.execute(text(create_view_sql))
+
+def __in_uq_summary_group(table, row):
+	return f"{table}.hash_matchings_lev = {row}.hash_matchings_lev AND {table}.hash_flip_input_matchings_lev = {row}.hash_flip_input_matchings_lev"
+
+def __has_uq_summary_representative(row):
+	return f"EXISTS (SELECT 1 FROM uq_summary AS uq WHERE {__in_uq_summary_group('uq', row)})"
+
+def __select_uq_summary_candidates(condition):
+	return f"""
+		SELECT {", ".join(f"m.{column.strip()}" for column in uq_summary_columns.split(","))}
+		FROM matching AS m
+		WHERE {__qualifies_for_uq_summary('m')} AND {condition}
+	"""
+
+def __add_to_uq_summary_group(row):
+	# the representative of a group of matchings with equal hashes is the one with most matches, the earliest id among equals.
+	# a qualifying row is only compared against the current representative of its group, which replaces it if it has fewer matches
+	is_better = f"(uq_summary.len_matchings < {row}.len_matchings OR (uq_summary.len_matchings = {row}.len_matchings AND uq_summary.id > {row}.id))"
+	return f"""
+		DELETE FROM uq_summary
+		WHERE {__in_uq_summary_group('uq_summary', row)} AND {is_better} AND {__qualifies_for_uq_summary(row)};
+		INSERT INTO uq_summary ({uq_summary_columns})
+		SELECT {", ".join(f"{row}.{column.strip()}" for column in uq_summary_columns.split(","))}
+		WHERE {__qualifies_for_uq_summary(row)} AND NOT {__has_uq_summary_representative(row)};
+	"""
+
+def __remove_from_uq_summary_group(row, keeps_representative="0"):
+	# only a representative which leaves its group or loses matches makes the group be scanned for the next one.
+	# a qualifying row whose group has no representative once its own row is removed was the representative
+	return f"""
+		DELETE FROM uq_summary WHERE id = {row}.id;
+		INSERT INTO uq_summary ({uq_summary_columns})
+		{__select_uq_summary_candidates(__in_uq_summary_group('m', row))}
+		AND {__qualifies_for_uq_summary(row)} AND NOT {__has_uq_summary_representative(row)} AND NOT ({keeps_representative})
+		ORDER BY m.len_matchings DESC, m.id
+		LIMIT 1;
+	"""
+
+def __fill_uq_summary():
+	# adds the representatives of all groups without one
+	return f"""
+		INSERT INTO uq_summary ({uq_summary_columns})
+		SELECT {uq_summary_columns}
+		FROM (
+			SELECT *, ROW_NUMBER() OVER (PARTITION BY hash_matchings_lev, hash_flip_input_matchings_lev ORDER BY len_matchings DESC, id) AS row_num
+			FROM ({__select_uq_summary_candidates(f"NOT {__has_uq_summary_representative('m')}")})
+		)
+		WHERE row_num = 1;
+	"""
+
+def __create_uq_summary_triggers(engine):
+	updated_columns = """
+		algorithm_id, dataset_id, len_matchings, len_flip_input_matchings, hash_matchings_lev, hash_flip_input_matchings_lev,
+		is_symmetric, is_balanced, is_complete, has_ties
+	"""
+	# a representative which stays in its group without losing matches is replaced by its updated row, without scanning the group
+	keeps_representative = f"{__in_uq_summary_group('NEW', 'OLD')} AND NEW.len_matchings >= OLD.len_matchings AND {__qualifies_for_uq_summary('NEW')}"
+	triggers = {
+		"uq_summary_matching_insert": f"AFTER INSERT ON matching BEGIN {__add_to_uq_summary_group('NEW')} END",
+		"uq_summary_matching_update": f"AFTER UPDATE OF {updated_columns} ON matching BEGIN {__remove_from_uq_summary_group('OLD', keeps_representative)} {__add_to_uq_summary_group('NEW')} END",
+		"uq_summary_matching_delete": f"AFTER DELETE ON matching BEGIN {__remove_from_uq_summary_group('OLD')} END",
+		"uq_summary_dataset_delete": f"AFTER DELETE ON dataset BEGIN DELETE FROM uq_summary WHERE dataset_id = OLD.id; {__fill_uq_summary()} END",
+		"uq_summary_algorithm_delete": f"AFTER DELETE ON algorithm BEGIN DELETE FROM uq_summary WHERE algorithm_id = OLD.id; {__fill_uq_summary()} END"
+	}
+	# the triggers are replaced, so that session files created beforehand get their current definitions
+	with engine.begin() as connection:
+		for name, body in triggers.items():
+			connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+			connection.execute(text(f"CREATE TRIGGER {name} {body}"))
+		# matchings without hashes used to form a group too
+		connection.execute(text("DELETE FROM uq_summary WHERE hash_matchings_lev IS NULL OR hash_flip_input_matchings_lev IS NULL"))
+
+def __create_ground_truth_trigger(engine):
+	# the cached ground truth of a scenario is deleted along with it, however the scenario is deleted
+	with engine.begin() as connection:
+		connection.execute(text("CREATE TRIGGER IF NOT EXISTS ground_truth_dataset_delete AFTER DELETE ON dataset BEGIN DELETE FROM ground_truth WHERE dataset_id = OLD.id; END"))
+		# ground truths left behind by scenarios deleted before the trigger existed
+		connection.execute(text("DELETE FROM ground_truth WHERE dataset_id NOT IN (SELECT id FROM dataset)"))
+
+def __populate_uq_summary(engine):
+	with engine.begin() as connection:
+		connection.execute(text(__fill_uq_summary()))
 
 def __create_summary_view(engine):
 	create_view_sql = """
@@ -3,8 +3,11 @@ import sys
 import json
 import signal
 import time
+import struct
+import hashlib
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from rich.table import Table
-from deepdiff import DeepHash
 
 class TimeoutException(Exception):
 	pass
@@ -58,6 +61,77 @@ def json_to_dict_with_tuples(json_string):
 	ret = {eval(k): v for k, v in loaded_dict.items()}
 	return ret
 
+matchings_encoding_magic = b"MHM\x01"
+
+def encode_matchings(matchings):
+	"""
+	Encodes a dictionary of matchings, keyed by ((source table, source column), (target table, target column)) tuples,
+	into a compact binary form: a table of interned names, an int32 array of name indices per key, and a float64 or int64 array of values.
+	Returns None if the dictionary cannot be represented this way, e.g. because of non-string names or mixed value types.
+	"""
+	names = {}
+	indices = []
+	for key in matchings:
+		try:
+			(source_table, source_column), (target_table, target_column) = key
+		except (TypeError, ValueError):
+			return None
+		for name in (source_table, source_column, target_table, target_column):
+			if type(name) is not str:
+				return None
+			indices.append(names.setdefault(name, len(names)))
+
+	values = list(matchings.values())
+	if all(type(v) is int for v in values):
+		kind, dtype = b"i", "<i8"
+	elif all(isinstance(v, float) for v in values):
+		kind, dtype = b"f", "<f8"
+	else:
+		return None
+
+	try:
+		encoded_values = np.array(values, dtype=dtype).tobytes()
+	except OverflowError:
+		return None
+	encoded_names = [name.encode("utf-8") for name in names]
+	return b"".join([
+		matchings_encoding_magic,
+		kind,
+		struct.pack("<II", len(encoded_names), len(values)),
+		np.array([len(name) for name in encoded_names], dtype="<i4").tobytes(),
+		b"".join(encoded_names),
+		np.array(indices, dtype="<i4").tobytes(),
+		encoded_values
+	])
+
+def decode_matchings(data):
+	"""
+	Decodes a dictionary of matchings encoded by `encode_matchings`.
+	"""
+	data = bytes(data)
+	if not data.startswith(matchings_encoding_magic):
+		raise ValueError("Unknown encoding of matchings.")
+	offset = len(matchings_encoding_magic)
+	dtype = "<i8" if data[offset:offset + 1] == b"i" else "<f8"
+	number_of_names, number_of_matchings = struct.unpack_from("<II", data, offset + 1)
+	offset += 9
+
+	lengths = np.frombuffer(data, dtype="<i4", count=number_of_names, offset=offset).tolist()
+	offset += 4 * number_of_names
+	names = []
+	for length in lengths:
+		names.append(data[offset:offset + length].decode("utf-8"))
+		offset += length
+
+	indices = iter(np.frombuffer(data, dtype="<i4", count=4 * number_of_matchings, offset=offset).tolist())
+	offset += 16 * number_of_matchings
+	values = np.frombuffer(data, dtype=dtype, count=number_of_matchings, offset=offset).tolist()
+
+	return {
+		((names[source_table], names[source_column]), (names[target_table], names[target_column])): value
+		for source_table, source_column, target_table, target_column, value in zip(indices, indices, indices, indices, values)
+	}
+
 def load_secret(input_string):
 	heading = "file:"
 	if input_string.startswith(heading):
@@ -115,5 +189,64 @@ def timer(sub, timeout=None, timeout_handler=None):
 def round_dict_values(dictionary, precision):
 	return {k: round(v, precision) for k, v in dictionary.items()}
 
-def compute_object_hash(obj):
-	return DeepHash(obj)[obj]
\ No newline at end of file
+matching_hash_digest_size = 16
+
+def compute_matching_hash(matching, precision):
+	"""
+	Computes a canonical hash of a dictionary of matchings. Its entries are serialised as (key, value) pairs sorted by key,
+	with values rounded to `precision`, and digested with BLAKE2b. The hash does not depend on the order of the entries.
+	"""
+	# if keys are hashed as tuples hashing won't take into account the ordering of
+	# the inner elements (tuples) of the keys and thus hashes will be equal between
+	# hash_matchings and hash_flip_input_matchings. this is NOT desired behaviour, thus
+	# hash keys as strings
+	entries = sorted((str(k), round(v, precision)) for k, v in matching.items())
+	serialised = json.dumps(entries, separators=(",", ":")).encode("utf-8")
+	return hashlib.blake2b(serialised, digest_size=matching_hash_digest_size).hexdigest()
+
+def is_current_matching_hash(hash_value):
+	"""
+	Tells whether a hash value was computed by `compute_matching_hash`.
+	Former versions stored longer DeepHash values, which are not comparable with current ones.
+	"""
+	return hash_value is not None and len(hash_value) == 2 * matching_hash_digest_size
+
+def __pool_worker_initialiser(initialiser, initargs):
+	# ctrl+c is handled by the cancelation token of the main process only
+	signal.signal(signal.SIGINT, signal.SIG_IGN)
+	if initialiser is not None:
+		initialiser(*initargs)
+
+def pool_map(function, jobs, workers, cancelation_token=None, initialiser=None, initargs=()):
+	"""
+	Runs `function` over `jobs` on a pool of worker processes and yields `(job, result, error)`
+	tuples in order of completion. Each job is a tuple of positional arguments for `function`.
+	Jobs are submitted lazily so that at most two jobs per worker are in flight at a time.
+	Once cancelation is requested, no further jobs are submitted but those in flight are still yielded.
+	"""
+	jobs = iter(jobs)
+	executor = ProcessPoolExecutor(max_workers=workers, initializer=__pool_worker_initialiser, initargs=(initialiser, initargs))
+	pending = {}
+
+	def __submit():
+		while len(pending) < 2 * workers:
+			if cancelation_token is not None and cancelation_token.is_cancelation_requested():
+				return
+			job = next(jobs, None)
+			if job is None:
+				return
+			pending[executor.submit(function, *job)] = job
+
+	try:
+		__submit()
+		while pending:
+			done, _ = wait(pending, return_when=FIRST_COMPLETED)
+			for future in done:
+				job = pending.pop(future)
+				try:
+					yield job, future.result(), None
+				except Exception as e:
+					yield job, None, e
+			__submit()
+	finally:
+		executor.shutdown(wait=True, cancel_futures=True)
\ No newline at end of file
@@ -1,5 +1,7 @@
-from sqlalchemy import Boolean, Column, String, ForeignKey, Text, Float, Integer, UniqueConstraint
+from sqlalchemy import Boolean, Column, String, ForeignKey, Text, Float, Integer, UniqueConstraint, Index
 from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy.types import TypeDecorator
+from .helper import encode_matchings, decode_matchings, dict_with_tuples_to_json, json_to_dict_with_tuples
 import uuid
 
 Base = declarative_base()
@@ -7,6 +9,28 @@ Base = declarative_base()
 def generate_uuid():
 	return str(uuid.uuid4())
 
+class MatchingsType(TypeDecorator):
+	"""
+	Dictionaries of matchings, stored in the compact binary encoding of `encode_matchings`.
+	Dictionaries which cannot be encoded that way are stored as JSON text with stringified tuple keys,
+	the format used by former versions, which is still read back for existing session files.
+	"""
+	impl = Text
+	cache_ok = True
+
+	def process_bind_param(self, value, dialect):
+		if value is None or isinstance(value, str):
+			return value
+		encoded = encode_matchings(value)
+		return encoded if encoded is not None else dict_with_tuples_to_json(value)
+
+	def process_result_value(self, value, dialect):
+		if value is None:
+			return None
+		if isinstance(value, bytes):
+			return decode_matchings(value)
+		return json_to_dict_with_tuples(value)
+
 class Algorithm(Base):
 	__tablename__ = 'algorithm'
 
@@ -37,8 +61,8 @@ class Matching(Base):
 	id = Column(String(36), primary_key=True, default=generate_uuid)
 	algorithm_id = Column(String(36), ForeignKey('algorithm.id'), nullable=False)
 	dataset_id = Column(String(36), ForeignKey('dataset.id'), nullable=False)
-	matchings = Column(Text, nullable=True)
-	matchings_lev = Column(Text, nullable=True)
+	matchings = Column(MatchingsType, nullable=True)
+	matchings_lev = Column(MatchingsType, nullable=True)
 	len_matchings = Column(Integer, nullable=True)
 	time_matchings = Column(Float, nullable=True)
 	hash_matchings = Column(Text, nullable=True)
@@ -48,8 +72,8 @@ class Matching(Base):
 	f1score = Column(Float, nullable=True)
 	precision_top_10_percent = Column(Float, nullable=True)
 	recall_ground_truth_size = Column(Float, nullable=True)
-	flip_input_matchings = Column(Text, nullable=True)
-	flip_input_matchings_lev = Column(Text, nullable=True)
+	flip_input_matchings = Column(MatchingsType, nullable=True)
+	flip_input_matchings_lev = Column(MatchingsType, nullable=True)
 	len_flip_input_matchings = Column(Integer, nullable=True)
 	time_flip_input_matchings = Column(Float, nullable=True)
 	hash_flip_input_matchings = Column(Text, nullable=True)
@@ -64,7 +88,9 @@ class Matching(Base):
 	qubo_number_of_quadratic_terms = Column(Integer, nullable=True)
 	qubo_active_variables = Column(Text, nullable=True)
 	qubo_optimal_value = Column(Float, nullable=True)
-	qubo_matchings = Column(Text, nullable=True)
+	qubo_formula_hash = Column(Text, nullable=True)
+	qubo_solve_status = Column(String(20), nullable=True)
+	qubo_matchings = Column(MatchingsType, nullable=True)
 	qubo_precision = Column(Float, nullable=True)
 	qubo_recall = Column(Float, nullable=True)
 	qubo_f1score = Column(Float, nullable=True)
@@ -78,7 +104,7 @@ class Matching(Base):
 	qaoa_shots = Column(Integer, nullable=True)
 	qaoa_active_variables = Column(Text, nullable=True)
 	qaoa_optimal_value = Column(Float, nullable=True)
-	qaoa_matchings = Column(Text, nullable=True)
+	qaoa_matchings = Column(MatchingsType, nullable=True)
 	qaoa_precision = Column(Float, nullable=True)
 	qaoa_recall = Column(Float, nullable=True)
 	qaoa_f1score = Column(Float, nullable=True)
@@ -88,18 +114,37 @@ class Matching(Base):
 	dataset = relationship("Dataset", back_populates="matchings")
 	__table_args__ = (
 		UniqueConstraint('algorithm_id', 'dataset_id', name='_algorithm_dataset_uc'),
+		Index('ix_matching_dataset_id', 'dataset_id'),
+		Index('ix_matching_hash_lev', 'hash_matchings_lev', 'hash_flip_input_matchings_lev'),
+		Index('ix_matching_qubo_number_of_variables', 'qubo_number_of_variables'),
 	)
 
+class GroundTruth(Base):
+	__tablename__ = 'ground_truth'
+
+	dataset_id = Column(String(36), ForeignKey('dataset.id'), primary_key=True)
+	matches = Column(Text, nullable=False)
+
 class UqSummary(Base):
 	__tablename__ = 'uq_summary'
 	
-	id = Column(Integer, primary_key=True)
+	# maintained by triggers on the matching table. never written through the ORM
+	id = Column(String(36), primary_key=True)
 	algorithm_id = Column(String(36), nullable=True)
 	dataset_id = Column(String(36), nullable=True)
+	hash_matchings_lev = Column(Text, nullable=True)
+	hash_flip_input_matchings_lev = Column(Text, nullable=True)
+	len_matchings = Column(Integer, nullable=True)
+	len_flip_input_matchings = Column(Integer, nullable=True)
 	is_symmetric = Column(Boolean, nullable=True)
 	is_balanced = Column(Boolean, nullable=True)
 	is_complete = Column(Boolean, nullable=True)
 	has_ties = Column(Boolean, nullable=True)
+	__table_args__ = (
+		Index('ix_uq_summary_hash_lev', 'hash_matchings_lev', 'hash_flip_input_matchings_lev'),
+	)
 	
+Index('ix_matching_qubo_size', Matching.qubo_number_of_linear_terms + Matching.qubo_number_of_quadratic_terms)
+
 Algorithm.matchings = relationship("Matching", back_populates="algorithm")
 Dataset.matchings = relationship("Matching", back_populates="dataset")
\ No newline at end of file
@@ -43,6 +43,26 @@ def get_correct_preferences_as_tuples(possible_persons):
 	return possible_persons_with_preferences
 
 
+# CHANGED FROM THE ORIGINAL CODEBASE
+# Instead of checking every combination of a man and a woman, the names in the preference lists are collected in sets,
+# and only the women in the preference list of a man are checked. Pairs are yielded in the same order as by the original
+# implementation, i.e. by man and then by woman.
+def get_names_in_preferences(person_with_preferences):
+	"""
+	Collects the names in the preference list of a person, including those in lists of equally likely preferences.
+
+	:param person_with_preferences: The person with preferences as tuples.
+	:return: The set of names in the preference list.
+	"""
+	names = set()
+	for preference in person_with_preferences[1]:
+		if isinstance(preference, list):
+			names.update(preference)
+		else:
+			names.add(preference)
+	return names
+
+
 def get_possible_pairs_as_tuples(possible_men_with_preferences, possible_women_with_preferences):
 	"""
 	Reformulate the possible pairs with preferences as tuples by comparing the possible men with preferences
@@ -53,40 +73,22 @@ def get_possible_pairs_as_tuples(possible_men_with_preferences, possible_women_w
 	:param possible_women_with_preferences: The possible women with their preferences.
 	:return: The possible pairs with preferences as tuples.
 	"""
+	indices_of_women = {}
+	for j, possible_woman_with_preferences in enumerate(possible_women_with_preferences):
+		indices_of_women.setdefault(possible_woman_with_preferences[0], []).append(j)
+	names_in_preferences_of_women = [get_names_in_preferences(woman) for woman in possible_women_with_preferences]
+
 	possible_pairs_with_preferences = []
 	for possible_man_with_preferences in possible_men_with_preferences:
-		for possible_woman_with_preferences in possible_women_with_preferences:
-			woman_appears_in_man = False
-			man_appears_in_woman = False
-
-			man_prefs = possible_man_with_preferences[1]
-			for man_pref in man_prefs:
-				woman_to_be_matched = possible_woman_with_preferences[0]
-				if isinstance(man_pref, list):
-					if woman_to_be_matched in man_pref:
-						woman_appears_in_man = True
-						break
-				else:
-					if woman_to_be_matched == man_pref:
-						woman_appears_in_man = True
-						break
-
-			if woman_appears_in_man:
-				woman_prefs = possible_woman_with_preferences[1]
-				for woman_pref in woman_prefs:
-					man_to_be_matched = possible_man_with_preferences[0]
-					if isinstance(woman_pref, list):
-						if man_to_be_matched in woman_pref:
-							man_appears_in_woman = True
-							break
-					else:
-						if man_to_be_matched == woman_pref:
-							man_appears_in_woman = True
-							break
-
-			if woman_appears_in_man and man_appears_in_woman:
-				pair = (possible_man_with_preferences, possible_woman_with_preferences)
-				possible_pairs_with_preferences.append(pair)
+		man_to_be_matched = possible_man_with_preferences[0]
+		candidates = []
+		for woman_to_be_matched in get_names_in_preferences(possible_man_with_preferences):
+			for j in indices_of_women.get(woman_to_be_matched, []):
+				if man_to_be_matched in names_in_preferences_of_women[j]:
+					candidates.append(j)
+		for j in sorted(candidates):
+			pair = (possible_man_with_preferences, possible_women_with_preferences[j])
+			possible_pairs_with_preferences.append(pair)
 
 	return possible_pairs_with_preferences
 
@@ -107,23 +109,24 @@ def add_preferences(matches, schema1, schema2, possible_men, possible_women):
 		for column in schm2.columns.values:
 			temp_possible_women.append((column, list()))
 
+		# CHANGED FROM THE ORIGINAL CODEBASE
+		# Men and women are found by name in dictionaries instead of scanning the lists. As with the scan, the first one wins
+		men_by_name = {}
+		for possible_man in temp_possible_men:
+			men_by_name.setdefault(possible_man[0], possible_man)
+		women_by_name = {}
+		for possible_woman in temp_possible_women:
+			women_by_name.setdefault(possible_woman[0], possible_woman)
+
 		items = list(matches.items())
 		for item in items:
 			name_of_table_1 = item[0][0][1]
 			name_of_table_2 = item[0][1][1]
 			value = item[1]
-			man = None
-			woman = None
 
 			# Find corresponding man and woman
-			for possible_man in temp_possible_men:
-				if possible_man[0] == name_of_table_1:
-					man = possible_man
-					break
-			for possible_woman in temp_possible_women:
-				if possible_woman[0] == name_of_table_2:
-					woman = possible_woman
-					break
+			man = men_by_name.get(name_of_table_1)
+			woman = women_by_name.get(name_of_table_2)
 
 			# Add preferences
 			preference_list_man = list()
@@ -146,6 +149,11 @@ def add_preferences(matches, schema1, schema2, possible_men, possible_women):
 	# comment the above lines and uncomment this one
 
 
+# CHANGED FROM THE ORIGINAL CODEBASE
+# Equal likeliness is summed in a single pass over the preference list, instead of calling `count` and `remove` on it for every
+# preference. Without duplicates, the original implementation merges each run of consecutive preferences with equal likeliness
+# into the first one, which is what the single pass does. Preference lists with duplicates are still cleaned up by the original
+# loop, as its interplay of `count` and `remove` is subtle there.
 def cleanup_preferences(person):
 	"""
 	Removes duplicates and sums equal likeliness in the preference list of the person.
@@ -153,25 +161,37 @@ def cleanup_preferences(person):
 	:param person: The person whose preference list should get polished.
 	"""
 	preferences = person[1]
-	prev_reference = None
-	length = len(preferences)
-	i = 0
-	while i < length:
-		preference = preferences.__getitem__(i)
-
-		if preferences.count(preference) > 1:  # Remove duplicates
-			preferences.remove(preference)
-			length = length - 1
+	distinct_preferences = set((tuple(preference[0]), preference[1]) for preference in preferences)
+	if len(distinct_preferences) < len(preferences):
+		prev_reference = None
+		length = len(preferences)
+		i = 0
+		while i < length:
+			preference = preferences.__getitem__(i)
+
+			if preferences.count(preference) > 1:  # Remove duplicates
+				preferences.remove(preference)
+				length = length - 1
+				i = i + 1
+				continue
+
+			elif prev_reference is not None and preference[1] == prev_reference[1]:  # Sum equal likeliness
+				prev_reference[0].extend(preference[0])
+				preferences.remove(preference)
+				length = length - 1
+				continue
+			prev_reference = preference
 			i = i + 1
-			continue
-
-		elif prev_reference is not None and preference[1] == prev_reference[1]:  # Sum equal likeliness
-			prev_reference[0].extend(preference[0])
-			preferences.remove(preference)
-			length = length - 1
-			continue
-		prev_reference = preference
-		i = i + 1
+	else:
+		cleaned_preferences = []
+		prev_reference = None
+		for preference in preferences:
+			if prev_reference is not None and preference[1] == prev_reference[1]:  # Sum equal likeliness
+				prev_reference[0].extend(preference[0])
+				continue
+			cleaned_preferences.append(preference)
+			prev_reference = preference
+		preferences[:] = cleaned_preferences
 
 	preferences.sort(reverse=True, key=get_preference_value)
 
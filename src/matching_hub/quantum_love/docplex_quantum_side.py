@@ -1,4 +1,5 @@
 # Codebase from https://github.com/sdbs-uni-p/quantum_love
+# Changes to the original code are appropriately marked
 
 from docplex.mp.model import Model
 
@@ -93,6 +94,11 @@ def do_appear_in_each_others_preference_lists(person1, person2):
 	return True
 
 
+# CHANGED FROM THE ORIGINAL CODEBASE
+# Instead of checking all combinations of pairs, pairs are grouped by man and by woman, so that only pairs sharing a man or
+# a woman are combined, and combinations already added are tracked in a set instead of a list. Combinations are visited in
+# the same order as by the original implementation, i.e. (i, j) with i < j in lexicographic order, since a combination (j, i)
+# is always skipped as the reverse of (i, j).
 def compute_twice_constraint(p3, pairs):
 	"""
 	Computes the twice constraint that "noone gets matched more than once in the final solution".
@@ -102,22 +108,60 @@ def compute_twice_constraint(p3, pairs):
 	:param pairs: The possible pairs.
 	:return: The computed twice constraint.
 	"""
+	indices_of_men = {}
+	indices_of_women = {}
+	for i in range(len(pairs)):
+		indices_of_men.setdefault(pairs[i].m[0], []).append(i)
+		indices_of_women.setdefault(pairs[i].w[0], []).append(i)
+
 	twice_constraint = 0
-	existing_pairs_in_twice_constraint = list()
+	existing_pairs_in_twice_constraint = set()
 	for i in range(len(pairs)):
-		for j in range(len(pairs)):
-			pair1 = pairs[i]
+		pair1 = pairs[i]
+		# man matched twice or woman matched twice
+		for j in sorted(set(indices_of_men[pair1.m[0]]).union(indices_of_women[pair1.w[0]])):
 			pair2 = pairs[j]
 
-			if i != j:  # pairs not equal
-				if pair1.m == pair2.m or pair1.w == pair2.w:  # man matched twice or woman matched twice
-					if not (((pair1.m, pair1.w, pair2.m, pair2.w) in existing_pairs_in_twice_constraint)
-							or ((pair2.m, pair2.w, pair1.m, pair1.w) in existing_pairs_in_twice_constraint)):
-						twice_constraint += p3 * pairs[i] * pairs[j]
-						existing_pairs_in_twice_constraint.append((pair1.m, pair1.w, pair2.m, pair2.w))
+			if j > i:
+				if not (((pair1.m[0], pair1.w[0], pair2.m[0], pair2.w[0]) in existing_pairs_in_twice_constraint)
+						or ((pair2.m[0], pair2.w[0], pair1.m[0], pair1.w[0]) in existing_pairs_in_twice_constraint)):
+					twice_constraint += p3 * pairs[i] * pairs[j]
+					existing_pairs_in_twice_constraint.add((pair1.m[0], pair1.w[0], pair2.m[0], pair2.w[0]))
 	return twice_constraint
 
 
+# CHANGED FROM THE ORIGINAL CODEBASE
+# Ranks of the preference lists are looked up in dictionaries instead of walking the lists in `does_prefer` and
+# `do_appear_in_each_others_preference_lists`, and pairs are looked up by (man, woman) instead of scanning them in `search_pairs`.
+# Moreover, terms are only added for pairs that exist, so that only the possible partners of the fixed man and the fixed woman are
+# visited instead of all men and women. Partners are visited in the order of `possible_men` and `possible_women`, thus the
+# resulting constraint is composed exactly as by the original implementation.
+def get_preference_ranks(person):
+	"""
+	Computes the ranks of the preference list of a person. Equally likely preferences share their rank.
+
+	:param person: The person whose preference list gets ranked.
+	:return: A dictionary from the names in the preference list to their rank, where lower ranks are preferred.
+	"""
+	ranks = {}
+	for rank, preference in enumerate(person[1]):
+		if type(preference).__name__ == 'list':
+			for name in preference:
+				ranks.setdefault(name, rank)
+		else:  # if type(preference).__name__ == 'str'
+			ranks.setdefault(preference, rank)
+	return ranks
+
+
+def does_prefer_by_ranks(ranks, prefer_more, prefer_less):
+	"""
+	Counterpart of `does_prefer` on the ranks of the preference list of a person.
+	"""
+	person1 = prefer_more[0]
+	person2 = prefer_less[0]
+	return person1 != person2 and person1 in ranks and (person2 not in ranks or ranks[person1] < ranks[person2])
+
+
 def compute_stable_constraint(p2, pairs, possible_men, possible_women):
 	"""
 	Computes the stable constraint of the Stable Marriage Problem.
@@ -129,6 +173,34 @@ def compute_stable_constraint(p2, pairs, possible_men, possible_women):
 	:param possible_women: All possible women.
 	:return: The computed stable constraint.
 	"""
+	ranks_of_men = {man[0]: get_preference_ranks(man) for man in possible_men}
+	ranks_of_women = {woman[0]: get_preference_ranks(woman) for woman in possible_women}
+	order_of_men = {}
+	for i, man in enumerate(possible_men):
+		order_of_men.setdefault(man[0], i)
+	order_of_women = {}
+	for j, woman in enumerate(possible_women):
+		order_of_women.setdefault(woman[0], j)
+
+	def appear_in_each_others_preference_lists(man, woman):
+		return woman[0] in ranks_of_men[man[0]] and man[0] in ranks_of_women[woman[0]]
+
+	# The first pair of each (man, woman), as found by `search_pairs`, grouped by the man and by the woman,
+	# in the order in which `possible_women` and `possible_men` are visited
+	pairs_by_names = {}
+	for pair in pairs:
+		pairs_by_names.setdefault((pair.m[0], pair.w[0]), pair)
+	pairs_of_men = {}
+	pairs_of_women = {}
+	for (man_name, woman_name), pair in pairs_by_names.items():
+		if man_name in order_of_men and woman_name in order_of_women:
+			pairs_of_men.setdefault(man_name, []).append(pair)
+			pairs_of_women.setdefault(woman_name, []).append(pair)
+	for pairs_of_man in pairs_of_men.values():
+		pairs_of_man.sort(key=lambda pair: order_of_women[pair.w[0]])
+	for pairs_of_woman in pairs_of_women.values():
+		pairs_of_woman.sort(key=lambda pair: order_of_men[pair.m[0]])
+
 	stable_constraint = 0
 
 	for k in range(len(pairs)):
@@ -136,53 +208,44 @@ def compute_stable_constraint(p2, pairs, possible_men, possible_women):
 		stableConstraint_stablePair = 0
 		fixed_man = pairs[k].m
 		fixed_woman = pairs[k].w
+		ranks_of_fixed_man = ranks_of_men[fixed_man[0]]
+		ranks_of_fixed_woman = ranks_of_women[fixed_woman[0]]
+		pairs_of_fixed_man = pairs_of_men.get(fixed_man[0], [])
+		pairs_of_fixed_woman = pairs_of_women.get(fixed_woman[0], [])
 
 		# Punishes pairs that are blocking
-		for i in range(len(possible_men)):
-			variable_man = possible_men[i]
-			for j in range(len(possible_women)):
-				variable_woman = possible_women[j]
-				if do_appear_in_each_others_preference_lists(fixed_man, variable_woman) \
-						and do_appear_in_each_others_preference_lists(variable_man, fixed_woman):
-					if not does_prefer(fixed_man, fixed_woman, variable_woman) \
-							or not does_prefer(fixed_woman, fixed_man, variable_man):
+		for pair2 in pairs_of_fixed_woman:
+			variable_man = pair2.m
+			for pair1 in pairs_of_fixed_man:
+				variable_woman = pair1.w
+				if appear_in_each_others_preference_lists(fixed_man, variable_woman) \
+						and appear_in_each_others_preference_lists(variable_man, fixed_woman):
+					if not does_prefer_by_ranks(ranks_of_fixed_man, fixed_woman, variable_woman) \
+							or not does_prefer_by_ranks(ranks_of_fixed_woman, fixed_man, variable_man):
 						boolean_value = 1
 					else:
 						boolean_value = 0
-					pair1 = search_pairs(fixed_man, variable_woman, pairs)
-					pair2 = search_pairs(variable_man, fixed_woman, pairs)
-					if pair1 is not None and pair2 is not None:
-						stableConstraint_blockingPair += pair1 * pair2 * boolean_value
-					else:
-						pass
+					stableConstraint_blockingPair += pair1 * pair2 * boolean_value
 
 		# Promotes pairs that are most likely not blocking
-		for n in range(len(possible_men)):
-			variable_man = possible_men[n]
-			if do_appear_in_each_others_preference_lists(fixed_woman, variable_man):
-				if not does_prefer(fixed_woman, fixed_man, variable_man):
+		for pair3 in pairs_of_fixed_woman:
+			variable_man = pair3.m
+			if appear_in_each_others_preference_lists(variable_man, fixed_woman):
+				if not does_prefer_by_ranks(ranks_of_fixed_woman, fixed_man, variable_man):
 					boolean_value = 1
 				else:
 					boolean_value = 0
-				pair3 = search_pairs(variable_man, fixed_woman, pairs)
-				if pair3 is not None:
-					stableConstraint_stablePair += pair3 * boolean_value
-				else:
-					pass
+				stableConstraint_stablePair += pair3 * boolean_value
 
 		# Promotes pairs that are most likely not blocking
-		for m in range(len(possible_women)):
-			variable_woman = possible_women[m]
-			if do_appear_in_each_others_preference_lists(fixed_man, variable_woman):
-				if not does_prefer(fixed_man, fixed_woman, variable_woman):
+		for pair4 in pairs_of_fixed_man:
+			variable_woman = pair4.w
+			if appear_in_each_others_preference_lists(fixed_man, variable_woman):
+				if not does_prefer_by_ranks(ranks_of_fixed_man, fixed_woman, variable_woman):
 					boolean_value = 1
 				else:
 					boolean_value = 0
-				pair4 = search_pairs(fixed_man, variable_woman, pairs)
-				if pair4 is not None:
-					stableConstraint_stablePair += pair4 * boolean_value
-				else:
-					pass
+				stableConstraint_stablePair += pair4 * boolean_value
 
 		stable_constraint += p2 * (stableConstraint_blockingPair - stableConstraint_stablePair)
 
@@ -218,6 +281,10 @@ def setup_docplex_model(possible_pairs, penalties):
 
 	possible_men = []
 	possible_women = []
+	# CHANGED FROM THE ORIGINAL CODEBASE
+	# Men and women already added are tracked by name, instead of scanning `possible_men` and `possible_women`
+	names_of_possible_men = set()
+	names_of_possible_women = set()
 
 	for k in range(len(pairs)):
 		man = possible_pairs[k][0]
@@ -225,9 +292,11 @@ def setup_docplex_model(possible_pairs, penalties):
 		pairs[k].m = man
 		pairs[k].w = woman
 
-		if man not in possible_men:
+		if man[0] not in names_of_possible_men:
+			names_of_possible_men.add(man[0])
 			possible_men.append(man)
-		if woman not in possible_women:
+		if woman[0] not in names_of_possible_women:
+			names_of_possible_women.add(woman[0])
 			possible_women.append(woman)
 
 	# Setup penalties
@@ -1,6 +1,10 @@
 from math import e
 import os
+import struct
+import time
+import hashlib
 import numpy as np
+from scipy import sparse
 import pandas as pd
 from .helper import *
 import re
@@ -9,6 +13,7 @@ from .quantum_love import database_side
 from .quantum_love import docplex_quantum_side
 
 from qiskit_optimization import QuadraticProgram
+from qiskit_optimization.problems import QuadraticObjective
 from qiskit_optimization.translators import from_docplex_mp, to_docplex_mp
 from qiskit_optimization.converters import QuadraticProgramToQubo
 
@@ -18,12 +23,25 @@ from qiskit_optimization.converters import QuadraticProgramToQubo
 from qiskit.circuit.library import QAOAAnsatz
 from qiskit import ClassicalRegister, QuantumCircuit, transpile
 
-def formulate_as_qubo(matching, source_elements, target_elements):
+from filelock import FileLock
+
+qubo_backends = ("sparse", "docplex")
+qubo_solvers = ("cplex", "sa", "exact")
+exact_solver_max_variables = 36
+exact_solver_block_size = 16
+exact_solver_prefix_size = 6
+# CPLEX status codes of a proven optimum, i.e., without the relative or absolute MIP gap tolerance
+cplex_optimal_status_codes = (1, 101)
+
+def formulate_as_qubo(matching, source_elements, target_elements, backend="sparse"):
 	source_df = pd.DataFrame(columns=source_elements)
 	target_df = pd.DataFrame(columns=target_elements)
 	
 	pairs, suitors, reviewers = database_side.get_pairs_and_men_and_women_with_preferences(matching, source_df, target_df)
 	
+	if backend == "sparse":
+		return __assemble_qubo(pairs)
+
 	docplex_model = docplex_quantum_side.setup_docplex_model(pairs, None)
 	
 	quadratic_program = from_docplex_mp(docplex_model)
@@ -31,9 +49,398 @@ def formulate_as_qubo(matching, source_elements, target_elements):
 
 	return qubo
 
+def __assemble_qubo(possible_pairs):
+	"""
+	Assembles the same QUBO that `docplex_quantum_side.setup_docplex_model` formulates with its default penalties,
+	but accumulates the coefficients of the objective function, the twice constraint, and the stable constraint
+	straight into dictionaries and builds the quadratic program once, without docplex expressions.
+	"""
+	# possible pairs are those whose man and woman appear in each other's preference list, and each of them is unique
+	men = {}
+	women = {}
+	pairs_of_men = {}
+	pairs_of_women = {}
+	for k, (man, woman) in enumerate(possible_pairs):
+		men.setdefault(man[0], man)
+		women.setdefault(woman[0], woman)
+		pairs_of_men.setdefault(man[0], []).append(k)
+		pairs_of_women.setdefault(woman[0], []).append(k)
+	ranks_of_men = {name: docplex_quantum_side.get_preference_ranks(man) for name, man in men.items()}
+	ranks_of_women = {name: docplex_quantum_side.get_preference_ranks(woman) for name, woman in women.items()}
+
+	p1 = 1
+	p2 = min(len(men), len(women))
+	p3 = p2 * p2 + p1
+
+	linear = {}
+	quadratic = {}
+	def __add_linear(i, coefficient):
+		linear[i] = linear.get(i, 0) + coefficient
+	def __add_quadratic(i, j, coefficient):
+		key = (i, j) if i <= j else (j, i)
+		quadratic[key] = quadratic.get(key, 0) + coefficient
+
+	# objective function: find the maximum pairs
+	for k in range(len(possible_pairs)):
+		__add_linear(k, -p1)
+
+	# twice constraint: noone gets matched more than once
+	for k, (man, woman) in enumerate(possible_pairs):
+		for j in set(pairs_of_men[man[0]]).union(pairs_of_women[woman[0]]):
+			if j > k:
+				__add_quadratic(k, j, p3)
+
+	# stable constraint: punishes pairs that are blocking and promotes pairs that are most likely not blocking
+	for k, (fixed_man, fixed_woman) in enumerate(possible_pairs):
+		ranks_of_fixed_man = ranks_of_men[fixed_man[0]]
+		ranks_of_fixed_woman = ranks_of_women[fixed_woman[0]]
+		man_prefers_other = [
+			j for j in pairs_of_men[fixed_man[0]]
+			if not docplex_quantum_side.does_prefer_by_ranks(ranks_of_fixed_man, fixed_woman, possible_pairs[j][1])
+		]
+		woman_prefers_other = [
+			j for j in pairs_of_women[fixed_woman[0]]
+			if not docplex_quantum_side.does_prefer_by_ranks(ranks_of_fixed_woman, fixed_man, possible_pairs[j][0])
+		]
+		# a combination of pairs is blocking if either partner of the fixed pair does not prefer the other
+		man_prefers_other_set = set(man_prefers_other)
+		woman_prefers_other_set = set(woman_prefers_other)
+		for i in pairs_of_men[fixed_man[0]]:
+			for j in pairs_of_women[fixed_woman[0]]:
+				if i in man_prefers_other_set or j in woman_prefers_other_set:
+					__add_quadratic(i, j, p2)
+		for j in woman_prefers_other:
+			__add_linear(j, -p2)
+		for i in man_prefers_other:
+			__add_linear(i, -p2)
+
+	# variables are named as docplex names them
+	names = [f"_{man[0]}_{woman[0]}" for man, woman in possible_pairs]
+	qubo = QuadraticProgram("Stable Marriage Problem")
+	for name in names:
+		qubo.binary_var(name)
+	qubo.minimize(
+		linear={names[i]: coefficient for i, coefficient in linear.items() if coefficient != 0},
+		quadratic={(names[i], names[j]): coefficient for (i, j), coefficient in quadratic.items() if coefficient != 0}
+	)
+	return qubo
+
+qubo_store_file_name = "qubos.mhq"
+qubo_record_magic = b"MHQ\x01"
+
+def __encode_qubo(key, qubo):
+	"""
+	Encodes a QUBO into a record of the QUBO store: a header, the names of the QUBO and its binary variables,
+	and the linear and quadratic coefficients of the objective as sparse (i, coefficient) and (i, j, coefficient) arrays.
+	"""
+	if any(variable.vartype != variable.Type.BINARY for variable in qubo.variables):
+		raise ValueError("Only QUBOs with binary variables can be stored.")
+
+	linear = qubo.objective.linear.to_dict()
+	quadratic = qubo.objective.quadratic.to_dict()
+	rows = [i for i, _ in quadratic]
+	columns = [j for _, j in quadratic]
+
+	encoded_key = key.encode("utf-8")
+	encoded_name = qubo.name.encode("utf-8")
+	encoded_variables = [variable.name.encode("utf-8") for variable in qubo.variables]
+	body = b"".join([
+		struct.pack("<IIIIIbd", len(encoded_key), len(encoded_name), len(encoded_variables), len(linear), len(quadratic), qubo.objective.sense.value, qubo.objective.constant),
+		encoded_key,
+		encoded_name,
+		np.array([len(name) for name in encoded_variables], dtype="<i4").tobytes(),
+		b"".join(encoded_variables),
+		np.array(list(linear.keys()), dtype="<i4").tobytes(),
+		np.array(list(linear.values()), dtype="<f8").tobytes(),
+		np.array(rows, dtype="<i4").tobytes(),
+		np.array(columns, dtype="<i4").tobytes(),
+		np.array(list(quadratic.values()), dtype="<f8").tobytes()
+	])
+	return qubo_record_magic + struct.pack("<Q", len(body)) + body
+
+def __decode_qubo(body):
+	"""
+	Decodes a record of the QUBO store encoded by `__encode_qubo`.
+	"""
+	header = struct.Struct("<IIIIIbd")
+	key_length, name_length, number_of_variables, number_of_linear, number_of_quadratic, sense, constant = header.unpack_from(body, 0)
+	offset = header.size + key_length
+
+	def __take(length):
+		nonlocal offset
+		chunk = body[offset:offset + length]
+		offset += length
+		return chunk
+
+	def __take_array(dtype, count):
+		nonlocal offset
+		array = np.frombuffer(body, dtype=dtype, count=count, offset=offset)
+		offset += array.nbytes
+		return array.tolist()
+
+	name = __take(name_length).decode("utf-8")
+	variables = [__take(length).decode("utf-8") for length in __take_array("<i4", number_of_variables)]
+	linear = dict(zip(__take_array("<i4", number_of_linear), __take_array("<f8", number_of_linear)))
+	rows = __take_array("<i4", number_of_quadratic)
+	columns = __take_array("<i4", number_of_quadratic)
+	quadratic = dict(zip(zip(rows, columns), __take_array("<f8", number_of_quadratic)))
+
+	qubo = QuadraticProgram(name)
+	for variable in variables:
+		qubo.binary_var(variable)
+	if sense == QuadraticObjective.Sense.MINIMIZE.value:
+		qubo.minimize(constant=constant, linear=linear, quadratic=quadratic)
+	else:
+		qubo.maximize(constant=constant, linear=linear, quadratic=quadratic)
+	return qubo
+
+def append_to_qubo_store(store_path, key, qubo):
+	"""
+	Appends a QUBO to the QUBO store at the specified path, a single append-only file shared by all QUBOs of a session.
+	Appends are guarded by a file lock, so that several processes can write to the same store.
+	Returns the offset of the QUBO in the store.
+	"""
+	record = __encode_qubo(key, qubo)
+	with FileLock(f"{store_path}.lock"):
+		with open(store_path, "ab") as store:
+			offset = store.seek(0, os.SEEK_END)
+			store.write(record)
+	return offset
+
+def read_from_qubo_store(store_path, offset):
+	"""
+	Reads the QUBO at the specified offset of the QUBO store at the specified path.
+	"""
+	prefix_size = len(qubo_record_magic) + 8
+	with open(store_path, "rb") as store:
+		store.seek(offset)
+		prefix = store.read(prefix_size)
+		if len(prefix) != prefix_size or not prefix.startswith(qubo_record_magic):
+			raise ValueError(f"No QUBO found at offset {offset} of '{store_path}'.")
+		body_size, = struct.unpack_from("<Q", prefix, len(qubo_record_magic))
+		body = store.read(body_size)
+	return __decode_qubo(body)
+
+def compute_qubo_hash(qubo):
+	"""
+	Computes a BLAKE2b hash of a QUBO from its encoding in the QUBO store, i.e., of its name, variables, and coefficients.
+	"""
+	return hashlib.blake2b(__encode_qubo("", qubo), digest_size=matching_hash_digest_size).hexdigest()
+
+def qubo_store_reference(relative_store_path, offset):
+	return f"{relative_store_path}#{offset}"
+
+def load_qubo(base_folder_path, qubo_formula):
+	"""
+	Loads the QUBO a matching's qubo_formula refers to, either a reference to a record of a QUBO store, given as `<store path>#<offset>`,
+	or an LP file, the format used by former versions. Paths are relative to the base folder of the session.
+	"""
+	path, separator, offset = qubo_formula.rpartition("#")
+	if separator and offset.isdigit():
+		return read_from_qubo_store(os.path.join(base_folder_path, path), int(offset))
+
+	qubo = QuadraticProgram()
+	qubo.read_from_lp_file(os.path.join(base_folder_path, qubo_formula))
+	return qubo
+
 def get_docplex_model(qubo):
 	return to_docplex_mp(qubo)
 
+def get_qubo_state(qubo, active_variables):
+	"""
+	Returns the assignment of the variables of a QUBO in which exactly the specified variables are active, e.g., those of a former solution.
+	Active variables that are not in the QUBO are ignored.
+	"""
+	active_variables = set(active_variables)
+	return [1 if variable.name in active_variables else 0 for variable in qubo.variables]
+
+def solve_qubo_with_cplex(qubo, timeout=None, threads=None, initial_state=None):
+	"""
+	Solves a QUBO with CPLEX, optionally starting from an initial assignment of its variables as MIP start.
+	Returns the active variables, the objective value, and the solve status: 'optimal' if CPLEX proved optimality, or 'feasible' otherwise,
+	including optima that CPLEX only proved within its MIP gap tolerance.
+	"""
+	docplex_model = get_docplex_model(qubo)
+	if timeout is not None:
+		docplex_model.context.cplex_parameters.timelimit = timeout
+	if threads is not None:
+		docplex_model.context.cplex_parameters.threads = threads
+	if initial_state is not None:
+		mip_start = docplex_model.new_solution()
+		for variable, value in zip(qubo.variables, initial_state):
+			mip_start.add_var_value(docplex_model.get_var_by_name(variable.name), value)
+		docplex_model.add_mip_start(mip_start)
+	solution = docplex_model.solve()
+	opt_value = solution.get_objective_value()
+	active_variables = [var.name for var in docplex_model.iter_variables() if solution.get_value(var) != 0]
+	status = "optimal" if solution.solve_details.status_code in cplex_optimal_status_codes else "feasible"
+	return active_variables, opt_value, status
+
+def __get_minimisation_terms(qubo):
+	"""
+	Returns the linear terms and the symmetric coupling matrix, without diagonal, of the QUBO as a minimisation problem,
+	i.e., the objective is constant + linear @ x + x @ couplings @ x / 2 for a binary vector x, up to the sign of the sense.
+	"""
+	sign = qubo.objective.sense.value
+	quadratic = sparse.csr_matrix(qubo.objective.quadratic.coefficients, shape=(qubo.get_num_vars(), qubo.get_num_vars())) * sign
+	# x_i * x_i equals x_i for binary variables, so the diagonal is folded into the linear terms
+	linear = qubo.objective.linear.to_array() * sign + quadratic.diagonal()
+	couplings = (quadratic + quadratic.T).tolil()
+	couplings.setdiag(0)
+	couplings = couplings.tocsr()
+	couplings.eliminate_zeros()
+	return linear, couplings
+
+def __get_annealing_schedule(linear, couplings, sweeps):
+	"""
+	Returns geometrically spaced inverse temperatures, from one at which the largest possible flip is accepted with probability 1/2,
+	to one at which the smallest one is accepted with probability 1/100.
+	"""
+	magnitudes = np.abs(couplings).sum(axis=1).A1 + np.abs(linear)
+	coefficients = np.abs(np.concatenate([linear, couplings.data]))
+	coefficients = coefficients[coefficients > 0]
+	if len(coefficients) == 0:
+		return np.ones(sweeps)
+	hot_beta = np.log(2) / magnitudes.max()
+	cold_beta = np.log(100) / coefficients.min()
+	return np.geomspace(hot_beta, cold_beta, sweeps)
+
+def solve_qubo_with_simulated_annealing(qubo, sweeps=1000, replicas=64, seed=None, timeout=None, initial_state=None):
+	"""
+	Solves a QUBO by simulated annealing on a batch of replicas at once.
+	Each sweep visits the variables in order and flips each of them in every replica according to the Metropolis criterion.
+	The local fields of the replicas, i.e., the change of the objective when flipping a variable, are updated incrementally
+	from the sparse coupling matrix instead of reevaluating the objective. Annealing stops early once the timeout, in seconds, is exceeded.
+	If an initial assignment is given, the first replica starts from it, and it is kept if no replica ends up better.
+	Returns the active variables and the objective value of the best replica, and the solve status 'heuristic'.
+	"""
+	number_of_variables = qubo.get_num_vars()
+	rng = np.random.default_rng(seed)
+
+	linear, couplings = __get_minimisation_terms(qubo)
+	neighbours = [
+		(couplings.indices[begin:end], couplings.data[begin:end])
+		for begin, end in zip(couplings.indptr[:-1], couplings.indptr[1:])
+	]
+
+	# states and fields are laid out by variable, so that a variable of all replicas is a contiguous row
+	states = rng.integers(0, 2, size=(number_of_variables, replicas)).astype(np.float64)
+	if initial_state is not None:
+		states[:, 0] = initial_state
+	fields = couplings @ states + linear[:, None]
+
+	started = time.monotonic()
+	for beta in __get_annealing_schedule(linear, couplings, sweeps):
+		# a flip is accepted if the objective decreases by more than log(u) / beta, for u uniform in (0, 1]
+		thresholds = np.log(1 - rng.random((number_of_variables, replicas))) / beta
+		for i in range(number_of_variables):
+			directions = 1 - 2 * states[i]
+			flips = directions * fields[i] < -thresholds[i]
+			if flips.any():
+				changes = directions * flips
+				states[i] += changes
+				indices, values = neighbours[i]
+				fields[indices] += np.multiply.outer(values, changes)
+		if timeout is not None and time.monotonic() - started > timeout:
+			break
+
+	if initial_state is not None:
+		states = np.column_stack([states, initial_state])
+	energies = linear @ states + 0.5 * np.einsum("ir,ir->r", couplings @ states, states)
+	best_state = states[:, np.argmin(energies)].astype(int).tolist()
+
+	active_variables = [variable.name for variable, value in zip(qubo.variables, best_state) if value != 0]
+	return active_variables, qubo.objective.evaluate(best_state), "heuristic"
+
+def __enumerate_exact_prefix(linear, couplings, block_size, prefix, prefix_size):
+	"""
+	Enumerates all assignments of a minimisation QUBO whose last prefix_size variables take the bits of prefix.
+	The first block_size variables form a block whose assignments are evaluated at once as a vector of objective values.
+	The variables in between are enumerated in Gray code order: each step flips one of them, and the vector is updated
+	incrementally by the couplings of that variable. Returns the smallest objective value and its assignment as an integer,
+	whose bit i is the value of variable i. Among assignments with the same objective value, the smallest integer wins.
+	"""
+	number_of_variables = len(linear)
+	high = np.arange(block_size, number_of_variables)
+	middle_size = number_of_variables - block_size - prefix_size
+
+	block_states = ((np.arange(2 ** block_size)[:, None] >> np.arange(block_size)) & 1).astype(np.float64)
+	low_couplings = couplings[:block_size, :block_size]
+	low_to_high_couplings = couplings[:block_size, block_size:]
+	high_couplings = couplings[block_size:, block_size:]
+
+	high_state = np.zeros(len(high))
+	high_state[middle_size:] = (prefix >> np.arange(prefix_size)) & 1
+	high_fields = linear[block_size:] + high_couplings @ high_state
+	high_value = high_state @ (linear[block_size:] + 0.5 * high_couplings @ high_state)
+
+	# the objective values of the block are kept apart from the objective value of the high variables alone, which is the same for the whole block
+	values = (
+		block_states @ linear[:block_size] + 0.5 * np.einsum("bi,bi->b", block_states @ low_couplings, block_states)
+		+ block_states @ (low_to_high_couplings @ high_state)
+	)
+	# the change of the values of the block when turning on the k-th middle variable
+	flip_values = np.ascontiguousarray((block_states @ low_to_high_couplings[:, :middle_size]).T)
+
+	best = values.argmin()
+	best_value, best_assignment = values[best] + high_value, int(best)
+	for step in range(1, 2 ** middle_size):
+		k = (step & -step).bit_length() - 1
+		if high_state[k] == 0:
+			values += flip_values[k]
+			high_value += high_fields[k]
+			high_fields += high_couplings[k]
+			high_state[k] = 1
+		else:
+			values -= flip_values[k]
+			high_value -= high_fields[k]
+			high_fields -= high_couplings[k]
+			high_state[k] = 0
+
+		# argmin yields the smallest block assignment of a step, but the Gray code does not visit the middle variables in increasing order
+		best = values.argmin()
+		if values[best] + high_value <= best_value:
+			assignment = int(best) | ((step ^ (step >> 1)) << block_size)
+			if values[best] + high_value < best_value or assignment < best_assignment:
+				best_value, best_assignment = values[best] + high_value, assignment
+
+	return best_value, best_assignment | (prefix << (number_of_variables - prefix_size))
+
+def solve_qubo_exactly(qubo, processes=None):
+	"""
+	Solves a QUBO exactly by enumerating all assignments of its variables, for up to `exact_solver_max_variables` variables.
+	The assignments are split by the values of the last variables into prefixes, which are enumerated on `processes` processes,
+	a single one by default. Among optimal assignments, the one with the smallest integer, whose bit i is the value of variable i, is chosen,
+	so the result does not depend on the number of processes. Returns the active variables and the objective value of that assignment,
+	and the solve status 'optimal'.
+	"""
+	number_of_variables = qubo.get_num_vars()
+	if number_of_variables > exact_solver_max_variables:
+		raise ValueError(f"The exact solver supports QUBOs with up to {exact_solver_max_variables} variables, but this one has {number_of_variables}.")
+
+	linear, couplings = __get_minimisation_terms(qubo)
+	couplings = couplings.toarray()
+
+	block_size = min(exact_solver_block_size, number_of_variables)
+	prefix_size = min(exact_solver_prefix_size, number_of_variables - block_size)
+	jobs = [(linear, couplings, block_size, prefix, prefix_size) for prefix in range(2 ** prefix_size)]
+
+	processes = min(processes or 1, len(jobs))
+	if processes == 1:
+		results = [__enumerate_exact_prefix(*job) for job in jobs]
+	else:
+		results = []
+		for job, result, error in pool_map(__enumerate_exact_prefix, jobs, processes):
+			if error is not None:
+				raise error
+			results.append(result)
+
+	best_value, best_assignment = min(results)
+	best_state = [(best_assignment >> i) & 1 for i in range(number_of_variables)]
+
+	active_variables = [variable.name for variable, value in zip(qubo.variables, best_state) if value != 0]
+	return active_variables, qubo.objective.evaluate(best_state), "optimal"
+
 def get_qaoa_cicuit(qubo, p, simulator = None):
 	qubo_converter = QuadraticProgramToQubo()
 	problem_op, offset = qubo_converter.convert(qubo).to_ising()
@@ -1,21 +1,35 @@
-from sqlalchemy import distinct, text, and_
+from sqlalchemy import distinct, text, and_, or_, func
+from sqlalchemy.orm import load_only
+from sqlalchemy.orm.attributes import flag_modified
 from sqlalchemy.exc import IntegrityError
 from .db_setup import init_db, get_session, sqlite_engine_builder
 from .helper import *
-from .models import Algorithm, Dataset, Matching, UqSummary
+from .models import Algorithm, Dataset, Matching, UqSummary, GroundTruth
 from functools import wraps
+from contextlib import contextmanager
 from sqlalchemy.exc import OperationalError
 import time
+import json
+from collections import OrderedDict
 from filelock import FileLock
 
 class MatchingSession:
+
+	ground_truth_cache_size = 128
+	fetch_batch_size = 100
+	matchings_columns = ("matchings", "matchings_lev", "flip_input_matchings", "flip_input_matchings_lev", "qubo_matchings", "qaoa_matchings")
+	hash_columns = ("hash_matchings", "hash_matchings_lev", "hash_flip_input_matchings", "hash_flip_input_matchings_lev")
 	
-	def __init__(self, session_file, notification_fallback):
-		engine_builder = sqlite_engine_builder(session_file)
+	def __init__(self, session_file, notification_fallback, tuned=False):
+		engine_builder = sqlite_engine_builder(session_file, tuned)
 		self.session_file = session_file
 		self.__session = get_session(init_db(engine_builder))
 		self.__notification_fallback = notification_fallback
 		self.__lock = FileLock(f"{session_file}.lock")
+		self.__ground_truths = OrderedDict()
+		self.__batch_size = None
+		self.__pending_changes = []
+		self.__chunked_readers = 0
 
 	@staticmethod
 	def retry_commit(delay=1):
@@ -23,22 +37,50 @@ class MatchingSession:
 			@wraps(func)
 			def wrapper(*args, **kwargs):
 				self = args[0]
-				session = self.__session
 				result = func(*args, **kwargs)
+				self.__pending_changes.append((func, args, kwargs))
+
+				if self.__batch_size is not None and len(self.__pending_changes) < self.__batch_size:
+					return result
 
-				with self.__lock:
-					while True:
-						try:
-							session.commit()
-							return result
-						except OperationalError as e:
-							if "database is locked" in str(e):
-								time.sleep(delay)
-							else:
-								raise
+				self.__commit(delay)
+				return result
 			return wrapper
 		return decorator
 
+	def __commit(self, delay):
+		with self.__lock:
+			while True:
+				try:
+					self.__session.commit()
+					self.__pending_changes.clear()
+					return
+				except OperationalError as e:
+					if "database is locked" not in str(e):
+						raise
+					# the failed commit leaves the session in need of a rollback, which discards the pending changes, so they are made again
+					self.__session.rollback()
+					time.sleep(delay)
+					for func, args, kwargs in self.__pending_changes:
+						func(*args, **kwargs)
+
+	@contextmanager
+	def batch(self, size=500, delay=2):
+		"""
+		Within this context, changes made by upload methods are collected and committed together
+		in a single transaction every `size` changes and once more when leaving the context,
+		instead of committing every single change on its own.
+		"""
+		if size < 1:
+			raise ValueError("size must be a positive integer.")
+		self.__batch_size = size
+		try:
+			yield self
+		finally:
+			self.__batch_size = None
+			if self.__pending_changes:
+				self.__commit(delay)
+
 	def __warn(self, message):
 		if self.__notification_fallback:
 			self.__notification_fallback(message)
@@ -47,8 +89,35 @@ class MatchingSession:
 		if self.__notification_fallback:
 			self.__notification_fallback(message)
 			
-	def __query_uq_summary(self, criteria=None, range_tuple=None):
-		query = self.__session.query(UqSummary.id, UqSummary.algorithm_id, UqSummary.dataset_id)
+	def __iterate_matchings(self, query, columns, batch_size):
+		# the ids of the matchings are read up front, and rows are then fetched by id in chunks of batch_size, so that no read cursor is open
+		# while changes are committed during the iteration; if columns are given, only those are loaded and any other column is deferred
+		batch_size = batch_size or self.fetch_batch_size
+		matching_ids = [row.id for row in query.with_entities(Matching.id)]
+
+		# while iterating, loaded objects are not expired on commit, so that commits do not force reloading the rest of a chunk one row at a time
+		self.__chunked_readers += 1
+		self.__session.expire_on_commit = False
+		try:
+			for begin in range(0, len(matching_ids), batch_size):
+				chunk = matching_ids[begin:begin + batch_size]
+				chunk_query = self.__session.query(Matching).filter(Matching.id.in_(chunk))
+				if columns is not None:
+					chunk_query = chunk_query.options(load_only(*(getattr(Matching, column) for column in columns)))
+				matchings = {matching.id: matching for matching in chunk_query}
+				for matching_id in chunk:
+					if matching_id in matchings:
+						yield matchings[matching_id]
+		finally:
+			self.__chunked_readers -= 1
+			if self.__chunked_readers == 0:
+				self.__session.expire_on_commit = True
+
+	def __query_uq_summary(self, criteria=None, range_tuple=None, batch_size=None):
+		query = (
+			self.__session.query(UqSummary.id, UqSummary.algorithm_id, UqSummary.dataset_id)
+			.order_by(UqSummary.hash_matchings_lev, UqSummary.hash_flip_input_matchings_lev)
+		)
 		
 		if range_tuple is not None:
 			start, end = range_tuple
@@ -79,8 +148,7 @@ class MatchingSession:
 		algorithm_ids = set()
 		dataset_ids = set()
 
-		batch_size = 1
-		for result in query.yield_per(batch_size):
+		for result in query.yield_per(batch_size or self.fetch_batch_size):
 			matching_ids.add(result.id)
 			algorithm_ids.add(result.algorithm_id)
 			dataset_ids.add(result.dataset_id)
@@ -106,19 +174,20 @@ class MatchingSession:
 			selected_scenarios.extend(self.get_all_scenarios())
 		return selected_scenarios
 		
-	def upload_scenario(self, scenario, stats, override):
-		existing_dataset = self.get_scenario(scenario.name)
+	def upload_scenario(self, scenario_name, stats, override):
+		existing_dataset = self.get_scenario(scenario_name)
 		if existing_dataset:
 			if override:
+				# the ground_truth_dataset_delete trigger deletes the stored ground truth along with the scenario
+				self.__ground_truths.pop(existing_dataset.id, None)
 				self.__session.delete(existing_dataset)
 				self.__session.commit()
 			else:
-				self.__warn(f"{scenario.name} already exists. Skipping.")
+				self.__warn(f"{scenario_name} already exists. Skipping.")
 				return False
 	
-		stats = scenario.get_stats()
 		dataset = Dataset(
-			name=scenario.name,
+			name=scenario_name,
 			ground_truth_size=stats.ground_truth_size,
 			source_column_count=stats.source_column_count,
 			target_column_count=stats.target_column_count,
@@ -129,6 +198,31 @@ class MatchingSession:
 		
 		return True
 
+	def get_ground_truth(self, dataset_id):
+		"""
+		Returns the ground truth of a scenario as a list of (source column, target column) tuples.
+		Ground truths are served from an in-process LRU cache, then from the ground_truth table. Returns None if not found in either.
+		"""
+		ground_truth = self.__ground_truths.get(dataset_id)
+		if ground_truth is None:
+			db_ground_truth = self.__session.get(GroundTruth, dataset_id)
+			if db_ground_truth is None:
+				return None
+			ground_truth = [tuple(match) for match in json.loads(db_ground_truth.matches)]
+		self.cache_ground_truth(dataset_id, ground_truth)
+		return ground_truth
+
+	def cache_ground_truth(self, dataset_id, ground_truth):
+		self.__ground_truths[dataset_id] = ground_truth
+		self.__ground_truths.move_to_end(dataset_id)
+		if len(self.__ground_truths) > self.ground_truth_cache_size:
+			self.__ground_truths.popitem(last=False)
+
+	@retry_commit(delay=2)
+	def upload_ground_truth(self, dataset_id, ground_truth):
+		self.cache_ground_truth(dataset_id, ground_truth)
+		self.__session.merge(GroundTruth(dataset_id=dataset_id, matches=json.dumps(ground_truth)))
+
 	def get_algorithm_names(self):
 		result = self.__session.query(distinct(Algorithm.name)).all()
 		return [row[0] for row in result]
@@ -174,7 +268,7 @@ class MatchingSession:
 		self.__session.commit()
 		return True
 
-	def get_all_matchings_order_by_qubo_size(self):
+	def get_all_matchings_order_by_qubo_size(self, columns=None, batch_size=None):
 		query = (
 			self.__session.query(Matching)
 			.filter(
@@ -185,10 +279,13 @@ class MatchingSession:
 				(Matching.qubo_number_of_linear_terms + Matching.qubo_number_of_quadratic_terms).asc()
 			)
 		)
-		batch_size = 1
-		return query.yield_per(batch_size)
+		return self.__iterate_matchings(query, columns, batch_size)
 
-	def get_all_matchings(self, range_tuple=None):
+	def get_all_matchings(self, range_tuple=None, columns=None, batch_size=None):
+		"""
+		Iterates over matchings, fetching them in chunks of `batch_size` rows.
+		If `columns` are given, only those columns are loaded and any other column is loaded on first access.
+		"""
 		query = self.__session.query(Matching)
 		
 		if range_tuple is not None:
@@ -202,14 +299,64 @@ class MatchingSession:
 				
 				query = query.offset(start).limit(end - start + 1)
 	
-		batch_size = 1
-		return query.yield_per(batch_size)
+		return self.__iterate_matchings(query, columns, batch_size)
+
+	def get_all_matchings_order_by_qubo_number_of_variables(self, range_tuple=None, columns=None, batch_size=None):
+		"""
+		Iterates over the matchings with a QUBO formulation among those `get_all_matchings` selects for the range,
+		from the QUBO with the fewest variables to the one with the most.
+		"""
+		query = (
+			self.__session.query(Matching)
+			.filter(Matching.qubo_number_of_variables.isnot(None))
+			.order_by(Matching.qubo_number_of_variables.asc(), Matching.id)
+		)
+
+		if range_tuple is not None:
+			start, end = range_tuple
+			if start is not None or end is not None:
+				if start < 0 or end < 0:
+					raise ValueError("start and end must be non-negative integers.")
+		
+				if end < start:
+					raise ValueError("end must be greater than or equal to start.")
+				
+				in_range = self.__session.query(Matching.id).offset(start).limit(end - start + 1)
+				query = query.filter(Matching.id.in_(in_range.scalar_subquery()))
+
+		return self.__iterate_matchings(query, columns, batch_size)
+
+	def get_all_json_encoded_matchings(self, batch_size=None):
+		"""
+		Iterates over matchings with any of their matchings columns still stored as JSON text by former versions.
+		"""
+		query = self.__session.query(Matching).filter(
+			or_(*(func.typeof(getattr(Matching, column)) == "text" for column in self.matchings_columns))
+		)
+		return self.__iterate_matchings(query, self.matchings_columns, batch_size)
+
+	def get_all_legacy_hashed_matchings(self, columns=None, batch_size=None):
+		"""
+		Iterates over matchings with any of their hashes computed by former versions, see `is_current_matching_hash`.
+		"""
+		query = self.__session.query(Matching).filter(
+			or_(*(func.length(getattr(Matching, column)) != 2 * matching_hash_digest_size for column in self.hash_columns))
+		)
+		return self.__iterate_matchings(query, columns, batch_size)
+
+	@retry_commit(delay=2)
+	def reencode_matchings(self, matching_id):
+		matching = self.get_matching_by_id(matching_id)
+		for column in self.matchings_columns:
+			if getattr(matching, column) is not None:
+				flag_modified(matching, column)
 
 	def get_matching(self, algorithm_id, dataset_id):
 		return self.__session.query(Matching).filter_by(algorithm_id=algorithm_id, dataset_id=dataset_id).first()
 
 	def get_matching_by_id(self, matching_id):
-		return self.__session.query(Matching).filter_by(id=matching_id).first()
+		# served from the identity map without a query or an autoflush if the matching is already loaded
+		return self.__session.get(Matching, matching_id)
 
 	@retry_commit(delay=2)
 	def upload_matching(self, algorithm, dataset, matchings, time, metrics, override):
@@ -218,7 +365,7 @@ class MatchingSession:
 			matching = Matching(
 				algorithm=algorithm,
 				dataset=dataset,
-				matchings=dict_with_tuples_to_json(matchings),
+				matchings=dict(matchings),
 				len_matchings=len(matchings),
 				time_matchings=time,
 				precision=metrics["Precision"],
@@ -230,7 +377,7 @@ class MatchingSession:
 			self.__session.add(matching)
 		else:
 			if override or existing_matching.matchings is None:
-				existing_matching.matchings = dict_with_tuples_to_json(matchings)
+				existing_matching.matchings = dict(matchings)
 				existing_matching.len_matchings = len(matchings)
 				existing_matching.time_matchings = time
 				existing_matching.precision = metrics["Precision"]
@@ -246,26 +393,26 @@ class MatchingSession:
 			matching = Matching(
 				algorithm=algorithm,
 				dataset=dataset,
-				flip_input_matchings=dict_with_tuples_to_json(matchings),
+				flip_input_matchings=dict(matchings),
 				len_flip_input_matchings = len(matchings),
 				time_flip_input_matchings = time
 			)
 			self.__session.add(matching)
 		else:
 			if override or existing_matching.flip_input_matchings is None:
-				existing_matching.flip_input_matchings = dict_with_tuples_to_json(matchings)
+				existing_matching.flip_input_matchings = dict(matchings)
 				existing_matching.len_flip_input_matchings = len(matchings)
 				existing_matching.time_flip_input_matchings = time
 				
 	@retry_commit(delay=2)
 	def upload_matching_as_preferences(self, matching_id, matchings):
 		matching = self.get_matching_by_id(matching_id)		
-		matching.matchings_lev = dict_with_tuples_to_json(matchings)
+		matching.matchings_lev = dict(matchings)
 
 	@retry_commit(delay=2)
 	def upload_flipped_matching_as_preferences(self, matching_id, matchings):
 		matching = self.get_matching_by_id(matching_id)		
-		matching.flip_input_matchings_lev = dict_with_tuples_to_json(matchings)
+		matching.flip_input_matchings_lev = dict(matchings)
 
 	@retry_commit(delay=2)
 	def upload_matching_hash(self, matching_id, hash_value):
@@ -295,6 +442,15 @@ class MatchingSession:
 		matching.has_ties = has_ties
 		matching.is_balanced = is_balanced
 
+	@retry_commit(delay=2)
+	def upload_postprocessing(self, matching_id, values):
+		"""
+		Writes any of the discretised matchings, hashes and features of a matching at once. `values` maps column names to their new values.
+		"""
+		matching = self.get_matching_by_id(matching_id)
+		for column, value in values.items():
+			setattr(matching, column, value)
+
 	def get_matching_class_count(self):
 		sql = """
 			SELECT
@@ -328,7 +484,14 @@ class MatchingSession:
 					detached_algorithm = Algorithm(**{col.name: getattr(algorithm, col.name) for col in Algorithm.__table__.columns})
 					trg.add(detached_algorithm)
 
-			matchings = src.query(Matching).filter(Matching.id.in_(matching_ids)).yield_per(1)
+			ground_truths = src.query(GroundTruth).filter(GroundTruth.dataset_id.in_(scenario_ids)).all()
+			for ground_truth in ground_truths:
+				exists = trg.query(GroundTruth).filter_by(dataset_id=ground_truth.dataset_id).first()
+				if not exists:
+					detached_ground_truth = GroundTruth(**{col.name: getattr(ground_truth, col.name) for col in GroundTruth.__table__.columns})
+					trg.add(detached_ground_truth)
+
+			matchings = src.query(Matching).filter(Matching.id.in_(matching_ids)).yield_per(self.fetch_batch_size)
 			for matching in matchings:
 				exists = trg.query(Matching).filter_by(id=matching.id).first()
 				if not exists:
@@ -353,11 +516,13 @@ class MatchingSession:
 		matching.qubo_number_of_quadratic_terms = number_of_quadratic_terms
 	
 	@retry_commit(delay=2)
-	def upload_qubo_matchings(self, matching_id, matchings, active_variables, opt_value):
+	def upload_qubo_matchings(self, matching_id, matchings, active_variables, opt_value, solve_status=None, formula_hash=None):
 		matching = self.get_matching_by_id(matching_id)
-		matching.qubo_matchings = dict_with_tuples_to_json(matchings)
+		matching.qubo_matchings = dict(matchings)
 		matching.qubo_active_variables = ",".join(active_variables)
 		matching.qubo_optimal_value = opt_value
+		matching.qubo_solve_status = solve_status
+		matching.qubo_formula_hash = formula_hash
 
 	@retry_commit(delay=2)
 	def upload_qubo_matchings_metrics(self, matching_id, metrics):
@@ -381,7 +546,7 @@ class MatchingSession:
 	def upload_qaoa_matchings(self, matching_id, shots, matchings, active_variables, opt_value):
 		matching = self.get_matching_by_id(matching_id)
 		matching.qaoa_shots = shots
-		matching.qaoa_matchings = dict_with_tuples_to_json(matchings)
+		matching.qaoa_matchings = dict(matchings)
 		matching.qaoa_active_variables = ",".join(active_variables)
 		matching.qaoa_optimal_value = opt_value
 
@@ -1,4 +1,5 @@
 from deepdiff import DeepDiff
+import numpy as np
 
 def extract_elements(pref):
 	source_elements = set()
@@ -32,6 +33,59 @@ def translate_probabilities_to_levels(prob_dict):
 
 	return level_dict
 
+def __round_like_python(values, precision):
+	"""
+	Rounds an array of floats to `precision` decimal digits with exactly the results of python's round.
+	"""
+	scale = 10.0 ** precision
+	# python rounds the exact decimal value, whereas the scaled values carry a rounding error of up to half an ulp.
+	# values whose scaled fraction is that close to a half, or which are too large to have a fraction, are thus rounded by python
+	with np.errstate(over="ignore", invalid="ignore"):
+		scaled = values * scale
+		rounded = np.round(scaled) / scale
+		distance_to_half = np.abs(scaled - np.floor(scaled) - 0.5)
+		is_exact = (distance_to_half > 2 * np.spacing(np.abs(scaled))) & (np.abs(scaled) < 2 ** 52)
+	for i in np.flatnonzero(~is_exact).tolist():
+		rounded[i] = round(float(values[i]), precision)
+	return rounded
+
+def translate_probabilities_to_levels_vectorised(prob_dict, precision=None):
+	"""
+	Vectorised counterpart of `translate_probabilities_to_levels`, which yields an identical dictionary,
+	including the order of its entries. If `precision` is given, probabilities are rounded beforehand,
+	as `round_dict_values` does.
+	"""
+	keys = list(prob_dict.keys())
+	if len(keys) == 0:
+		return {}
+	probabilities = np.fromiter(prob_dict.values(), dtype=np.float64, count=len(keys))
+	if np.isnan(probabilities).any():
+		# nan does not sort consistently with python
+		return translate_probabilities_to_levels({key: round(prob, precision) if precision is not None else prob for key, prob in prob_dict.items()})
+	if precision is not None:
+		probabilities = __round_like_python(probabilities, precision)
+
+	# rows are numbered by first appearance, which is the order of the groups in the result
+	rows = {}
+	row_ids = np.array([rows.setdefault(key[0][1], len(rows)) for key in keys])
+
+	# lexsort is stable, so equal probabilities of a row keep their order, as with sorted
+	order = np.lexsort((probabilities, row_ids))
+	sorted_row_ids = row_ids[order]
+	sorted_probabilities = probabilities[order]
+
+	is_row_start = np.ones(len(keys), dtype=bool)
+	is_row_start[1:] = sorted_row_ids[1:] != sorted_row_ids[:-1]
+	is_level_step = np.zeros(len(keys), dtype=np.int64)
+	is_level_step[1:] = (sorted_probabilities[1:] != sorted_probabilities[:-1]) & ~is_row_start[1:]
+
+	# dense ranks are the number of level steps since the start of the row
+	steps = np.cumsum(is_level_step)
+	row_starts = np.maximum.accumulate(np.where(is_row_start, np.arange(len(keys)), 0))
+	levels = steps - steps[row_starts] + 1
+
+	return {keys[i]: level for i, level in zip(order.tolist(), levels.tolist())}
+
 def build_preference_lists(matches):
 	preferences_of_source = { }
 	preferences_of_target = { }
@@ -106,3 +160,75 @@ def check_is_balanced(pref_of_source, pref_of_target):
 	return len(pref_of_source) == len(pref_of_target) and \
 		__balanced_lists(list(pref_of_source.keys()), list(pref_of_target.values())) and \
 		__balanced_lists(list(pref_of_target.keys()), list(pref_of_source.values()))
+
+def compute_features_vectorised(matches, flip_input_matches):
+	"""
+	Vectorised counterpart of building the preference lists of both directions with `build_preference_lists`
+	and checking them with `check_is_symmetric`, `check_is_complete`, `check_has_ties` and `check_is_balanced`.
+	Elements are interned as integer ids, and preference lists are represented as arrays of (owner, ranked element, score).
+	Returns the tuple (is_symmetric, is_complete, has_ties, is_balanced).
+	"""
+	if not all(type(score) is int for score in (*matches.values(), *flip_input_matches.values())):
+		# comparisons of mixed or non-integer scores are left to the original checks
+		pref_of_source, infer_pref_of_target = build_preference_lists(matches)
+		pref_of_target, infer_pref_of_source = build_preference_lists(flip_input_matches)
+		return (
+			check_is_symmetric(pref_of_source, infer_pref_of_source, pref_of_target, infer_pref_of_target),
+			check_is_complete(pref_of_source, pref_of_target),
+			check_has_ties(pref_of_source) or check_has_ties(pref_of_target),
+			check_is_balanced(pref_of_source, pref_of_target)
+		)
+
+	sources = {}
+	targets = {}
+	def __intern(ids, position, matchings):
+		return np.fromiter((ids.setdefault(key[position][1], len(ids)) for key in matchings), dtype=np.int64, count=len(matchings))
+
+	# entries in the order of the dictionaries, which is the order of the preference lists
+	source_ids = __intern(sources, 0, matches)
+	target_ids = __intern(targets, 1, matches)
+	scores = np.fromiter(matches.values(), dtype=np.int64, count=len(matches))
+	flip_target_ids = __intern(targets, 0, flip_input_matches)
+	flip_source_ids = __intern(sources, 1, flip_input_matches)
+	flip_scores = np.fromiter(flip_input_matches.values(), dtype=np.int64, count=len(flip_input_matches))
+
+	def __same_lists(owners, elements, scores, other_owners, other_elements, other_scores):
+		# preference lists are compared in order, as DeepDiff does. a stable sort groups entries by owner and keeps their order within lists
+		if len(owners) != len(other_owners):
+			return False
+		order = np.argsort(owners, kind="stable")
+		other_order = np.argsort(other_owners, kind="stable")
+		return bool(
+			np.array_equal(owners[order], other_owners[other_order]) and
+			np.array_equal(elements[order], other_elements[other_order]) and
+			np.array_equal(scores[order], other_scores[other_order])
+		)
+
+	def __complete_lists(ref, owners, elements):
+		# each list ranks exactly the elements of ref, as many as there are and each once
+		if len(owners) == 0:
+			return True
+		_, counts = np.unique(owners, return_counts=True)
+		distinct_entries = np.unique(np.stack((owners, elements)), axis=1).shape[1]
+		return bool((counts == len(ref)).all() and np.isin(elements, ref).all() and distinct_entries == len(owners))
+
+	def __has_ties(owners, elements, scores):
+		# a list has ties if it ranks distinct elements with the same score
+		if len(owners) == 0:
+			return False
+		distinct_entries = np.unique(np.stack((owners, scores, elements)), axis=1)
+		distinct_ranks = np.unique(distinct_entries[:2], axis=1)
+		return distinct_ranks.shape[1] < distinct_entries.shape[1]
+
+	source_keys = np.unique(source_ids)
+	target_keys = np.unique(flip_target_ids)
+
+	is_symmetric = __same_lists(source_ids, target_ids, scores, flip_source_ids, flip_target_ids, flip_scores) and \
+		__same_lists(flip_target_ids, flip_source_ids, flip_scores, target_ids, source_ids, scores)
+	is_complete = __complete_lists(source_keys, flip_target_ids, flip_source_ids) and \
+		__complete_lists(target_keys, source_ids, target_ids)
+	has_ties = __has_ties(source_ids, target_ids, scores) or __has_ties(flip_target_ids, flip_source_ids, flip_scores)
+	is_balanced = len(source_keys) == len(target_keys) and \
+		bool(np.isin(flip_source_ids, source_keys).all()) and \
+		bool(np.isin(target_ids, target_keys).all())
+	return is_symmetric, is_complete, has_ties, is_balanced
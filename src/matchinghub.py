@@ -6,6 +6,7 @@ from rich.table import Table
 from typing import Optional, Annotated, List
 import os
 import glob
+import functools
 import configparser
 from matching_hub.repository import MatchingSession
 from matching_hub.helper import *
@@ -14,7 +15,7 @@ from matching_hub.stable_marriage_helper import *
 from matching_hub.qubo_helper import *
 from plotting import qubo_dist, qubo_histogram, qubo_qaoa_dist, qaoa_dist, qaoa_histogram, recall_stats, data_dist, data_dist_3d, match_dist
 
-from schema_matching_scenarios import load_scenario, scenario_names, get_source_target_names
+from schema_matching_scenarios import load_scenario, scenario_names, scenario_catalogue, get_source_target_names, ScenarioCache
 
 console = Console()
 app = typer.Typer()
@@ -32,6 +33,23 @@ session_extension = "mt"
 session_name_default = f"matching.{session_extension}"
 precision = 7
 cancelation_token = CancelationToken.get_token()
+tuned_sessions = False
+
+@app.callback()
+def main(
+	tuned: Annotated[
+		bool,
+		typer.Option(
+			help=(
+				"If set, session files are opened with a tuned SQLite profile: WAL journal mode, synchronous=NORMAL, "
+				"memory-mapped I/O, a larger page cache, and a busy timeout. Recommended when several processes share a session file. "
+				"Once set, the WAL journal mode persists in the session file."
+			)
+		)
+	] = False
+):
+	global tuned_sessions
+	tuned_sessions = tuned
 
 def __notification_fallback(message):
 	typer.echo(message)
@@ -56,7 +74,7 @@ def __get_session(session_file):
 		typer.echo(f"Error: Session '{session_file}' does not exist.")
 		raise typer.Exit()
 
-	session = MatchingSession(session_file, __notification_fallback)	
+	session = MatchingSession(session_file, __notification_fallback, tuned_sessions)	
 	return session
 
 def __session_folders(session_file, *subfolder_names, validate_only=False):
@@ -84,6 +102,154 @@ def __session_folders(session_file, *subfolder_names, validate_only=False):
 
 	return (session_folder, base_folder_path, *subfolder_paths)
 
+def __get_ground_truth(session, db_scenario, persist):
+	"""
+	Helper function to get the ground truth of a scenario, reading it from the repository only if the session does not hold it yet.
+	"""
+	ground_truth = session.get_ground_truth(db_scenario.id)
+	if ground_truth is None:
+		scenario_data = load_scenario(db_scenario.name, False) # actual data is not needed. only the ground truths.
+		ground_truth = scenario_data.ground_truth_as_tuples()
+		if persist:
+			session.upload_ground_truth(db_scenario.id, ground_truth)
+		else:
+			session.cache_ground_truth(db_scenario.id, ground_truth)
+	return ground_truth
+
+def __match_scenario(scenario_data, algorithm_name, parameters, directions, individual_timeout, global_timeout, on_matching, on_error):
+	"""
+	Helper function to run an algorithm configuration over a scenario in the given directions.
+	Each resulting matching is handed over to `on_matching` as soon as its direction completes.
+	"""
+	matcher = get_first_matcher(algorithm_name, json_to_dict(parameters))
+	source_name, target_name = prepare_source_target_names(scenario_data.source_name, scenario_data.target_name)
+
+	def __do_matching():
+		if "st" in directions:
+			try:
+				matches, time_matches = timer(lambda: valentine_match(scenario_data.source_df, scenario_data.target_df, matcher, source_name, target_name), individual_timeout)
+				metrics = matches.get_metrics(scenario_data.ground_truth_as_tuples())
+				on_matching("st", matches, time_matches, metrics)
+			except Exception as e:
+				on_error(e)
+				return
+
+		if "ts" in directions:
+			try:
+				flip_input_matches, time_flip_input_matches = timer(lambda: valentine_match(scenario_data.target_df, scenario_data.source_df, matcher, target_name, source_name), individual_timeout)
+				on_matching("ts", flip_input_matches, time_flip_input_matches, None)
+			except Exception as e:
+				on_error(e)
+
+	try:
+		timer(__do_matching, global_timeout)
+	except Exception as e:
+		on_error(e)
+
+@functools.lru_cache(maxsize=2)
+def __load_job_scenario(scenario_cache_dir, scenario_name):
+	return ScenarioCache(scenario_cache_dir).load(scenario_name)
+
+def __run_matching_job(scenario_cache_dir, scenario_name, algorithm_name, parameters, directions, individual_timeout, global_timeout):
+	"""
+	Helper function to run a matching job on a worker process.
+	Matchings are returned to the main process, which is the only one writing to the session file.
+	"""
+	results = []
+	errors = []
+	__match_scenario(
+		__load_job_scenario(scenario_cache_dir, scenario_name), algorithm_name, parameters, directions, individual_timeout, global_timeout,
+		lambda *result: results.append(result),
+		lambda e: errors.append(str(e))
+	)
+	return results, errors
+
+def __get_source_and_target_elements(matchings, flip_input_matchings):
+	source_elements, target_elements = extract_elements(matchings)
+	source_elements_flip, target_elements_flip = extract_elements(flip_input_matchings)
+	source_elements.update(target_elements_flip)
+	target_elements.update(source_elements_flip)
+	return list(source_elements), list(target_elements)
+
+def __formulate_qubo_job(matching_id, matchings_lev, flip_input_matchings_lev, base_folder_path, qubo_folder_path, backend):
+	"""
+	Helper function to formulate a matching as a QUBO and append it to the QUBO store of the session, either on the main process or on a worker process.
+	Returns the reference to the QUBO in the store, relative to the base folder of the session, and the sizes of the QUBO.
+	"""
+	# copies, as prefixing names modifies the dictionaries in place
+	matchings = dict(matchings_lev)
+	prefix_source_target_names(matchings, "src__", "trg__")
+	flip_input_matchings = dict(flip_input_matchings_lev)
+	prefix_source_target_names(flip_input_matchings, "trg__", "src__")
+	
+	source_elements, target_elements = __get_source_and_target_elements(matchings, flip_input_matchings)
+	
+	full_matchings = {**matchings, **flip_input_matchings}
+	
+	qubo = formulate_as_qubo(full_matchings, source_elements, target_elements, backend)
+
+	number_of_variables = qubo.get_num_binary_vars()
+	linear_terms = qubo.objective.linear.to_dict()
+	quadratic_terms = qubo.objective.quadratic.to_dict()
+	
+	qubo_store_path = os.path.join(qubo_folder_path, qubo_store_file_name)
+	offset = append_to_qubo_store(qubo_store_path, matching_id, qubo)
+	
+	qubo_reference = qubo_store_reference(os.path.relpath(qubo_store_path, base_folder_path), offset)
+	return qubo_reference, number_of_variables, len(linear_terms), len(quadratic_terms)
+
+def __discretise_matching(matching, vectorised):
+	"""
+	Helper function to transform the confidence degrees of a matching into discrete ranks.
+	"""
+	if vectorised:
+		return translate_probabilities_to_levels_vectorised(matching, precision)
+	return translate_probabilities_to_levels(round_dict_values(matching, precision))
+
+def __hash_matching(matching):
+	"""
+	Helper function to compute the hash of a matching.
+	"""
+	return compute_matching_hash(matching, precision)
+
+def __compute_features(matchings_lev, flip_input_matchings_lev, vectorised):
+	"""
+	Helper function to transform discretised matchings into preference lists of the stable marriage problem, and determine their features.
+	Returns the tuple (is_symmetric, is_complete, has_ties, is_balanced).
+	"""
+	if vectorised:
+		return compute_features_vectorised(matchings_lev, flip_input_matchings_lev)
+
+	pref_of_source, infer_pref_of_target = build_preference_lists(matchings_lev)
+	pref_of_target, infer_pref_of_source = build_preference_lists(flip_input_matchings_lev)
+
+	is_symmetric = check_is_symmetric(pref_of_source, infer_pref_of_source, pref_of_target, infer_pref_of_target)
+	is_complete = check_is_complete(pref_of_source, pref_of_target)
+	has_ties = check_has_ties(pref_of_source) or check_has_ties(pref_of_target)
+	is_balanced = check_is_balanced(pref_of_source, pref_of_target)
+	return is_symmetric, is_complete, has_ties, is_balanced
+
+def __solve_qubo_job(matching_id, base_folder_path, qubo_formula, solver, sweeps, replicas, seed, timeout, threads, solved_formula_hash, solve_status, active_variables):
+	"""
+	Helper function to load and solve a QUBO, either on the main process or on a worker process.
+	Threads limits the threads of CPLEX, or the processes of the exact solver. The active variables of a former solution, if given,
+	are the starting point of CPLEX and simulated annealing. Returns the active variables, the objective value, the solve status, and the hash of the QUBO,
+	or None if the former solution is a proven optimum of the same QUBO.
+	"""
+	qubo = load_qubo(base_folder_path, qubo_formula)
+	qubo_hash = compute_qubo_hash(qubo)
+	if solve_status == "optimal" and solved_formula_hash == qubo_hash:
+		return None
+
+	initial_state = None if active_variables is None else get_qubo_state(qubo, active_variables.split(","))
+	if solver == "sa":
+		result = solve_qubo_with_simulated_annealing(qubo, sweeps, replicas, seed, timeout, initial_state)
+	elif solver == "exact":
+		result = solve_qubo_exactly(qubo, threads)
+	else:
+		result = solve_qubo_with_cplex(qubo, timeout, threads, initial_state)
+	return (*result, qubo_hash)
+
 @app.command()
 def initialise(
 	session_file: Annotated[
@@ -98,9 +264,46 @@ def initialise(
 		typer.echo(f"Error: Session file '{session_file}' already exists.")
 		raise typer.Exit()
 	
-	session = MatchingSession(session_file, __notification_fallback)	
+	session = MatchingSession(session_file, __notification_fallback, tuned_sessions)	
 	typer.echo(session_file)
 
+@app.command()
+def migrate_session(session_file: Optional[str] = session_file_arg_spec):
+	"""
+	Migrate the specified session file, created by a former version, to the current storage formats.
+	Matchings stored as JSON text are converted into the compact binary encoding,
+	and hashes computed by former versions are recomputed, so that unique matchings are still told apart consistently.
+	"""
+	session = __get_session(session_file)
+	i = 1
+	with session.batch():
+		for db_matching in cancelation_token.watch(session.get_all_json_encoded_matchings()):
+			print(f"\r{i}", end="")
+			session.reencode_matchings(db_matching.id)
+			i += 1
+
+	print("")
+
+	hashed_columns = {
+		"hash_matchings": "matchings",
+		"hash_matchings_lev": "matchings_lev",
+		"hash_flip_input_matchings": "flip_input_matchings",
+		"hash_flip_input_matchings_lev": "flip_input_matchings_lev"
+	}
+	i = 1
+	with session.batch():
+		for db_matching in cancelation_token.watch(session.get_all_legacy_hashed_matchings(columns=(*hashed_columns.values(), *hashed_columns))):
+			print(f"\r{i}", end="")
+			hashes = {
+				hash_column: __hash_matching(getattr(db_matching, column))
+				for hash_column, column in hashed_columns.items()
+				if getattr(db_matching, column) is not None and not is_current_matching_hash(getattr(db_matching, hash_column))
+			}
+			session.upload_postprocessing(db_matching.id, hashes)
+			i += 1
+
+	print("")
+
 @app.command()
 def list_repo_scenarios(
 	table: Annotated[
@@ -123,11 +326,9 @@ def list_repo_scenarios(
 	"""    
 	if table:
 		tbl = Table("No.", "Name", "Cardinality", "Source Column Count", "Target Column Count", "Ground Truth Size")
-		scenarios = (load_scenario(scenario_name, False) for scenario_name in scenario_names())
 		i = 1
-		for scenario in cancelation_token.watch(scenarios):
-			stats = scenario.get_stats()
-			tbl.add_row(str(i), scenario.name, str(stats.matching_type), str(stats.source_column_count), str(stats.target_column_count), str(stats.ground_truth_size))
+		for scenario_name, stats in cancelation_token.watch(scenario_catalogue().items()):
+			tbl.add_row(str(i), scenario_name, str(stats.matching_type), str(stats.source_column_count), str(stats.target_column_count), str(stats.ground_truth_size))
 			i += 1
 		console.print(tbl)
 	else:
@@ -158,7 +359,7 @@ def import_scenarios(
 	Scenario definitions include metadata only and not any actual data.
 	"""
 	session = __get_session(session_file)
-	available_scenarios = set(scenario_names())
+	available_scenarios = scenario_catalogue()
 	loaded_scenario_count = 0
 	try:
 		with open(scenario_names_file, "r") as file:
@@ -167,9 +368,7 @@ def import_scenarios(
 				if scenario_name not in available_scenarios:
 					typer.echo(f"Error: Scenario '{scenario_name}' not found in the repository.")
 					raise typer.Exit()
-				scenario = load_scenario(scenario_name, False)
-				stats = scenario.get_stats()
-				if session.upload_scenario(scenario, stats, override):
+				if session.upload_scenario(scenario_name, available_scenarios[scenario_name], override):
 					loaded_scenario_count += 1
 
 	except FileNotFoundError:
@@ -347,6 +546,17 @@ def run(
 			help="If set, the timeout value is applied to each direction of execution separately (st and ts)."
 		)
 	] = False,
+	workers: Annotated[
+		Optional[int],
+		typer.Option(
+			help=(
+				"The number of worker processes to run algorithms in parallel. "
+				"If set, jobs of a scenario, an algorithm configuration, and a direction are distributed across the workers, "
+				"while results are written to the session file by the main process only. "
+				"If not set, algorithms are run sequentially."
+			)
+		)
+	] = None,
 	session_file: Optional[str] = session_file_arg_spec
 ):
 	"""
@@ -361,6 +571,10 @@ def run(
 		typer.echo("Error: Timeout must be greater than 0 if specified.")
 		raise typer.Exit()
 
+	if workers is not None and workers < 1:
+		typer.echo("Error: The number of workers must be greater than or equal to 1 if specified.")
+		raise typer.Exit()
+
 	session = __get_session(session_file)
 
 	global_timeout = None
@@ -372,49 +586,82 @@ def run(
 
 	db_selected_scenarios = session.select_scenarios(None) # None, select all scenarios
 	db_selected_algorithms = session.select_algorithms(algorithm_name, None) # None, select all configurations
-	
-	for db_scenario in cancelation_token.watch(db_selected_scenarios):
-		scenario_data = load_scenario(db_scenario.name, True)
-		if scenario_data is None:
-			typer.echo(f"Scenario '{db_scenario.name}' from session not found in the repository.")
-			continue
-		
-		typer.echo(f"{db_scenario.name}")
-		i = 0
-		
-		for db_algorithm in cancelation_token.watch(db_selected_algorithms):
-			i += 1
-			print(f"\r{i}", end="")
+
+	def __pending_directions(db_scenario, db_algorithm):
+		db_exisitng_matching = session.get_matching(db_algorithm.id, db_scenario.id)
+		directions = []
+		if direction in ["both", "st"] and (override or db_exisitng_matching is None or db_exisitng_matching.matchings is None):
+			directions.append("st")
+		if direction in ["both", "ts"] and (override or db_exisitng_matching is None or db_exisitng_matching.flip_input_matchings is None):
+			directions.append("ts")
+		return tuple(directions)
+
+	def __upload_matching(db_scenario, db_algorithm, matching_direction, matches, time_matches, metrics):
+		if matching_direction == "st":
+			session.upload_matching(db_algorithm, db_scenario, matches, time_matches, metrics, override)
+		else:
+			session.upload_flipped_matching(db_algorithm, db_scenario, matches, time_matches, override)
+
+	if workers is None:
+		for db_scenario in cancelation_token.watch(db_selected_scenarios):
+			scenario_data = load_scenario(db_scenario.name, True)
+			if scenario_data is None:
+				typer.echo(f"Scenario '{db_scenario.name}' from session not found in the repository.")
+				continue
 			
-			matcher = get_first_matcher(db_algorithm.name, json_to_dict(db_algorithm.parameters))
-			source_name, target_name = prepare_source_target_names(scenario_data.source_name, scenario_data.target_name)
-			db_exisitng_matching = session.get_matching(db_algorithm.id, db_scenario.id)
+			typer.echo(f"{db_scenario.name}")
+			i = 0
 			
-			def __do_matching():
-				died = False
-				if direction in ["both", "st"] and (override or db_exisitng_matching is None or db_exisitng_matching.matchings is None):
-					try:
-						matches, time_matches = timer(lambda: valentine_match(scenario_data.source_df, scenario_data.target_df, matcher, source_name, target_name), individual_timeout)
-						metrics = matches.get_metrics(scenario_data.ground_truth_as_tuples())
-						session.upload_matching(db_algorithm, db_scenario, matches, time_matches, metrics, override)
-					except Exception as e:
-						died = True
-						typer.echo(e)
-						
-				if not died and direction in ["both", "ts"] and (override or db_exisitng_matching is None or db_exisitng_matching.flip_input_matchings is None):
-					try:
-						flip_input_matches, time_flip_input_matches = timer(lambda: valentine_match(scenario_data.target_df, scenario_data.source_df, matcher, target_name, source_name), individual_timeout)
-						session.upload_flipped_matching(db_algorithm, db_scenario, flip_input_matches, time_flip_input_matches, override)
-					except Exception as e:
-						died = True
-						typer.echo(e)
-						
-			try:
-				timer(__do_matching, global_timeout)
-			except Exception as e:
-				typer.echo(e)
+			for db_algorithm in cancelation_token.watch(db_selected_algorithms):
+				i += 1
+				print(f"\r{i}", end="")
+				
+				__match_scenario(
+					scenario_data, db_algorithm.name, db_algorithm.parameters, __pending_directions(db_scenario, db_algorithm),
+					individual_timeout, global_timeout,
+					lambda *result: __upload_matching(db_scenario, db_algorithm, *result),
+					typer.echo
+				)
 
-		print("")
+			print("")
+		return
+
+	# scenarios are parsed once into the session folder and shared with the workers from there
+	session_folder, base_folder_path, scenario_cache_path = __session_folders(session.session_file, "scenarios")
+	scenario_cache = ScenarioCache(scenario_cache_path)
+
+	db_scenarios_by_name = {db_scenario.name: db_scenario for db_scenario in db_selected_scenarios}
+	db_algorithms_by_key = {(db_algorithm.name, db_algorithm.parameters): db_algorithm for db_algorithm in db_selected_algorithms}
+
+	def __jobs():
+		for db_scenario in db_selected_scenarios:
+			if not scenario_cache.prepare(db_scenario.name):
+				typer.echo(f"Scenario '{db_scenario.name}' from session not found in the repository.")
+				continue
+			for db_algorithm in db_selected_algorithms:
+				directions = __pending_directions(db_scenario, db_algorithm)
+				if not directions:
+					continue
+				# a global timeout spans both directions, thus they can only be split when timed separately
+				direction_groups = [(d,) for d in directions] if timeout_by_direction else [directions]
+				for direction_group in direction_groups:
+					yield scenario_cache_path, db_scenario.name, db_algorithm.name, db_algorithm.parameters, direction_group, individual_timeout, global_timeout
+
+	i = 0
+	for job, result, error in pool_map(__run_matching_job, __jobs(), workers, cancelation_token):
+		i += 1
+		print(f"\r{i}", end="")
+		scenario_name, job_algorithm_name, parameters = job[1:4]
+		if error is not None:
+			typer.echo(error)
+			continue
+		results, errors = result
+		for matching_direction, matches, time_matches, metrics in results:
+			__upload_matching(db_scenarios_by_name[scenario_name], db_algorithms_by_key[(job_algorithm_name, parameters)], matching_direction, matches, time_matches, metrics)
+		for e in errors:
+			typer.echo(e)
+
+	print("")
 
 @app.command()
 def plot_match_dist(
@@ -437,6 +684,15 @@ def compute_discretisation(
 			)
 		)
 	] = False,
+	vectorised: Annotated[
+		bool,
+		typer.Option(
+			help=(
+				"If set, discretisation is computed with vectorised array operations, which is faster on large matchings. "
+				"Results are identical either way."
+			)
+		)
+	] = False,
 	session_file: Optional[str] = session_file_arg_spec
 ):
 	"""
@@ -445,16 +701,18 @@ def compute_discretisation(
 	"""
 	session = __get_session(session_file)
 	i = 1
-	for db_matching in cancelation_token.watch(session.get_all_matchings()):
-		print(f"\r{i}", end="")
-		if db_matching.matchings is not None and (override or db_matching.matchings_lev is None):
-			matches_lev = translate_probabilities_to_levels(round_dict_values(json_to_dict_with_tuples(db_matching.matchings), precision))
-			session.upload_matching_as_preferences(db_matching.id, matches_lev)
+	columns = ("matchings", "matchings_lev", "flip_input_matchings", "flip_input_matchings_lev")
+	with session.batch():
+		for db_matching in cancelation_token.watch(session.get_all_matchings(columns=columns)):
+			print(f"\r{i}", end="")
+			if db_matching.matchings is not None and (override or db_matching.matchings_lev is None):
+				matches_lev = __discretise_matching(db_matching.matchings, vectorised)
+				session.upload_matching_as_preferences(db_matching.id, matches_lev)
 			
-		if db_matching.flip_input_matchings is not None and (override or db_matching.flip_input_matchings_lev is None):
-			flip_input_matches_lev = translate_probabilities_to_levels(round_dict_values(json_to_dict_with_tuples(db_matching.flip_input_matchings), precision))
-			session.upload_flipped_matching_as_preferences(db_matching.id, flip_input_matches_lev)
-		i += 1
+			if db_matching.flip_input_matchings is not None and (override or db_matching.flip_input_matchings_lev is None):
+				flip_input_matches_lev = __discretise_matching(db_matching.flip_input_matchings, vectorised)
+				session.upload_flipped_matching_as_preferences(db_matching.id, flip_input_matches_lev)
+			i += 1
 		
 	print("")
 	
@@ -473,33 +731,31 @@ def compute_hash(
 	"""
 	Compute a hash from matchings in the specified session file.
 	"""
-	def __parse_matching_json(matching_json):
-		# if json_to_dict_with_tuples is used instead of json.loads hashing won't take
-		# into account the ordering of the inner elements (tuples) of the keys and thus
-		# hashes will be equal between hash_matchings and hash_flip_input_matchings. this is NOT
-		# desired behaviour, thus use json.loads only
-		return round_dict_values(json.loads(matching_json), precision) 
-	
 	session = __get_session(session_file)
 	i = 1
-	for db_matching in cancelation_token.watch(session.get_all_matchings()):
-		print(f"\r{i}", end="")
-		if db_matching.matchings is not None and (override or db_matching.hash_matchings is None):
-			hash_matchings = compute_object_hash(__parse_matching_json(db_matching.matchings))
-			session.upload_matching_hash(db_matching.id, hash_matchings)
+	columns = (
+		"matchings", "matchings_lev", "flip_input_matchings", "flip_input_matchings_lev",
+		"hash_matchings", "hash_matchings_lev", "hash_flip_input_matchings", "hash_flip_input_matchings_lev"
+	)
+	with session.batch():
+		for db_matching in cancelation_token.watch(session.get_all_matchings(columns=columns)):
+			print(f"\r{i}", end="")
+			if db_matching.matchings is not None and (override or not is_current_matching_hash(db_matching.hash_matchings)):
+				hash_matchings = __hash_matching(db_matching.matchings)
+				session.upload_matching_hash(db_matching.id, hash_matchings)
 			
-		if db_matching.matchings_lev is not None and (override or db_matching.hash_matchings_lev is None):
-			hash_matchings_lev = compute_object_hash(__parse_matching_json(db_matching.matchings_lev))
-			session.upload_matching_as_preferences_hash(db_matching.id, hash_matchings_lev)
+			if db_matching.matchings_lev is not None and (override or not is_current_matching_hash(db_matching.hash_matchings_lev)):
+				hash_matchings_lev = __hash_matching(db_matching.matchings_lev)
+				session.upload_matching_as_preferences_hash(db_matching.id, hash_matchings_lev)
 			
-		if db_matching.flip_input_matchings is not None and (override or db_matching.hash_flip_input_matchings is None):
-			hash_flip_input_matchings = compute_object_hash(__parse_matching_json(db_matching.flip_input_matchings))
-			session.upload_flipped_matching_hash(db_matching.id, hash_flip_input_matchings)
+			if db_matching.flip_input_matchings is not None and (override or not is_current_matching_hash(db_matching.hash_flip_input_matchings)):
+				hash_flip_input_matchings = __hash_matching(db_matching.flip_input_matchings)
+				session.upload_flipped_matching_hash(db_matching.id, hash_flip_input_matchings)
 			
-		if db_matching.flip_input_matchings_lev is not None and (override or db_matching.hash_flip_input_matchings_lev is None):
-			hash_flip_input_matchings_lev = compute_object_hash(__parse_matching_json(db_matching.flip_input_matchings_lev))
-			session.upload_flipped_matching_as_preferences_hash(db_matching.id, hash_flip_input_matchings_lev)
-		i += 1
+			if db_matching.flip_input_matchings_lev is not None and (override or not is_current_matching_hash(db_matching.hash_flip_input_matchings_lev)):
+				hash_flip_input_matchings_lev = __hash_matching(db_matching.flip_input_matchings_lev)
+				session.upload_flipped_matching_as_preferences_hash(db_matching.id, hash_flip_input_matchings_lev)
+			i += 1
 
 	print("")
 
@@ -513,6 +769,15 @@ def compute_features(
 			)
 		)
 	] = False,
+	vectorised: Annotated[
+		bool,
+		typer.Option(
+			help=(
+				"If set, features are determined with vectorised array operations on interned elements, which is faster on large matchings. "
+				"Results are identical either way."
+			)
+		)
+	] = False,
 	session_file: Optional[str] = session_file_arg_spec
 ):
 	"""
@@ -522,22 +787,84 @@ def compute_features(
 	"""
 	session = __get_session(session_file)
 	i = 1
-	for db_matching in cancelation_token.watch(session.get_all_matchings()):
-		print(f"\r{i}", end="")
-		if db_matching.matchings_lev is not None and db_matching.flip_input_matchings_lev is not None and (override or db_matching.is_symmetric is None):
-			matchings = json_to_dict_with_tuples(db_matching.matchings_lev)
-			pref_of_source, infer_pref_of_target = build_preference_lists(matchings)
-					
-			flip_input_matchings = json_to_dict_with_tuples(db_matching.flip_input_matchings_lev)
-			pref_of_target, infer_pref_of_source = build_preference_lists(flip_input_matchings)
-
-			is_symmetric = check_is_symmetric(pref_of_source, infer_pref_of_source, pref_of_target, infer_pref_of_target)
-			is_complete = check_is_complete(pref_of_source, pref_of_target)
-			has_ties = check_has_ties(pref_of_source) or check_has_ties(pref_of_target)
-			is_balanced = check_is_balanced(pref_of_source, pref_of_target)
+	columns = ("matchings_lev", "flip_input_matchings_lev", "is_symmetric")
+	with session.batch():
+		for db_matching in cancelation_token.watch(session.get_all_matchings(columns=columns)):
+			print(f"\r{i}", end="")
+			if db_matching.matchings_lev is not None and db_matching.flip_input_matchings_lev is not None and (override or db_matching.is_symmetric is None):
+				is_symmetric, is_complete, has_ties, is_balanced = __compute_features(db_matching.matchings_lev, db_matching.flip_input_matchings_lev, vectorised)
+				session.upload_features(db_matching.id, is_symmetric, is_complete, has_ties, is_balanced)
+			i += 1
+		
+	print("")
+
+@app.command()
+def postprocess(
+	override: Annotated[
+		bool,
+		typer.Option(
+			help=(
+				"If set, existing discretisation results, hash values and computed features will be overwritten. "
+			)
+		)
+	] = False,
+	vectorised: Annotated[
+		bool,
+		typer.Option(
+			help=(
+				"If set, discretisation and features are computed with vectorised array operations, which is faster on large matchings. "
+				"Results are identical either way."
+			)
+		)
+	] = False,
+	session_file: Optional[str] = session_file_arg_spec
+):
+	"""
+	Discretise, hash, and determine the features of the matchings in the specified session file in a single pass.
+	Equivalent to running compute-discretisation, compute-hash, and compute-features one after the other,
+	but each matching is read once and its results are written at once.
+	"""
+	session = __get_session(session_file)
+	i = 1
+	columns = (
+		"matchings", "matchings_lev", "flip_input_matchings", "flip_input_matchings_lev",
+		"hash_matchings", "hash_matchings_lev", "hash_flip_input_matchings", "hash_flip_input_matchings_lev", "is_symmetric"
+	)
+	with session.batch():
+		for db_matching in cancelation_token.watch(session.get_all_matchings(columns=columns)):
+			print(f"\r{i}", end="")
+			values = {}
+			matchings_lev = db_matching.matchings_lev
+			flip_input_matchings_lev = db_matching.flip_input_matchings_lev
 			
-			session.upload_features(db_matching.id, is_symmetric, is_complete, has_ties, is_balanced)
-		i += 1
+			if db_matching.matchings is not None and (override or matchings_lev is None):
+				matchings_lev = values["matchings_lev"] = __discretise_matching(db_matching.matchings, vectorised)
+			
+			if db_matching.flip_input_matchings is not None and (override or flip_input_matchings_lev is None):
+				flip_input_matchings_lev = values["flip_input_matchings_lev"] = __discretise_matching(db_matching.flip_input_matchings, vectorised)
+			
+			# hashes and features derived from discretised matchings computed in this pass are refreshed along with them
+			if db_matching.matchings is not None and (override or not is_current_matching_hash(db_matching.hash_matchings)):
+				values["hash_matchings"] = __hash_matching(db_matching.matchings)
+			
+			if matchings_lev is not None and (override or "matchings_lev" in values or not is_current_matching_hash(db_matching.hash_matchings_lev)):
+				values["hash_matchings_lev"] = __hash_matching(matchings_lev)
+			
+			if db_matching.flip_input_matchings is not None and (override or not is_current_matching_hash(db_matching.hash_flip_input_matchings)):
+				values["hash_flip_input_matchings"] = __hash_matching(db_matching.flip_input_matchings)
+			
+			if flip_input_matchings_lev is not None and (override or "flip_input_matchings_lev" in values or not is_current_matching_hash(db_matching.hash_flip_input_matchings_lev)):
+				values["hash_flip_input_matchings_lev"] = __hash_matching(flip_input_matchings_lev)
+			
+			if matchings_lev is not None and flip_input_matchings_lev is not None and (
+				override or "matchings_lev" in values or "flip_input_matchings_lev" in values or db_matching.is_symmetric is None
+			):
+				features = __compute_features(matchings_lev, flip_input_matchings_lev, vectorised)
+				values.update(zip(("is_symmetric", "is_complete", "has_ties", "is_balanced"), features))
+			
+			if values:
+				session.upload_postprocessing(db_matching.id, values)
+			i += 1
 		
 	print("")
 
@@ -592,7 +919,7 @@ def export_uniques_by_class(
 	Matchings that already exist in the destination session file are skipped.
 	"""
 	session = __get_session(session_name)	
-	bkp = MatchingSession(destination, __notification_fallback)	
+	bkp = MatchingSession(destination, __notification_fallback, tuned_sessions)	
 	session.export_representative_matchings(bkp, complexity, (start, end))
 	
 @app.command()
@@ -623,48 +950,119 @@ def formulate_qubo(
 			)
 		)
 	] = False,
+	backend: Annotated[
+		str,
+		typer.Option(
+			help=(
+				"The backend formulating the QUBOs: 'sparse' accumulates the coefficients directly, "
+				"'docplex' builds a docplex model as the original QuantumLove implementation does. Both yield identical QUBOs."
+			)
+		)
+	] = "sparse",
+	workers: Annotated[
+		Optional[int],
+		typer.Option(
+			help=(
+				"The number of worker processes formulating QUBOs in parallel. "
+				"Workers append to the QUBO store, while the session file is written by the main process only. "
+				"If not set, QUBOs are formulated sequentially."
+			)
+		)
+	] = None,
 	session_file: Optional[str] = session_file_arg_spec
 ):
 	"""
-	Formulates matchings in the specified session file as QUBOs. The resulting QUBO formulations are written to separate files
-	in a folder with the same name as the session file.
+	Formulates matchings in the specified session file as QUBOs. The resulting QUBO formulations are appended to a single binary QUBO store
+	in a folder with the same name as the session file. Use export-qubo to obtain them as LP files.
 	"""
-	def __get_source_and_target_elements(matchings, flip_input_matchings):
-		source_elements, target_elements = extract_elements(matchings)
-		source_elements_flip, target_elements_flip = extract_elements(flip_input_matchings)
-		source_elements.update(target_elements_flip)
-		target_elements.update(source_elements_flip)
-		return list(source_elements), list(target_elements)
+	if backend not in qubo_backends:
+		typer.echo(f"Error: Backend must be one of {', '.join(repr(b) for b in qubo_backends)}.")
+		raise typer.Exit()
+
+	if workers is not None and workers < 1:
+		typer.echo("Error: The number of workers must be greater than or equal to 1 if specified.")
+		raise typer.Exit()
 
 	session = __get_session(session_file)
 
 	session_folder, base_folder_path, qubo_folder_path = __session_folders(session.session_file, "qubos")
 
+	columns = ("matchings_lev", "flip_input_matchings_lev", "qubo_formula")
+	def __jobs():
+		for db_matching in session.get_all_matchings((start, end), columns):
+			if db_matching.matchings_lev is not None and db_matching.flip_input_matchings_lev is not None and (override or db_matching.qubo_formula is None):
+				yield db_matching.id, db_matching.matchings_lev, db_matching.flip_input_matchings_lev, base_folder_path, qubo_folder_path, backend
+
 	i = 1
-	for db_matching in cancelation_token.watch(session.get_all_matchings((start, end))):
-		print(f"\r{i}", end="")
-		if db_matching.matchings_lev is not None and db_matching.flip_input_matchings_lev is not None and (override or db_matching.qubo_formula is None):
-			matchings = json_to_dict_with_tuples(db_matching.matchings_lev)
-			prefix_source_target_names(matchings, "src__", "trg__")
-			flip_input_matchings = json_to_dict_with_tuples(db_matching.flip_input_matchings_lev)
-			prefix_source_target_names(flip_input_matchings, "trg__", "src__")
-			
-			source_elements, target_elements = __get_source_and_target_elements(matchings, flip_input_matchings)
-			
-			full_matchings = {**matchings, **flip_input_matchings}
-			
-			qubo = formulate_as_qubo(full_matchings, source_elements, target_elements)
+	with session.batch():
+		if workers is None:
+			for job in cancelation_token.watch(__jobs()):
+				print(f"\r{i}", end="")
+				session.upload_qubo_formula(job[0], *__formulate_qubo_job(*job))
+				i += 1
+		else:
+			for job, result, error in pool_map(__formulate_qubo_job, __jobs(), workers, cancelation_token):
+				print(f"\r{i}", end="")
+				if error is not None:
+					typer.echo(error)
+				else:
+					session.upload_qubo_formula(job[0], *result)
+				i += 1
 
-			number_of_variables = qubo.get_num_binary_vars()
-			linear_terms = qubo.objective.linear.to_dict()
-			quadratic_terms = qubo.objective.quadratic.to_dict()
-			
-			qubo_file_name = f"{db_matching.id}.lp"
-			qubo_file_path = os.path.join(qubo_folder_path, qubo_file_name)
-			qubo.write_to_lp_file(qubo_file_path)
-			
-			relative_qubo_path = os.path.relpath(qubo_file_path, base_folder_path)
-			session.upload_qubo_formula(db_matching.id, relative_qubo_path, number_of_variables, len(linear_terms), len(quadratic_terms))
+	print("")
+
+@app.command()
+def export_qubo(
+	start: Annotated[
+		Optional[int],
+		typer.Option(
+			help=(
+				"The starting index of the range of matchings in the session file whose QUBOs will be exported. "
+				"If not specified, starts from the first matching."
+			)
+		)
+	] = None,
+	end: Annotated[
+		Optional[int],
+		typer.Option(
+			help=(
+				"The ending index of the range of matchings in the session file whose QUBOs will be exported. "
+				"If not specified, processes up to the last matching."
+			)
+		)
+	] = None,
+	output_folder: Annotated[
+		Optional[str],
+		typer.Option(
+			help=(
+				"Path to the folder the LP files are written to. "
+				"If not set, they are written to the qubos folder next to the QUBO store."
+			)
+		)
+	] = None,
+	session_file: Optional[str] = session_file_arg_spec
+):
+	"""
+	Exports the QUBO formulations of matchings in the specified session file as LP files, one per matching, named after the matching id.
+	"""
+	session = __get_session(session_file)
+
+	session_folder, base_folder_path, qubo_folder_path = __session_folders(session.session_file, "qubos")
+	if output_folder is not None:
+		os.makedirs(output_folder, exist_ok=True)
+		qubo_folder_path = output_folder
+
+	i = 1
+
+	columns = ("qubo_formula",)
+	for db_matching in cancelation_token.watch(session.get_all_matchings((start, end), columns)):
+		print(f"\r{i}", end="")
+		if db_matching.qubo_formula is not None:
+			try:
+				qubo = load_qubo(base_folder_path, db_matching.qubo_formula)
+				qubo.write_to_lp_file(os.path.join(qubo_folder_path, f"{db_matching.id}.lp"))
+			except Exception as e:
+				typer.echo(e)
 		i += 1
 
 	print("")
@@ -723,65 +1121,179 @@ def solve_qubo(
 	timeout: Annotated[
 		Optional[int],
 		typer.Option(
-			help="Timeout value in seconds for solving QUBOs (supported on all operating systems)."
+			help="Timeout value in seconds for solving QUBOs (supported on all operating systems). The 'sa' solver stops annealing once it is exceeded and keeps the best replica."
 		)
 	] = None,
 	override: Annotated[
 		bool,
 		typer.Option(
 			help=(
-				"If set, existing QUBO solutions will be overwritten. "
+				"If set, existing QUBO solutions will be overwritten, except proven optimal solutions of QUBOs that have not changed since, "
+				"whose metrics are computed again against the current ground truth instead. "
+			)
+		)
+	] = False,
+	force: Annotated[
+		bool,
+		typer.Option(
+			help=(
+				"If set along with --override, QUBOs whose stored solution is a proven optimum of their unchanged QUBO are solved again as well. "
 			)
 		)
 	] = False,
+	persist_ground_truth: Annotated[
+		bool,
+		typer.Option(
+			help=(
+				"If set, ground truths read from the repository are stored in the session file, "
+				"so that further metrics computations do not read them from the repository again. "
+			)
+		)
+	] = False,
+	solver: Annotated[
+		str,
+		typer.Option(
+			help=(
+				"The solver for the QUBOs: 'cplex' solves them with CPLEX through docplex, "
+				"'sa' runs simulated annealing on a batch of replicas with NumPy, which does not require CPLEX and scales to larger QUBOs, but does not prove optimality. "
+				"'exact' enumerates all assignments in Gray code order on a single process, or on the share of the CPUs of each worker with --workers, "
+				f"breaking ties in favour of the smallest assignment, which proves optimality for QUBOs with up to {exact_solver_max_variables} variables and ignores the timeout."
+			)
+		)
+	] = "cplex",
+	sweeps: Annotated[
+		int,
+		typer.Option(
+			help="The number of sweeps over all variables of a QUBO by simulated annealing. Only used by the 'sa' solver."
+		)
+	] = 1000,
+	replicas: Annotated[
+		int,
+		typer.Option(
+			help="The number of replicas annealed at once by simulated annealing, of which the best one is kept. Only used by the 'sa' solver."
+		)
+	] = 64,
+	seed: Annotated[
+		Optional[int],
+		typer.Option(
+			help="The seed of the random number generator of simulated annealing, for reproducible solutions. Only used by the 'sa' solver."
+		)
+	] = None,
+	warm_start: Annotated[
+		bool,
+		typer.Option(
+			help=(
+				"If set, QUBOs that already have a solution, which are solved again with --override, start from that solution: "
+				"it is passed to CPLEX as MIP start, and to simulated annealing as the initial state of the first replica. "
+			)
+		)
+	] = True,
+	workers: Annotated[
+		Optional[int],
+		typer.Option(
+			help=(
+				"The number of worker processes solving QUBOs in parallel, each limited to an even share of the CPUs. "
+				"Solutions are written to the session file by the main process only. "
+				"If not set, QUBOs are solved sequentially."
+			)
+		)
+	] = None,
 	session_file: Optional[str] = session_file_arg_spec
 ):
 	"""
 	Solve QUBO formulations, using classical methods, for the matchings in the specified session file.
 	Metrics for the solutions are also computed against the corresponding ground truth.
+	With --override, matchings whose stored solution is a proven optimum of their unchanged QUBO are not solved again unless --force is set;
+	only the metrics of their stored solution are computed again.
 	"""
+	if solver not in qubo_solvers:
+		typer.echo(f"Error: Solver must be one of {', '.join(repr(s) for s in qubo_solvers)}.")
+		raise typer.Exit()
+
+	if sweeps < 1 or replicas < 1:
+		typer.echo("Error: The number of sweeps and replicas must be greater than or equal to 1.")
+		raise typer.Exit()
+
+	if workers is not None and workers < 1:
+		typer.echo("Error: The number of workers must be greater than or equal to 1 if specified.")
+		raise typer.Exit()
+
+	if force and not override:
+		typer.echo("Error: --force can only be used along with --override.")
+		raise typer.Exit()
+
 	session = __get_session(session_file)
 
 	session_folder, base_folder_path = __session_folders(session.session_file)
 	
-	i = 1
-	
-	for db_matching in cancelation_token.watch(session.get_all_matchings((start, end))):
-		print(f"\r{i}", end="")
-		if db_matching.qubo_formula is not None and (override or db_matching.qubo_matchings is None):
-			
-			if max_variables is not None and db_matching.qubo_number_of_variables > max_variables:
-				continue
+	threads = None if workers is None else max(1, (os.cpu_count() or 1) // workers)
+	pending = {}
+	skipped = 0
 
-			qubo_file_path = os.path.join(base_folder_path, db_matching.qubo_formula)
-			qubo = QuadraticProgram()
-			qubo.read_from_lp_file(qubo_file_path)
-			docplex_model = get_docplex_model(qubo)
-			
-			try:
-				if timeout is not None:
-					docplex_model.context.cplex_parameters.timelimit = timeout
-				solution = docplex_model.solve()
-				opt_value = solution.get_objective_value()
-				active_vars = [var.name for var in docplex_model.iter_variables() if solution.get_value(var) != 0]
-				
-				source_name, target_name = get_source_target_names(db_matching.dataset.name)
-				matchings = interpret_qubo_variables_as_matching(active_vars, source_name, target_name)
-				
-				session.upload_qubo_matchings(db_matching.id, matchings, active_vars, opt_value)
-				
-				# metrics
-				scenario_data = load_scenario(db_matching.dataset.name, False) # actual data is not needed. only the ground truths.
-				matchings_as_valentine = instanciate_results(matchings)
-				metrics = matchings_as_valentine.get_metrics(scenario_data.ground_truth_as_tuples())
-				session.upload_qubo_matchings_metrics(db_matching.id, metrics)
+	# smaller QUBOs are solved first, so that their solutions are stored early
+	columns = ("dataset_id", "qubo_formula", "qubo_number_of_variables", "qubo_matchings", "qubo_active_variables", "qubo_formula_hash", "qubo_solve_status")
+	def __jobs():
+		for db_matching in session.get_all_matchings_order_by_qubo_number_of_variables((start, end), columns):
+			if db_matching.qubo_formula is not None and (override or db_matching.qubo_matchings is None):
+				if max_variables is not None and db_matching.qubo_number_of_variables > max_variables:
+					continue
+				pending[db_matching.id] = (db_matching.dataset, db_matching.qubo_matchings)
+				active_variables = db_matching.qubo_active_variables if warm_start else None
+				# without a solve status, the stored solution never counts as a proven optimum, so that it is solved again
+				solve_status = None if force else db_matching.qubo_solve_status
+				yield (
+					db_matching.id, base_folder_path, db_matching.qubo_formula, solver, sweeps, replicas, seed, timeout, threads,
+					db_matching.qubo_formula_hash, solve_status, active_variables
+				)
 
-			except Exception as e:
-				typer.echo(e)
+	def __store_solution(matching_id, result):
+		nonlocal skipped
+		dataset, matchings = pending.pop(matching_id)
+		if result is None:
+			# the stored solution is kept, but the ground truth may have changed since its metrics were computed
+			skipped += 1
+		else:
+			active_vars, opt_value, solve_status, qubo_hash = result
+			source_name, target_name = get_source_target_names(dataset.name)
+			matchings = interpret_qubo_variables_as_matching(active_vars, source_name, target_name)
 			
-		i += 1
+			session.upload_qubo_matchings(matching_id, matchings, active_vars, opt_value, solve_status, qubo_hash)
+		
+		# metrics
+		ground_truth = __get_ground_truth(session, dataset, persist_ground_truth)
+		matchings_as_valentine = instanciate_results(matchings)
+		metrics = matchings_as_valentine.get_metrics(ground_truth)
+		session.upload_qubo_matchings_metrics(matching_id, metrics)
+
+	i = 1
+	with session.batch():
+		if workers is None:
+			for job in cancelation_token.watch(__jobs()):
+				print(f"\r{i}", end="")
+				try:
+					__store_solution(job[0], __solve_qubo_job(*job))
+				except Exception as e:
+					pending.pop(job[0], None)
+					typer.echo(e)
+				i += 1
+		else:
+			for job, result, error in pool_map(__solve_qubo_job, __jobs(), workers, cancelation_token):
+				print(f"\r{i}", end="")
+				try:
+					if error is not None:
+						raise error
+					__store_solution(job[0], result)
+				except Exception as e:
+					pending.pop(job[0], None)
+					typer.echo(e)
+				i += 1
 
 	print("")
+	if skipped > 0:
+		typer.echo(
+			f"Skipped {skipped} matchings whose stored solution is a proven optimum of their unchanged QUBO; only their metrics were computed again. "
+			"Use --force to solve them again."
+		)
 
 @app.command()
 def build_qaoa_circuit(
@@ -820,13 +1332,12 @@ def build_qaoa_circuit(
 	
 	i = 1
 
-	for db_matching in cancelation_token.watch(session.get_all_matchings_order_by_qubo_size()):
+	columns = ("qubo_formula", "qaoa_depth")
+	for db_matching in cancelation_token.watch(session.get_all_matchings_order_by_qubo_size(columns)):
 		print(f"\r{i}", end="")
 
 		if db_matching.qubo_formula is not None and (override or db_matching.qaoa_depth is None):			
-			qubo_file_path = os.path.join(base_folder_path, db_matching.qubo_formula)
-			qubo = QuadraticProgram()
-			qubo.read_from_lp_file(qubo_file_path)
+			qubo = load_qubo(base_folder_path, db_matching.qubo_formula)
 
 			def __do_build_circuit():
 				circuit, depth, width, time_ansatz, time_transpile = get_qaoa_cicuit(qubo, p)
@@ -868,6 +1379,15 @@ def run_qaoa_circuit(
 			)
 		)
 	] = False,
+	persist_ground_truth: Annotated[
+		bool,
+		typer.Option(
+			help=(
+				"If set, ground truths read from the repository are stored in the session file, "
+				"so that further metrics computations do not read them from the repository again. "
+			)
+		)
+	] = False,
 	session_file: Optional[str] = session_file_arg_spec
 ):
 	"""
@@ -884,7 +1404,8 @@ def run_qaoa_circuit(
 	
 	i = 1
 
-	for db_matching in cancelation_token.watch(session.get_all_matchings()):
+	columns = ("dataset_id", "qubo_formula", "qaoa_p", "qaoa_width", "qaoa_matchings")
+	for db_matching in cancelation_token.watch(session.get_all_matchings(columns=columns)):
 		print(f"\r{i}", end="")
 		
 		if db_matching.qubo_formula is not None and (override or db_matching.qaoa_matchings is None):
@@ -892,9 +1413,7 @@ def run_qaoa_circuit(
 			if max_width is not None and db_matching.qaoa_width > max_width:
 				continue
 			
-			qubo_file_path = os.path.join(base_folder_path, db_matching.qubo_formula)
-			qubo = QuadraticProgram()
-			qubo.read_from_lp_file(qubo_file_path)
+			qubo = load_qubo(base_folder_path, db_matching.qubo_formula)
 			
 			source_name, target_name = get_source_target_names(db_matching.dataset.name)
 			active_vars, opt_value = run_qaoa_cicuit(qubo, db_matching.qaoa_p, shots)
@@ -903,9 +1422,9 @@ def run_qaoa_circuit(
 			session.upload_qaoa_matchings(db_matching.id, shots, matchings, active_vars, opt_value)
 
 			# metrics
-			scenario_data = load_scenario(db_matching.dataset.name, False) # actual data is not needed. only the ground truths.
+			ground_truth = __get_ground_truth(session, db_matching.dataset, persist_ground_truth)
 			matchings_as_valentine = instanciate_results(matchings)
-			metrics = matchings_as_valentine.get_metrics(scenario_data.ground_truth_as_tuples())
+			metrics = matchings_as_valentine.get_metrics(ground_truth)
 			session.upload_qaoa_matchings_metrics(db_matching.id, metrics)
 
 		i += 1
@@ -59,7 +59,7 @@ def plot_match_dist(session, output_file=None):
 
 	c = 1
 
-	for matching in session.get_all_matchings():
+	for matching in session.get_all_matchings(columns=("dataset_id", "recall_ground_truth_size")):
 		#print(f"\r{c}", end="")
 	
 		ground_truth_size = matching.dataset.ground_truth_size
@@ -61,7 +61,7 @@ def plot_qaoa_dist(session, output_file=None):
 
 	c = 1
 	
-	for matching in session.get_all_matchings():
+	for matching in session.get_all_matchings(columns=("qaoa_depth", "qaoa_width", "qubo_number_of_linear_terms")):
 		if matching.qaoa_depth is not None:
 			#print(f"\r{c}", end="")
 				
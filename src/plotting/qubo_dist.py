@@ -57,7 +57,7 @@ def plot_qubo_dist(session, output_file=None):
 	unique_sources = set()
 
 	c = 1
-	for matching in session.get_all_matchings():
+	for matching in session.get_all_matchings(columns=("qubo_number_of_variables", "qubo_number_of_quadratic_terms")):
 		#print(f"\r{c}", end="")	
 
 		n.append(matching.qubo_number_of_variables)
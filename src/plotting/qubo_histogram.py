@@ -10,7 +10,7 @@ def plot_qubo_histogram(session, output_file=None):
 	linear_terms = []
 	quadratic_terms = []
 
-	for matching in session.get_all_matchings():
+	for matching in session.get_all_matchings(columns=("qubo_number_of_variables", "qubo_number_of_quadratic_terms")):
 		linear_terms.append(matching.qubo_number_of_variables)
 		quadratic_terms.append(matching.qubo_number_of_quadratic_terms)
 
@@ -113,7 +113,7 @@ def plot_qubo_qaoa_dist(session, output_file=None):
 
 	c = 0
 	total_points = 0
-	for matching in session.get_all_matchings():
+	for matching in session.get_all_matchings(columns=("qubo_formula", "qaoa_depth", "qaoa_width", "qaoa_time_ansatz", "qaoa_time_transpile", "qubo_number_of_quadratic_terms")):
 		if matching.qubo_formula is not None:
 			total_points += 1
 			if matching.qaoa_depth is not None:
@@ -21,9 +21,16 @@ def __build_metrics_df(session, group):
 		else:
 			return matching.qaoa_recall_ground_truth_size
 
-	for matching in session.get_all_matchings():
+	columns = ("dataset_id", "recall_ground_truth_size", "qubo_recall_ground_truth_size", "qaoa_recall_ground_truth_size")
+	for matching in session.get_all_matchings(columns=columns):
 		if __has_metrics(matching):
-			data.append({'id': matching.id, 'recall_ground_truth_size': __get_metrics(matching)})
+			data.append({
+				'id': matching.id,
+				'recall_ground_truth_size': __get_metrics(matching),
+				'algorithm_recall_ground_truth_size': matching.recall_ground_truth_size,
+				'dataset_name': matching.dataset.name,
+				'ground_truth_size': matching.dataset.ground_truth_size
+			})
 
 	df = pd.DataFrame(data)
 	return df
@@ -33,26 +40,23 @@ def generate_recall_tables(session, group):
 	bins = defaultdict(lambda: {"left": [], "right": [], "sources": [], "id": None})
 	df = __build_metrics_df(session, group)
 
-	ground_truth_sizes = [
-		session.get_matching_by_id(id_value).dataset.ground_truth_size
-		for id_value in df["id"]
-	]
+	ground_truth_sizes = df["ground_truth_size"].tolist()
 
 	bin_edges = np.linspace(min(0, *ground_truth_sizes), max(ground_truth_sizes), num_bins + 1).astype(int)
 
 	total_points = len(df)
 
 	c = 1	
-	for id_value, qubo_recall_ground_truth_size in df.itertuples(index=False):
-		matching = session.get_matching_by_id(id_value)
+	for row in df.itertuples(index=False):
+		qubo_recall_ground_truth_size = row.recall_ground_truth_size
 	
 		#print(f"\r{c}", end="")
 
-		source_match = re.match(r"^_?(.*?)\/", matching.dataset.name)
+		source_match = re.match(r"^_?(.*?)\/", row.dataset_name)
 		source = source_match.group(1) if source_match else "Unknown"
 
-		ground_truth_size = matching.dataset.ground_truth_size
-		recall_ground_truth_size = matching.recall_ground_truth_size
+		ground_truth_size = row.ground_truth_size
+		recall_ground_truth_size = row.algorithm_recall_ground_truth_size
 
 		for i in range(num_bins):
 			if bin_edges[i] <= ground_truth_size < bin_edges[i + 1] + 1:
@@ -1 +1 @@
-from .scenario_catalogue import load_scenario, scenario_names, get_source_target_names
\ No newline at end of file
+from .scenario_catalogue import load_scenario, scenario_names, scenario_catalogue, scenario_files, get_source_target_names, ScenarioCache
\ No newline at end of file
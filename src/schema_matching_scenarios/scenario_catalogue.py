@@ -2,8 +2,13 @@ import inspect
 import sys
 import os
 import pandas as pd
+import numpy as np
 import json
 import re
+import pickle
+import hashlib
+import io
+import zipfile
 from pathlib import Path
 	
 class Scenario:
@@ -30,6 +35,15 @@ class Scenario:
 			self.source_column_count = scenario.source_df.shape[1]
 			self.target_column_count = scenario.target_df.shape[1]
 		
+		@classmethod
+		def from_values(cls, matching_type, ground_truth_size, source_column_count, target_column_count):
+			stats = cls.__new__(cls)
+			stats.matching_type = matching_type
+			stats.ground_truth_size = ground_truth_size
+			stats.source_column_count = source_column_count
+			stats.target_column_count = target_column_count
+			return stats
+		
 		@classmethod
 		def __compute_matching_type(cls, ground_truth):
 			def __is_one_to_n(left_getter, right_getter):
@@ -52,6 +66,110 @@ class Scenario:
 			if is_n_to_one: return "n:1"
 			return "1:1"
 
+class _ZipArchive:
+	"""
+	Read-only view of a zip archive of data sets. The central directory is read once per process
+	into an index of directories and files, so that data sets are listed and streamed straight
+	out of the archive without unpacking it.
+	"""
+
+	__instances = {}
+
+	def __init__(self, archive_path):
+		self.archive_path = archive_path
+		self.stamp = self.__class__.__file_stamp(archive_path)
+		self.pid = os.getpid()
+		self.zip_file = zipfile.ZipFile(archive_path)
+		self.members = {}
+		self.directories = {"": (set(), set())}
+		names = {self.__class__.__decode_name(info): info for info in self.zip_file.infolist()}
+		root = self.__class__.__root_folder(names, Path(archive_path).stem)
+		for name, info in names.items():
+			name = name[len(root):]
+			parts = [part for part in name.split("/") if part]
+			if not parts or parts[0] == "__MACOSX":
+				continue
+			for i in range(len(parts) - 1):
+				self.__add_entry("/".join(parts[:i]), parts[i], True)
+			self.__add_entry("/".join(parts[:-1]), parts[-1], info.is_dir())
+			if not info.is_dir():
+				self.members["/".join(parts)] = info
+
+	def __add_entry(self, directory, name, is_dir):
+		subdirs, files = self.directories.setdefault(directory, (set(), set()))
+		(subdirs if is_dir else files).add(name)
+		if is_dir:
+			self.directories.setdefault(f"{directory}/{name}" if directory else name, (set(), set()))
+
+	@classmethod
+	def __file_stamp(cls, path):
+		stat = os.stat(path)
+		return stat.st_mtime_ns, stat.st_size
+
+	@classmethod
+	def __decode_name(cls, info):
+		# names without the UTF-8 flag (0x800) are decoded as cp437 by zipfile, although many tools write them as UTF-8
+		if info.flag_bits & 0x800:
+			return info.filename
+		try:
+			return info.filename.encode("cp437").decode("utf-8")
+		except UnicodeError:
+			return info.filename
+
+	@classmethod
+	def __root_folder(cls, names, archive_name):
+		# archives packed with an additional subfolder named after the archive are read as if packed without it
+		prefix = f"{archive_name}/"
+		if names and all(name.startswith(prefix) or name.startswith("__MACOSX/") for name in names):
+			return prefix
+		return ""
+
+	@classmethod
+	def is_archive(cls, archive_path):
+		return os.path.isfile(archive_path) and zipfile.is_zipfile(archive_path)
+
+	@classmethod
+	def of(cls, archive_path):
+		"""
+		Returns the archive at the given path, reading its central directory only on first access
+		or whenever the archive file changed, or after the process was forked.
+		"""
+		archive = cls.__instances.get(archive_path)
+		if archive is None or archive.pid != os.getpid() or archive.stamp != cls.__file_stamp(archive_path):
+			archive = cls(archive_path)
+			cls.__instances[archive_path] = archive
+		return archive
+
+	@classmethod
+	def split(cls, path):
+		"""
+		Splits a path pointing inside an archive into the archive path and the member name.
+		Returns None for paths outside of archives.
+		"""
+		parts = Path(path).parts
+		for i, part in enumerate(parts):
+			if part.lower().endswith(".zip") and cls.is_archive(os.path.join(*parts[:i + 1])):
+				return os.path.join(*parts[:i + 1]), "/".join(parts[i + 1:])
+		return None
+
+	def get_directories(self, directory):
+		return iter(sorted(self.directories.get(directory, (set(), set()))[0]))
+
+	def get_files(self, directory):
+		return iter(sorted(self.directories.get(directory, (set(), set()))[1]))
+
+	def member_stamp(self, member):
+		info = self.members.get(member)
+		if info is None:
+			raise FileNotFoundError(f"{member} not found in {self.archive_path}")
+		return info.CRC, info.file_size
+
+	def open(self, member):
+		info = self.members.get(member)
+		if info is None:
+			raise FileNotFoundError(f"{member} not found in {self.archive_path}")
+		return self.zip_file.open(info)
+
 class _ScenarioLoader:
 
 	class Helper:
@@ -60,9 +178,41 @@ class _ScenarioLoader:
 		def data_set_directory(cls):
 			return os.path.join(os.path.dirname(os.path.abspath(__file__)), "data_sets")			
 
+		@classmethod
+		def data_set_root(cls, origin):
+			"""
+			Returns the root directory of the data sets of an origin. Unless the data sets were unpacked,
+			the root is the archive of the origin, and paths below it are resolved inside the archive.
+			"""
+			data_dir = os.path.join(cls.data_set_directory(), origin)
+			archive_path = os.path.join(data_dir, f"{origin}.zip")
+			if not any(d.is_dir() for d in Path(data_dir).iterdir()) and _ZipArchive.is_archive(archive_path):
+				return archive_path
+			return data_dir
+
+		@classmethod
+		def open_file(cls, file_path):
+			archive_member = _ZipArchive.split(file_path)
+			if archive_member:
+				archive_path, member = archive_member
+				return _ZipArchive.of(archive_path).open(member)
+			return open(file_path, 'rb')
+
+		@classmethod
+		def file_stamp(cls, file_path):
+			"""
+			Returns a value that changes whenever the contents of the given file change.
+			"""
+			archive_member = _ZipArchive.split(file_path)
+			if archive_member:
+				archive_path, member = archive_member
+				return _ZipArchive.of(archive_path).member_stamp(member)
+			stat = os.stat(file_path)
+			return stat.st_mtime_ns, stat.st_size
+
 		@classmethod
 		def load_json(cls, file_path):
-			with open(file_path, 'r') as file:
+			with io.TextIOWrapper(cls.open_file(file_path), encoding="utf-8") as file:
 				data = json.load(file)
 				return data
 	
@@ -71,7 +221,8 @@ class _ScenarioLoader:
 			try:
 				header = 0 if has_headers else None
 				nrows = None if load_data else 0
-				df = pd.read_csv(file_path, header=header, nrows=nrows, encoding="utf-8")
+				with cls.open_file(file_path) as file:
+					df = pd.read_csv(file, header=header, nrows=nrows, encoding="utf-8")
 				return df
 			except Exception as e:
 				print(f"Failed to load data from CSV file. Error: {e}")
@@ -79,10 +230,19 @@ class _ScenarioLoader:
 		
 		@classmethod
 		def get_directories(cls, directory_path):
+			archive_member = _ZipArchive.split(directory_path)
+			if archive_member:
+				archive_path, member = archive_member
+				return _ZipArchive.of(archive_path).get_directories(member)
 			return (d.name for d in Path(directory_path).iterdir() if d.is_dir())
 		
 		@classmethod
 		def get_files(cls, directory_path, extension=None):
+			archive_member = _ZipArchive.split(directory_path)
+			if archive_member:
+				archive_path, member = archive_member
+				files = _ZipArchive.of(archive_path).get_files(member)
+				return (f for f in files if extension is None or Path(f).suffix.lower() == extension.lower())
 			return (
 				f.name for f in Path(directory_path).iterdir()
 				if f.is_file() and (extension is None or f.suffix.lower() == extension.lower())
@@ -108,44 +268,58 @@ class _ScenarioLoader:
 	def _transform_matches(ground_truth_matrix, source_table_name, source_headers, target_table_name, target_headers):
 		matches = []
 	
-		for i, row in ground_truth_matrix.iterrows():
-			for j, value in row.items():
-				if value == 1:
-					match = {
-						"source_table": source_table_name,
-						"source_column": source_headers[i],
-						"target_table": target_table_name,
-						"target_column": target_headers[j]
-					}
-					matches.append(match)
+		# nonzero yields positions in row-major order, i.e. the same order as iterating rows then columns
+		rows, columns = np.nonzero(ground_truth_matrix.to_numpy() == 1)
+		for i, j in zip(ground_truth_matrix.index[rows], ground_truth_matrix.columns[columns]):
+			match = {
+				"source_table": source_table_name,
+				"source_column": source_headers[i],
+				"target_table": target_table_name,
+				"target_column": target_headers[j]
+			}
+			matches.append(match)
 
 		return {"matches": matches}
 	
 class _Schematch(_ScenarioLoader):
 	
 	@classmethod
-	def __load(cls, data_dir, source_table_name, target_table_name, load_data):
-		source_df = cls.Helper.load_csv(os.path.join(data_dir, f"source/{source_table_name}.csv"), load_data=load_data)
+	def __load(cls, source_path, target_path, ground_truth_path, source_table_name, target_table_name, load_data):
+		source_df = cls.Helper.load_csv(source_path, load_data=load_data)
 		source_headers = source_df.columns.tolist()
 	
-		target_df = cls.Helper.load_csv(os.path.join(data_dir, f"target/{target_table_name}.csv"), load_data=load_data)
+		target_df = cls.Helper.load_csv(target_path, load_data=load_data)
 		target_headers = target_df.columns.tolist()
 	
-		ground_truth = cls.Helper.load_csv(os.path.join(data_dir, f"ground_truth/{source_table_name}___{target_table_name}.csv"), False)
+		ground_truth = cls.Helper.load_csv(ground_truth_path, False)
 
 		matches = cls._transform_matches(ground_truth, source_table_name, source_headers, target_table_name, target_headers)
 
 		return Scenario(source_df, target_df, matches)
 	
 	@classmethod
-	def load(cls, scenario_name, load_data=True):
+	def __parse_name(cls, scenario_name):
 		m = re.match(r'([^\/]+)\/([^\/]+)\/(.*?)>>(.*)$', scenario_name)
 		group1 = m.group(1)
 		group2 = m.group(2)
 		source_table_name = m.group(3)
 		target_table_name = m.group(4)
-		data_dir = os.path.join(cls.Helper.data_set_directory(), "schematch", group1, group2)
-		ret = cls.__load(data_dir, source_table_name, target_table_name, load_data)
+		data_dir = os.path.join(cls.Helper.data_set_root("schematch"), group1, group2)
+		return data_dir, source_table_name, target_table_name
+	
+	@classmethod
+	def files(cls, scenario_name):
+		data_dir, source_table_name, target_table_name = cls.__parse_name(scenario_name)
+		return (
+			os.path.join(data_dir, f"source/{source_table_name}.csv"),
+			os.path.join(data_dir, f"target/{target_table_name}.csv"),
+			os.path.join(data_dir, f"ground_truth/{source_table_name}___{target_table_name}.csv")
+		)
+	
+	@classmethod
+	def load(cls, scenario_name, load_data=True):
+		_, source_table_name, target_table_name = cls.__parse_name(scenario_name)
+		ret = cls.__load(*cls.files(scenario_name), source_table_name, target_table_name, load_data)
 		ret.name = f'{cls.__name__}/{scenario_name}'
 		ret.source_name = source_table_name
 		ret.target_name = target_table_name
@@ -153,7 +327,7 @@ class _Schematch(_ScenarioLoader):
 	
 	@classmethod
 	def scenario_names(cls):
-		data_dir_root = os.path.join(cls.Helper.data_set_directory(), "schematch")
+		data_dir_root = cls.Helper.data_set_root("schematch")
 		for group1 in cls.Helper.get_directories(data_dir_root):
 			for group2 in cls.Helper.get_directories(os.path.join(data_dir_root, group1)):
 				data_dir = os.path.join(data_dir_root, group1, group2)
@@ -169,16 +343,25 @@ class _Schematch(_ScenarioLoader):
 class _Valentine(_ScenarioLoader):
 	
 	@classmethod
-	def load(cls, scenario_name, load_data=True):
+	def files(cls, scenario_name):
 		m = re.match(r'([^\/]+)\/([^\/]+)\/([^\/]+)\/(.*?)>>(.*)$', scenario_name)		
 		group1 = m.group(1)
 		group2 = m.group(2)
 		group3 = m.group(3)
 		root_table_name = group3.lower()		
-		data_dir = os.path.join(cls.Helper.data_set_directory(), "valentine", group1, group2, group3)	
-		source_df = cls.Helper.load_csv(os.path.join(data_dir, f'{root_table_name}_source.csv'), load_data=load_data)
-		target_df = cls.Helper.load_csv(os.path.join(data_dir, f'{root_table_name}_target.csv'), load_data=load_data)
-		ground_truth = cls.Helper.load_json(os.path.join(data_dir, f'{root_table_name}_mapping.json'))
+		data_dir = os.path.join(cls.Helper.data_set_root("valentine"), group1, group2, group3)	
+		return (
+			os.path.join(data_dir, f'{root_table_name}_source.csv'),
+			os.path.join(data_dir, f'{root_table_name}_target.csv'),
+			os.path.join(data_dir, f'{root_table_name}_mapping.json')
+		)
+	
+	@classmethod
+	def load(cls, scenario_name, load_data=True):
+		source_path, target_path, ground_truth_path = cls.files(scenario_name)
+		source_df = cls.Helper.load_csv(source_path, load_data=load_data)
+		target_df = cls.Helper.load_csv(target_path, load_data=load_data)
+		ground_truth = cls.Helper.load_json(ground_truth_path)
 		ret = Scenario(source_df, target_df, ground_truth)
 		ret.name = f'{cls.__name__}/{scenario_name}'
 		ret.source_name = "source"
@@ -187,7 +370,7 @@ class _Valentine(_ScenarioLoader):
 	
 	@classmethod
 	def scenario_names(cls):
-		data_dir_root = os.path.join(cls.Helper.data_set_directory(), "valentine")
+		data_dir_root = cls.Helper.data_set_root("valentine")
 		for group1 in cls.Helper.get_directories(data_dir_root):
 			for group2 in cls.Helper.get_directories(os.path.join(data_dir_root, group1)):
 				for group3 in cls.Helper.get_directories(os.path.join(data_dir_root, group1, group2)):
@@ -212,14 +395,174 @@ def __scenario_loaders(expected_name=None):
 def scenario_names():
 	yield from (name for loader in __scenario_loaders() for name in loader.scenario_names())
 
-def load_scenario(scenario_name, load_data=True):
+def __scenario_loader_of(scenario_name):
 	m = re.match(r'^([^\/]+)\/(.+?)$', scenario_name)
 	if m:
 		scenario_loader_name = m.group(1)
 		scenario_name = m.group(2)
 		scenario_loader = next(__scenario_loaders(scenario_loader_name), None)
 		if scenario_loader:
-			return scenario_loader.load(scenario_name, load_data)
+			return scenario_loader, scenario_name
+	return None, None
+
+def load_scenario(scenario_name, load_data=True):
+	scenario_loader, scenario_name = __scenario_loader_of(scenario_name)
+	if scenario_loader:
+		return scenario_loader.load(scenario_name, load_data)
+
+def scenario_files(scenario_name):
+	scenario_loader, scenario_name = __scenario_loader_of(scenario_name)
+	if scenario_loader:
+		return scenario_loader.files(scenario_name)
+
+class _CatalogueIndex:
+	"""
+	Index of the names and stats of all scenarios in the repository, persisted column-wise
+	as a single pickle file inside the data sets directory. The index is rebuilt whenever
+	the modification time of any directory or archive in the repository changes.
+	"""
+
+	version = 2
+	columns = ("name", "matching_type", "ground_truth_size", "source_column_count", "target_column_count")
+
+	@classmethod
+	def index_file(cls):
+		return os.path.join(_ScenarioLoader.Helper.data_set_directory(), "catalogue_index.pkl")
+
+	@classmethod
+	def __stamp(cls):
+		# the data sets directory itself is left out as writing the index changes its modification time
+		# archives are included as they can be replaced without changing the modification time of their directory
+		root = _ScenarioLoader.Helper.data_set_directory()
+		stamp = {}
+		for directory, subdirs, files in os.walk(root):
+			for name in subdirs + [f for f in files if f.lower().endswith(".zip")]:
+				path = os.path.join(directory, name)
+				stamp[os.path.relpath(path, root)] = os.stat(path).st_mtime_ns
+		return stamp
+
+	@classmethod
+	def __is_valid(cls, index):
+		if index.get("version") != cls.version:
+			return False
+		root = _ScenarioLoader.Helper.data_set_directory()
+		try:
+			return all(os.stat(os.path.join(root, path)).st_mtime_ns == mtime for path, mtime in index["stamp"].items())
+		except FileNotFoundError:
+			return False
+
+	@classmethod
+	def __build(cls):
+		# taken ahead of scanning, so that changes made while building invalidate the index again
+		stamp = cls.__stamp()
+		index = {"version": cls.version, "stamp": stamp, **{column: [] for column in cls.columns}}
+		for scenario_name in scenario_names():
+			stats = load_scenario(scenario_name, False).get_stats()
+			index["name"].append(scenario_name)
+			index["matching_type"].append(stats.matching_type)
+			index["ground_truth_size"].append(stats.ground_truth_size)
+			index["source_column_count"].append(stats.source_column_count)
+			index["target_column_count"].append(stats.target_column_count)
+		return index
+
+	@classmethod
+	def load(cls):
+		index_file = cls.index_file()
+		try:
+			with open(index_file, "rb") as file:
+				index = pickle.load(file)
+			if cls.__is_valid(index):
+				return index
+		except (OSError, EOFError, pickle.UnpicklingError):
+			pass
+
+		index = cls.__build()
+		try:
+			temp_file = f"{index_file}.{os.getpid()}.tmp"
+			with open(temp_file, "wb") as file:
+				pickle.dump(index, file, protocol=pickle.HIGHEST_PROTOCOL)
+			os.replace(temp_file, index_file)
+		except OSError:
+			pass # a read-only repository is still served, but the index is rebuilt every time
+		return index
+
+def scenario_catalogue():
+	"""
+	Returns a dictionary with the stats of all available scenarios by scenario name, in the same order as `scenario_names`.
+	Stats are served from an index of the repository rather than loading every scenario.
+	"""
+	index = _CatalogueIndex.load()
+	return {
+		name: Scenario.Stats.from_values(matching_type, ground_truth_size, source_column_count, target_column_count)
+		for name, matching_type, ground_truth_size, source_column_count, target_column_count
+		in zip(*(index[column] for column in _CatalogueIndex.columns))
+	}
+
+class ScenarioCache:
+	"""
+	Keeps fully loaded scenarios as pickle files in a cache directory, so that the CSV files
+	of a scenario are parsed only once and any further process loads the parsed data frames instead.
+	Cached scenarios are invalidated as soon as any of their files in the repository changes.
+	"""
+
+	def __init__(self, cache_dir):
+		self.cache_dir = cache_dir
+		os.makedirs(cache_dir, exist_ok=True)
+
+	def __cache_file(self, scenario_name):
+		key = hashlib.sha1(scenario_name.encode("utf-8")).hexdigest()
+		return os.path.join(self.cache_dir, f"{key}.pkl")
+
+	def __stamp(self, scenario_name):
+		files = scenario_files(scenario_name)
+		if files is None:
+			return None
+		try:
+			return [(f, *_ScenarioLoader.Helper.file_stamp(f)) for f in files]
+		except FileNotFoundError:
+			return None
+
+	def __read(self, scenario_name, stamp, load_data):
+		try:
+			with open(self.__cache_file(scenario_name), "rb") as file:
+				if pickle.load(file) != stamp:
+					return None
+				return pickle.load(file) if load_data else True
+		except (OSError, EOFError, pickle.UnpicklingError):
+			return None
+
+	def __write(self, scenario_name, stamp, scenario):
+		cache_file = self.__cache_file(scenario_name)
+		temp_file = f"{cache_file}.{os.getpid()}.tmp"
+		with open(temp_file, "wb") as file:
+			pickle.dump(stamp, file, protocol=pickle.HIGHEST_PROTOCOL)
+			pickle.dump(scenario, file, protocol=pickle.HIGHEST_PROTOCOL)
+		os.replace(temp_file, cache_file)
+
+	def prepare(self, scenario_name):
+		"""
+		Makes sure the scenario is cached, parsing its files only if the cached copy is missing or stale.
+		Returns False if the scenario does not exist in the repository.
+		"""
+		stamp = self.__stamp(scenario_name)
+		if stamp is None:
+			return False
+		if self.__read(scenario_name, stamp, False) is None:
+			self.__write(scenario_name, stamp, load_scenario(scenario_name, True))
+		return True
+
+	def load(self, scenario_name):
+		"""
+		Loads a scenario including its data from the cache, and falls back to the repository if the cached copy is missing or stale.
+		"""
+		stamp = self.__stamp(scenario_name)
+		if stamp is None:
+			return None
+		scenario = self.__read(scenario_name, stamp, True)
+		if scenario is None:
+			scenario = load_scenario(scenario_name, True)
+			self.__write(scenario_name, stamp, scenario)
+		return scenario
 		
 def get_source_target_names(scenario_name):
 	scenario_name = re.sub(r"(?:[^\/]+/)+", "", scenario_name)
@@ -0,0 +1,234 @@
+# Former implementations of the functions of the quantum_love excerpt (https://github.com/sdbs-uni-p/quantum_love) which are
+# changed in matching_hub.quantum_love, against which the changed ones are checked
+
+from matching_hub.quantum_love.database_side import get_preference_value
+from matching_hub.quantum_love.docplex_quantum_side import do_appear_in_each_others_preference_lists, does_prefer, search_pairs
+
+
+def get_possible_pairs_as_tuples(possible_men_with_preferences, possible_women_with_preferences):
+	"""
+	Reformulate the possible pairs with preferences as tuples by comparing the possible men with preferences
+	with the possible women with preferences and finding correspondences i.e. that the man and the woman appear in each
+	other's preference list.
+
+	:param possible_men_with_preferences: The possible mens with their preferences.
+	:param possible_women_with_preferences: The possible women with their preferences.
+	:return: The possible pairs with preferences as tuples.
+	"""
+	possible_pairs_with_preferences = []
+	for possible_man_with_preferences in possible_men_with_preferences:
+		for possible_woman_with_preferences in possible_women_with_preferences:
+			woman_appears_in_man = False
+			man_appears_in_woman = False
+
+			man_prefs = possible_man_with_preferences[1]
+			for man_pref in man_prefs:
+				woman_to_be_matched = possible_woman_with_preferences[0]
+				if isinstance(man_pref, list):
+					if woman_to_be_matched in man_pref:
+						woman_appears_in_man = True
+						break
+				else:
+					if woman_to_be_matched == man_pref:
+						woman_appears_in_man = True
+						break
+
+			if woman_appears_in_man:
+				woman_prefs = possible_woman_with_preferences[1]
+				for woman_pref in woman_prefs:
+					man_to_be_matched = possible_man_with_preferences[0]
+					if isinstance(woman_pref, list):
+						if man_to_be_matched in woman_pref:
+							man_appears_in_woman = True
+							break
+					else:
+						if man_to_be_matched == woman_pref:
+							man_appears_in_woman = True
+							break
+
+			if woman_appears_in_man and man_appears_in_woman:
+				pair = (possible_man_with_preferences, possible_woman_with_preferences)
+				possible_pairs_with_preferences.append(pair)
+
+	return possible_pairs_with_preferences
+
+
+def add_preferences(matches, schema1, schema2, possible_men, possible_women):
+	"""
+	Creates the preference lists of the men and women.
+
+	:param matches: The valentine schema matches.
+	:param schema1: The first schema to get matched.
+	:param schema2: The second schema to get matched.
+	:param possible_men: The candidates of the first schema.
+	:param possible_women: The candidates of the second schema.
+	"""
+	def _a(schm1, schm2, temp_possible_men, temp_possible_women):
+		for column in schm1.columns.values:
+			temp_possible_men.append((column, list()))
+		for column in schm2.columns.values:
+			temp_possible_women.append((column, list()))
+
+		items = list(matches.items())
+		for item in items:
+			name_of_table_1 = item[0][0][1]
+			name_of_table_2 = item[0][1][1]
+			value = item[1]
+			man = None
+			woman = None
+
+			# Find corresponding man and woman
+			for possible_man in temp_possible_men:
+				if possible_man[0] == name_of_table_1:
+					man = possible_man
+					break
+			for possible_woman in temp_possible_women:
+				if possible_woman[0] == name_of_table_2:
+					woman = possible_woman
+					break
+
+			# Add preferences
+			preference_list_man = list()
+			preference_list_man.append(name_of_table_2)
+			preference_list_woman = list()
+			preference_list_woman.append(name_of_table_1)
+			if not man is None:
+				man[1].append((preference_list_man, value))
+			if not woman is None:
+				woman[1].append((preference_list_woman, value))
+
+	# CHANGED FROM THE ORIGINAL CODEBASE
+	# The _a method determines preference lists for a set of matches that are symmetric,
+	# where target preferences are derived from source preferences. This approach does not support
+	# cases with asymmetric preferences, where target preferences are independent of source preferences.
+	# To support both cases, the input `matches` must be a union of preferences from both source and target.
+	_a(schema1, schema2, possible_men, []) # The [] discards inferred target preferences from the source
+	_a(schema2, schema1, possible_women, [])
+	#_a(schema1, schema2, possible_men, possible_women) # To enable original behaviour, `matches` must only be source preferences;
+	# comment the above lines and uncomment this one
+
+
+def cleanup_preferences(person):
+	"""
+	Removes duplicates and sums equal likeliness in the preference list of the person.
+
+	:param person: The person whose preference list should get polished.
+	"""
+	preferences = person[1]
+	prev_reference = None
+	length = len(preferences)
+	i = 0
+	while i < length:
+		preference = preferences.__getitem__(i)
+
+		if preferences.count(preference) > 1:  # Remove duplicates
+			preferences.remove(preference)
+			length = length - 1
+			i = i + 1
+			continue
+
+		elif prev_reference is not None and preference[1] == prev_reference[1]:  # Sum equal likeliness
+			prev_reference[0].extend(preference[0])
+			preferences.remove(preference)
+			length = length - 1
+			continue
+		prev_reference = preference
+		i = i + 1
+
+	preferences.sort(reverse=True, key=get_preference_value)
+
+
+def compute_twice_constraint(p3, pairs):
+	"""
+	Computes the twice constraint that "noone gets matched more than once in the final solution".
+	As soon as a candidate appears in two pairs in the final solution, he is matched twice.
+
+	:param p3: The penalty for the twice constraint.
+	:param pairs: The possible pairs.
+	:return: The computed twice constraint.
+	"""
+	twice_constraint = 0
+	existing_pairs_in_twice_constraint = list()
+	for i in range(len(pairs)):
+		for j in range(len(pairs)):
+			pair1 = pairs[i]
+			pair2 = pairs[j]
+
+			if i != j:  # pairs not equal
+				if pair1.m == pair2.m or pair1.w == pair2.w:  # man matched twice or woman matched twice
+					if not (((pair1.m, pair1.w, pair2.m, pair2.w) in existing_pairs_in_twice_constraint)
+							or ((pair2.m, pair2.w, pair1.m, pair1.w) in existing_pairs_in_twice_constraint)):
+						twice_constraint += p3 * pairs[i] * pairs[j]
+						existing_pairs_in_twice_constraint.append((pair1.m, pair1.w, pair2.m, pair2.w))
+	return twice_constraint
+
+
+def compute_stable_constraint(p2, pairs, possible_men, possible_women):
+	"""
+	Computes the stable constraint of the Stable Marriage Problem.
+	A pair is blocking as soon as both partners would prefer another partner over their current one.
+
+	:param p2: The penalty for the stable constraint.
+	:param pairs: The possible pairs.
+	:param possible_men: All possible men.
+	:param possible_women: All possible women.
+	:return: The computed stable constraint.
+	"""
+	stable_constraint = 0
+
+	for k in range(len(pairs)):
+		stableConstraint_blockingPair = 0
+		stableConstraint_stablePair = 0
+		fixed_man = pairs[k].m
+		fixed_woman = pairs[k].w
+
+		# Punishes pairs that are blocking
+		for i in range(len(possible_men)):
+			variable_man = possible_men[i]
+			for j in range(len(possible_women)):
+				variable_woman = possible_women[j]
+				if do_appear_in_each_others_preference_lists(fixed_man, variable_woman) \
+						and do_appear_in_each_others_preference_lists(variable_man, fixed_woman):
+					if not does_prefer(fixed_man, fixed_woman, variable_woman) \
+							or not does_prefer(fixed_woman, fixed_man, variable_man):
+						boolean_value = 1
+					else:
+						boolean_value = 0
+					pair1 = search_pairs(fixed_man, variable_woman, pairs)
+					pair2 = search_pairs(variable_man, fixed_woman, pairs)
+					if pair1 is not None and pair2 is not None:
+						stableConstraint_blockingPair += pair1 * pair2 * boolean_value
+					else:
+						pass
+
+		# Promotes pairs that are most likely not blocking
+		for n in range(len(possible_men)):
+			variable_man = possible_men[n]
+			if do_appear_in_each_others_preference_lists(fixed_woman, variable_man):
+				if not does_prefer(fixed_woman, fixed_man, variable_man):
+					boolean_value = 1
+				else:
+					boolean_value = 0
+				pair3 = search_pairs(variable_man, fixed_woman, pairs)
+				if pair3 is not None:
+					stableConstraint_stablePair += pair3 * boolean_value
+				else:
+					pass
+
+		# Promotes pairs that are most likely not blocking
+		for m in range(len(possible_women)):
+			variable_woman = possible_women[m]
+			if do_appear_in_each_others_preference_lists(fixed_man, variable_woman):
+				if not does_prefer(fixed_man, fixed_woman, variable_woman):
+					boolean_value = 1
+				else:
+					boolean_value = 0
+				pair4 = search_pairs(fixed_man, variable_woman, pairs)
+				if pair4 is not None:
+					stableConstraint_stablePair += pair4 * boolean_value
+				else:
+					pass
+
+		stable_constraint += p2 * (stableConstraint_blockingPair - stableConstraint_stablePair)
+
+	return stable_constraint
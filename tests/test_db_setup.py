@@ -0,0 +1,132 @@
+import random
+import uuid
+
+from sqlalchemy import text
+
+from matching_hub.db_setup import init_db, sqlite_engine_builder, uq_summary_columns
+
+columns = [column.strip() for column in uq_summary_columns.split(",")]
+
+def expected_uq_summary(connection):
+	# the representatives recomputed from scratch, as the former uq_summary view did for matchings with hashes
+	rows = connection.execute(text(f"""
+		SELECT {", ".join(columns)}
+		FROM (
+			SELECT m.*, ROW_NUMBER() OVER (PARTITION BY m.hash_matchings_lev, m.hash_flip_input_matchings_lev ORDER BY m.len_matchings DESC, m.id) AS row_num
+			FROM matching AS m
+			INNER JOIN dataset AS ds ON m.dataset_id = ds.id
+			INNER JOIN algorithm AS alg ON m.algorithm_id = alg.id
+			WHERE m.len_matchings > 0 AND m.len_flip_input_matchings > 0
+			AND m.hash_matchings_lev IS NOT NULL AND m.hash_flip_input_matchings_lev IS NOT NULL
+		)
+		WHERE row_num = 1
+	"""))
+	return sorted(tuple(row) for row in rows)
+
+def actual_uq_summary(connection):
+	return sorted(tuple(row) for row in connection.execute(text(f"SELECT {', '.join(columns)} FROM uq_summary")))
+
+def random_hash(rng, hashes):
+	return rng.choice(hashes) if rng.random() < 0.9 else None
+
+def random_values(rng, algorithm_ids, dataset_ids):
+	return {
+		"algorithm_id": rng.choice(algorithm_ids),
+		"dataset_id": rng.choice(dataset_ids),
+		"hash_matchings_lev": random_hash(rng, ["h0", "h1", "h2"]),
+		"hash_flip_input_matchings_lev": random_hash(rng, ["h0", "h1"]),
+		"len_matchings": rng.randint(0, 4),
+		"len_flip_input_matchings": rng.randint(0, 3),
+		"is_symmetric": rng.randint(0, 1)
+	}
+
+def is_pair_free(connection, values):
+	# a matching per pair of algorithm and scenario
+	query = text("SELECT 1 FROM matching WHERE algorithm_id = :algorithm_id AND dataset_id = :dataset_id")
+	return connection.execute(query, values).first() is None
+
+def pick_matching(rng, connection, matching_ids):
+	# representatives are picked most of the time, as changes to them are the ones which make their groups be scanned
+	representative_ids = connection.execute(text("SELECT id FROM uq_summary ORDER BY id")).scalars().all()
+	return rng.choice(representative_ids if representative_ids and rng.random() < 0.75 else matching_ids)
+
+def delete_matchings_of(rng, connection, matching_ids, column, value):
+	# the matchings of a deleted algorithm or scenario are mostly deleted beforehand, and sometimes left behind
+	if rng.random() < 0.75:
+		deleted_ids = connection.execute(text(f"SELECT id FROM matching WHERE {column} = :value"), {"value": value}).scalars().all()
+		connection.execute(text(f"DELETE FROM matching WHERE {column} = :value"), {"value": value})
+		matching_ids[:] = [matching_id for matching_id in matching_ids if matching_id not in deleted_ids]
+
+def add_algorithm(connection, algorithm_ids):
+	algorithm_ids.append(str(uuid.uuid4()))
+	connection.execute(text("INSERT INTO algorithm (id, name, parameters) VALUES (:id, :id, '{}')"), {"id": algorithm_ids[-1]})
+
+def add_dataset(connection, dataset_ids):
+	dataset_ids.append(str(uuid.uuid4()))
+	connection.execute(
+		text("INSERT INTO dataset (id, name, ground_truth_size, source_column_count, target_column_count, matching_type) VALUES (:id, :id, 1, 2, 2, 'Unionable')"),
+		{"id": dataset_ids[-1]}
+	)
+
+def test_uq_summary_triggers_keep_the_representatives(tmp_path):
+	rng = random.Random(0)
+	session_file = str(tmp_path / "matching.mt")
+	engine = init_db(sqlite_engine_builder(session_file))
+	algorithm_ids, dataset_ids, matching_ids = [], [], []
+	with engine.begin() as connection:
+		for _ in range(8):
+			add_algorithm(connection, algorithm_ids)
+			add_dataset(connection, dataset_ids)
+
+	for step in range(1000):
+		if step == 500:
+			# a session file opened again gets its triggers replaced
+			engine.dispose()
+			engine = init_db(sqlite_engine_builder(session_file))
+		operation = rng.random()
+		with engine.begin() as connection:
+			if operation < 0.4 or not matching_ids:
+				values = random_values(rng, algorithm_ids, dataset_ids)
+				if is_pair_free(connection, values):
+					matching_ids.append(str(uuid.uuid4()))
+					names = ", ".join(values)
+					connection.execute(text(f"INSERT INTO matching (id, {names}) VALUES (:id, {', '.join(f':{name}' for name in values)})"), {"id": matching_ids[-1], **values})
+			elif operation < 0.9:
+				matching_id = pick_matching(rng, connection, matching_ids)
+				current = connection.execute(text("SELECT algorithm_id, dataset_id FROM matching WHERE id = :id"), {"id": matching_id}).mappings().one()
+				values = random_values(rng, algorithm_ids, dataset_ids)
+				updated = {name: values[name] for name in rng.sample(sorted(values), rng.randint(1, 3))}
+				if ("algorithm_id" in updated or "dataset_id" in updated) and not is_pair_free(connection, {**current, **updated}):
+					updated.pop("algorithm_id", None)
+					updated.pop("dataset_id", None)
+				if updated:
+					connection.execute(text(f"UPDATE matching SET {', '.join(f'{name} = :{name}' for name in updated)} WHERE id = :id"), {"id": matching_id, **updated})
+			elif operation < 0.97:
+				matching_id = pick_matching(rng, connection, matching_ids)
+				matching_ids.remove(matching_id)
+				connection.execute(text("DELETE FROM matching WHERE id = :id"), {"id": matching_id})
+			elif operation < 0.985:
+				dataset_id = dataset_ids.pop(rng.randrange(len(dataset_ids)))
+				delete_matchings_of(rng, connection, matching_ids, "dataset_id", dataset_id)
+				connection.execute(text("DELETE FROM dataset WHERE id = :id"), {"id": dataset_id})
+				add_dataset(connection, dataset_ids)
+			else:
+				algorithm_id = algorithm_ids.pop(rng.randrange(len(algorithm_ids)))
+				delete_matchings_of(rng, connection, matching_ids, "algorithm_id", algorithm_id)
+				connection.execute(text("DELETE FROM algorithm WHERE id = :id"), {"id": algorithm_id})
+				add_algorithm(connection, algorithm_ids)
+
+		with engine.connect() as connection:
+			assert actual_uq_summary(connection) == expected_uq_summary(connection), f"step {step}"
+
+def test_matchings_without_hashes_are_left_out_of_uq_summary(tmp_path):
+	session_file = str(tmp_path / "matching.mt")
+	engine = init_db(sqlite_engine_builder(session_file))
+	with engine.begin() as connection:
+		# the group that matchings without hashes formed in former versions
+		connection.execute(text("INSERT INTO uq_summary (id, len_matchings, len_flip_input_matchings) VALUES ('former', 1, 1)"))
+	engine.dispose()
+
+	engine = init_db(sqlite_engine_builder(session_file))
+	with engine.connect() as connection:
+		assert actual_uq_summary(connection) == []
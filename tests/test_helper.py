@@ -0,0 +1,47 @@
+import pytest
+
+from matching_hub.helper import compute_matching_hash, decode_matchings, encode_matchings, is_current_matching_hash
+
+int_matchings = {(("source", "a"), ("target", "b")): 1, (("source", "a"), ("target", "c")): 3, (("target", "b"), ("source", "a")): -2}
+float_matchings = {(("source", "a"), ("target", "b")): 0.5, (("source", "ä"), ("target", "a")): 1e-300, (("target", "b"), ("source", "a")): -0.0}
+
+@pytest.mark.parametrize("matchings", [int_matchings, float_matchings, {}])
+def test_matchings_round_trip_through_the_binary_encoding(matchings):
+	decoded = decode_matchings(encode_matchings(matchings))
+	assert decoded == matchings
+	assert list(decoded.items()) == list(matchings.items())
+	assert [type(value) for value in decoded.values()] == [type(value) for value in matchings.values()]
+
+@pytest.mark.parametrize("matchings", [
+	# mixed value types, non-string names, keys of another shape, and integers beyond int64
+	{(("source", "a"), ("target", "b")): 1, (("source", "a"), ("target", "c")): 0.5},
+	{(("source", 1), ("target", "b")): 0.5},
+	{("a", "b"): 0.5},
+	{(("source", "a"), ("target", "b")): 2 ** 63},
+])
+def test_matchings_which_cannot_be_encoded_are_left_to_json(matchings):
+	assert encode_matchings(matchings) is None
+
+def test_unknown_encoding_is_rejected():
+	with pytest.raises(ValueError):
+		decode_matchings(b'{"((\'source\', \'a\'), (\'target\', \'b\'))": 0.5}')
+
+def test_matching_hash_does_not_depend_on_the_order_of_entries():
+	reversed_matchings = dict(reversed(list(float_matchings.items())))
+	assert compute_matching_hash(reversed_matchings, 7) == compute_matching_hash(float_matchings, 7)
+
+def test_matching_hash_depends_on_values_up_to_the_precision():
+	key = (("source", "a"), ("target", "b"))
+	assert compute_matching_hash({key: 0.12345678}, 7) == compute_matching_hash({key: 0.12345679}, 7)
+	assert compute_matching_hash({key: 0.1234567}, 7) != compute_matching_hash({key: 0.1234568}, 7)
+	assert compute_matching_hash({key: 0.12}, 1) == compute_matching_hash({key: 0.14}, 1)
+
+def test_matching_hash_tells_flipped_matchings_apart():
+	flipped_matchings = {(target, source): value for (source, target), value in float_matchings.items()}
+	assert compute_matching_hash(flipped_matchings, 7) != compute_matching_hash(float_matchings, 7)
+
+def test_former_hashes_are_not_current():
+	assert is_current_matching_hash(compute_matching_hash(float_matchings, 7))
+	# DeepHash values of former versions are SHA-256 hex digests
+	assert not is_current_matching_hash("0" * 64)
+	assert not is_current_matching_hash(None)
@@ -0,0 +1,25 @@
+from typer.testing import CliRunner
+
+import matchinghub
+from matching_hub.helper import compute_matching_hash
+from matching_hub.repository import MatchingSession
+from test_repository import populate_session, read_hashes
+
+def test_migrate_session_rehashes_former_hashes(tmp_path):
+	session_file = tmp_path / "matching.mt"
+	session = populate_session(session_file, 3)
+	matchings = {matching.id: matching.matchings for matching in session.get_all_matchings(columns=("matchings",))}
+	legacy_id, *current_ids = matchings
+	legacy_hash = "0" * 64
+	with session.batch():
+		session.upload_matching_hash(legacy_id, legacy_hash)
+		for matching_id in current_ids:
+			session.upload_matching_hash(matching_id, compute_matching_hash(matchings[matching_id], matchinghub.precision))
+	assert [matching.id for matching in session.get_all_legacy_hashed_matchings()] == [legacy_id]
+
+	result = CliRunner().invoke(matchinghub.app, ["migrate-session", "-s", str(session_file)])
+	assert result.exit_code == 0, result.output
+
+	hashes = read_hashes(session_file)
+	assert hashes == {matching_id: compute_matching_hash(value, matchinghub.precision) for matching_id, value in matchings.items()}
+	assert list(MatchingSession(str(session_file), None).get_all_legacy_hashed_matchings()) == []
@@ -0,0 +1,42 @@
+import pytest
+from sqlalchemy import Column, Integer, create_engine, insert, select, text
+from sqlalchemy.orm import declarative_base
+
+from matching_hub.helper import dict_with_tuples_to_json
+from matching_hub.models import MatchingsType
+
+Base = declarative_base()
+
+class Record(Base):
+	__tablename__ = "record"
+
+	id = Column(Integer, primary_key=True)
+	matchings = Column(MatchingsType, nullable=True)
+
+@pytest.fixture
+def engine():
+	engine = create_engine("sqlite://")
+	Base.metadata.create_all(engine)
+	return engine
+
+def read_matchings(engine):
+	with engine.connect() as connection:
+		return connection.execute(select(Record.matchings).order_by(Record.id)).scalars().all()
+
+@pytest.mark.parametrize("matchings, storage_type", [
+	({(("source", "a"), ("target", "b")): 0.5, (("target", "b"), ("source", "a")): 0.25}, "blob"),
+	# mixed value types cannot be encoded in binary form, so they are stored as JSON text
+	({(("source", "a"), ("target", "b")): 1, (("target", "b"), ("source", "a")): 0.25}, "text"),
+	(None, "null"),
+])
+def test_matchings_are_stored_in_binary_form_or_as_json(engine, matchings, storage_type):
+	with engine.begin() as connection:
+		connection.execute(insert(Record), [{"matchings": matchings}])
+		assert connection.execute(text("SELECT typeof(matchings) FROM record")).scalar() == storage_type
+	assert read_matchings(engine) == [matchings]
+
+def test_matchings_stored_as_json_text_by_former_versions_are_read(engine):
+	matchings = {(("source", "a"), ("target", "b")): 0.5, (("source", "a"), ("target", "c")): 1.0}
+	with engine.begin() as connection:
+		connection.execute(text("INSERT INTO record (id, matchings) VALUES (1, :matchings)"), {"matchings": dict_with_tuples_to_json(matchings)})
+	assert read_matchings(engine) == [matchings]
@@ -0,0 +1,82 @@
+import random
+
+import pandas as pd
+import pytest
+
+import quantum_love_original
+from matching_hub.quantum_love import database_side, docplex_quantum_side
+
+def random_matches(rng):
+	# preferences of both directions, independent of each other, with ties and columns without matches
+	sources = [f"s{i}" for i in range(rng.randint(1, 6))]
+	targets = [f"t{j}" for j in range(rng.randint(1, 6))]
+	density = rng.choice([0.3, 0.6, 1.0])
+	levels = rng.choice([1, 2, 3, 10])
+	matches = {}
+	for source in sources:
+		for target in targets:
+			if rng.random() < density:
+				matches[(("source", source), ("target", target))] = rng.randint(1, levels)
+	for target in targets:
+		for source in sources:
+			if rng.random() < density:
+				matches[(("target", target), ("source", source))] = rng.randint(1, levels)
+	return matches, pd.DataFrame(columns=sources), pd.DataFrame(columns=targets)
+
+def random_schema_matches(rng):
+	# matches from several tables with shared column names, names shared by men and women, and mixed int and float values
+	names = ["a", "b", "c", "d", "e"]
+	sources = rng.sample(names, rng.randint(1, 5))
+	targets = rng.sample(names + ["x", "y"], rng.randint(1, 6))
+	matches = {}
+	for _ in range(rng.randint(0, 30)):
+		if rng.random() < 0.5:
+			key = ((rng.choice(["source", "source2"]), rng.choice(sources + ["unknown"])), (rng.choice(["target", "target2"]), rng.choice(targets)))
+		else:
+			key = ((rng.choice(["target", "target2"]), rng.choice(targets)), (rng.choice(["source", "source2"]), rng.choice(sources)))
+		matches[key] = rng.choice([1, 2, 3, 2.0, 0.5])
+	return matches, pd.DataFrame(columns=sources), pd.DataFrame(columns=targets)
+
+def build_model(matches, schema1, schema2):
+	pairs, _, _ = database_side.get_pairs_and_men_and_women_with_preferences(matches, schema1, schema2)
+	return docplex_quantum_side.setup_docplex_model(pairs, None).export_as_lp_string()
+
+@pytest.mark.parametrize("seed", range(3))
+def test_stable_constraint_matches_the_original(seed, monkeypatch):
+	rng = random.Random(seed)
+	instances = [random_matches(rng) for _ in range(100)]
+	models = [build_model(*instance) for instance in instances]
+
+	monkeypatch.setattr(docplex_quantum_side, "compute_stable_constraint", quantum_love_original.compute_stable_constraint)
+	assert [build_model(*instance) for instance in instances] == models
+
+@pytest.mark.parametrize("seed", range(3))
+def test_twice_constraint_matches_the_original(seed, monkeypatch):
+	rng = random.Random(seed)
+	instances = [random_matches(rng) for _ in range(100)]
+	models = [build_model(*instance) for instance in instances]
+
+	monkeypatch.setattr(docplex_quantum_side, "compute_twice_constraint", quantum_love_original.compute_twice_constraint)
+	assert [build_model(*instance) for instance in instances] == models
+
+@pytest.mark.parametrize("seed", range(3))
+def test_preference_assembly_matches_the_original(seed, monkeypatch):
+	rng = random.Random(seed)
+	instances = [random_schema_matches(rng) for _ in range(500)]
+	results = [repr(database_side.get_pairs_and_men_and_women_with_preferences(*instance)) for instance in instances]
+
+	for name in ("add_preferences", "cleanup_preferences", "get_possible_pairs_as_tuples"):
+		monkeypatch.setattr(database_side, name, getattr(quantum_love_original, name))
+	assert [repr(database_side.get_pairs_and_men_and_women_with_preferences(*instance)) for instance in instances] == results
+
+@pytest.mark.parametrize("seed", range(3))
+def test_cleanup_preferences_matches_the_original(seed):
+	rng = random.Random(seed)
+	for _ in range(500):
+		# preference lists as built by `add_preferences`, with duplicates and non-consecutive equal likeliness
+		preferences = [([rng.choice("abcd")], rng.choice([1, 2, 3, 2.0])) for _ in range(rng.randint(0, 8))]
+		person = ("man", [(list(names), value) for names, value in preferences])
+		original_person = ("man", [(list(names), value) for names, value in preferences])
+		database_side.cleanup_preferences(person)
+		quantum_love_original.cleanup_preferences(original_person)
+		assert person == original_person
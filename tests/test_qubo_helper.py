@@ -0,0 +1,135 @@
+import itertools
+import random
+
+import pandas as pd
+import pytest
+from qiskit_optimization import QuadraticProgram
+
+from matching_hub import qubo_helper
+from test_quantum_love import random_matches
+
+def random_qubo(rng, number_of_variables):
+	# small integer coefficients, so that many assignments share the optimal value
+	qubo = QuadraticProgram()
+	for i in range(number_of_variables):
+		qubo.binary_var(f"x{i}")
+	linear = {f"x{i}": rng.choice([-1, 0, 0, 1]) for i in range(number_of_variables)}
+	quadratic = {(f"x{i}", f"x{j}"): rng.choice([-1, 0, 0, 1]) for i, j in itertools.combinations(range(number_of_variables), 2)}
+	qubo.minimize(linear=linear, quadratic=quadratic)
+	return qubo
+
+def smallest_optimal_assignment(qubo):
+	# the smallest integer among optimal assignments, whose bit i is the value of variable i
+	number_of_variables = qubo.get_num_vars()
+	best_value, best_assignment = min(
+		(qubo.objective.evaluate([(assignment >> i) & 1 for i in range(number_of_variables)]), assignment)
+		for assignment in range(2 ** number_of_variables)
+	)
+	return [f"x{i}" for i in range(number_of_variables) if (best_assignment >> i) & 1], best_value
+
+@pytest.mark.parametrize("seed", range(3))
+def test_exact_solver_picks_the_smallest_optimal_assignment(seed, monkeypatch):
+	# small blocks and prefixes, so that most variables are enumerated in Gray code order
+	monkeypatch.setattr(qubo_helper, "exact_solver_block_size", 3)
+	monkeypatch.setattr(qubo_helper, "exact_solver_prefix_size", 2)
+	rng = random.Random(seed)
+	for number_of_variables in range(1, 11):
+		qubo = random_qubo(rng, number_of_variables)
+		active_variables, value, status = qubo_helper.solve_qubo_exactly(qubo)
+		assert (active_variables, value) == smallest_optimal_assignment(qubo)
+		assert status == "optimal"
+
+def test_exact_solver_does_not_depend_on_the_number_of_processes(monkeypatch):
+	monkeypatch.setattr(qubo_helper, "exact_solver_block_size", 3)
+	monkeypatch.setattr(qubo_helper, "exact_solver_prefix_size", 2)
+	qubo = random_qubo(random.Random(0), 10)
+	assert qubo_helper.solve_qubo_exactly(qubo, 2) == qubo_helper.solve_qubo_exactly(qubo)
+
+@pytest.mark.parametrize("mip_gap, expected_status", [(0, "optimal"), (0.9, "feasible")])
+def test_cplex_status_is_optimal_only_without_tolerance(mip_gap, expected_status, monkeypatch):
+	# CPLEX reports an optimum within a loose MIP gap as an optimal solution too, with another status code
+	get_docplex_model = qubo_helper.get_docplex_model
+	def get_tolerant_docplex_model(qubo):
+		docplex_model = get_docplex_model(qubo)
+		docplex_model.context.cplex_parameters.mip.tolerances.mipgap = mip_gap
+		return docplex_model
+	monkeypatch.setattr(qubo_helper, "get_docplex_model", get_tolerant_docplex_model)
+	qubo = random_qubo(random.Random(2), 30)
+	active_variables, value, status = qubo_helper.solve_qubo_with_cplex(qubo, threads=1)
+	assert status == expected_status
+	assert value == qubo.objective.evaluate(qubo_helper.get_qubo_state(qubo, active_variables))
+
+def formulate_arguments(instance):
+	matches, schema1, schema2 = instance
+	return matches, list(schema1.columns), list(schema2.columns)
+
+def formulate_both_ways(matches, schema1, schema2):
+	return [
+		qubo_helper.formulate_as_qubo(*formulate_arguments((matches, schema1, schema2)), backend).export_as_lp_string()
+		for backend in qubo_helper.qubo_backends
+	]
+
+@pytest.mark.parametrize("seed", range(3))
+def test_sparse_qubo_matches_the_docplex_qubo(seed):
+	rng = random.Random(seed)
+	for _ in range(100):
+		sparse_lp, docplex_lp = formulate_both_ways(*random_matches(rng))
+		assert sparse_lp == docplex_lp
+
+@pytest.mark.parametrize("matches", [
+	{},
+	{(("source", "s0"), ("target", "t0")): 1, (("target", "t0"), ("source", "s0")): 1},
+])
+def test_sparse_qubo_matches_the_docplex_qubo_of_trivial_matchings(matches):
+	sparse_lp, docplex_lp = formulate_both_ways(matches, pd.DataFrame(columns=["s0"]), pd.DataFrame(columns=["t0"]))
+	assert sparse_lp == docplex_lp
+
+def test_qubos_are_read_back_from_the_qubo_store(tmp_path):
+	store_path = str(tmp_path / qubo_helper.qubo_store_file_name)
+	rng = random.Random(0)
+	# the first formulation of a random matching with a few pairs
+	minimised = next(filter(
+		lambda qubo: qubo.get_num_vars() >= 4,
+		(qubo_helper.formulate_as_qubo(*formulate_arguments(random_matches(rng))) for _ in range(100))
+	))
+	maximised = random_qubo(random.Random(1), 12)
+	maximised.maximize(constant=2.5, linear=maximised.objective.linear.to_dict(), quadratic={(0, 1): 0.125, (3, 7): -1.5})
+	offsets = [qubo_helper.append_to_qubo_store(store_path, key, qubo) for key, qubo in (("first", minimised), ("second", maximised))]
+	assert offsets[0] == 0 and offsets[1] > 0
+
+	for offset, qubo in zip(offsets, (minimised, maximised)):
+		stored = qubo_helper.read_from_qubo_store(store_path, offset)
+		assert stored.export_as_lp_string() == qubo.export_as_lp_string()
+		assert qubo_helper.compute_qubo_hash(stored) == qubo_helper.compute_qubo_hash(qubo)
+		reference = qubo_helper.qubo_store_reference(qubo_helper.qubo_store_file_name, offset)
+		assert qubo_helper.load_qubo(str(tmp_path), reference).export_as_lp_string() == qubo.export_as_lp_string()
+
+	with pytest.raises(ValueError):
+		qubo_helper.read_from_qubo_store(store_path, offsets[1] - 1)
+
+def optimal_value(qubo):
+	# brute force, independently of the minimisation terms the solvers share
+	values = [qubo.objective.evaluate(list(assignment)) for assignment in itertools.product([0, 1], repeat=qubo.get_num_vars())]
+	return min(values) if qubo.objective.sense == qubo.objective.sense.MINIMIZE else max(values)
+
+def maximised_with_constant(qubo):
+	qubo.maximize(constant=3.5, linear=qubo.objective.linear.to_dict(), quadratic=qubo.objective.quadratic.to_dict())
+	return qubo
+
+@pytest.mark.parametrize("sense", [lambda qubo: qubo, maximised_with_constant])
+@pytest.mark.parametrize("seed", range(3))
+def test_simulated_annealing_finds_the_optimum_of_small_qubos(seed, sense):
+	rng = random.Random(seed)
+	for number_of_variables in range(1, 11):
+		qubo = sense(random_qubo(rng, number_of_variables))
+		active_variables, value, status = qubo_helper.solve_qubo_with_simulated_annealing(qubo, sweeps=200, replicas=16, seed=seed)
+		assert value == optimal_value(qubo)
+		assert value == qubo.objective.evaluate(qubo_helper.get_qubo_state(qubo, active_variables))
+		assert status == "heuristic"
+
+def test_simulated_annealing_is_reproducible_with_a_seed():
+	# too few sweeps to settle on the optimum, so that the result depends on the random numbers
+	qubo = random_qubo(random.Random(0), 60)
+	solutions = [qubo_helper.solve_qubo_with_simulated_annealing(qubo, sweeps=2, replicas=2, seed=seed) for seed in (1, 1, 2)]
+	assert solutions[0] == solutions[1]
+	assert solutions[0] != solutions[2]
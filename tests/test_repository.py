@@ -0,0 +1,120 @@
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from matching_hub.helper import dict_with_tuples_to_json
+from matching_hub.repository import MatchingSession
+
+metrics = {"Precision": 1.0, "Recall": 1.0, "F1Score": 1.0, "PrecisionTop10Percent": 1.0, "RecallAtSizeofGroundTruth": 1.0}
+stats = SimpleNamespace(ground_truth_size=1, source_column_count=2, target_column_count=2, matching_type="Unionable")
+
+def populate_session(session_file, number_of_matchings, tuned=False):
+	session = MatchingSession(str(session_file), None, tuned)
+	session.upload_algorithm("Coma", "{}", False)
+	algorithm = session.get_single_algorithm("Coma", "{}")
+	for k in range(number_of_matchings):
+		session.upload_scenario(f"scenario_{k}", stats, False)
+		matchings = {(("source", f"a{k}"), ("target", f"b{k}")): 0.5}
+		session.upload_matching(algorithm, session.get_scenario(f"scenario_{k}"), matchings, 0.1, metrics, False)
+	return session
+
+def read_hashes(session_file):
+	session = MatchingSession(str(session_file), None)
+	return {matching.id: matching.hash_matchings for matching in session.get_all_matchings(columns=("hash_matchings",))}
+
+@pytest.mark.parametrize("tuned", [False, True])
+def test_batched_pass_commits_while_iterating(tmp_path, tuned):
+	session_file = tmp_path / "matching.mt"
+	session = populate_session(session_file, 45, tuned)
+
+	# commits of the batch happen while chunks of the iteration are still being read
+	with session.batch(size=10):
+		for matching in session.get_all_matchings(columns=("matchings",), batch_size=20):
+			session.upload_matching_hash(matching.id, f"hash_{matching.id}")
+
+	hashes = read_hashes(session_file)
+	assert len(hashes) == 45
+	assert all(hash_value == f"hash_{matching_id}" for matching_id, hash_value in hashes.items())
+
+def test_locked_commit_is_retried_with_pending_changes(tmp_path, monkeypatch):
+	session_file = tmp_path / "matching.mt"
+	session = populate_session(session_file, 5)
+	orm_session = session._MatchingSession__session
+	commit = orm_session.commit
+	failures = []
+
+	def locked_commit():
+		if not failures:
+			failures.append(True)
+			# the changes are flushed before the commit fails, which leaves the session in need of a rollback
+			orm_session.flush()
+			raise OperationalError("COMMIT", {}, Exception("database is locked"))
+		commit()
+
+	monkeypatch.setattr(orm_session, "commit", locked_commit)
+	with session.batch(size=10, delay=0):
+		for matching in session.get_all_matchings(columns=("hash_matchings",)):
+			session.upload_matching_hash(matching.id, "hash")
+
+	assert failures
+	assert set(read_hashes(session_file).values()) == {"hash"}
+
+def test_objects_are_expired_on_commit_outside_chunked_reads(tmp_path):
+	session_file = tmp_path / "matching.mt"
+	session = populate_session(session_file, 15)
+	orm_session = session._MatchingSession__session
+
+	with session.batch(size=5):
+		for matching in session.get_all_matchings(columns=("hash_matchings",), batch_size=10):
+			assert orm_session.expire_on_commit is False
+			session.upload_matching_hash(matching.id, "hash")
+
+	# a reader left before the end restores the setting once it is closed
+	matchings = session.get_all_matchings(columns=("hash_matchings",))
+	next(matchings)
+	matchings.close()
+
+	assert orm_session.expire_on_commit is True
+
+def test_ground_truth_is_deleted_with_its_scenario(tmp_path):
+	session_file = tmp_path / "matching.mt"
+	session = populate_session(session_file, 1)
+	session.upload_scenario("scenario_without_matchings", stats, False)
+	first, second = session.get_scenario("scenario_without_matchings"), session.get_scenario("scenario_0")
+	session.upload_ground_truth(first.id, [("a", "b")])
+	session.upload_ground_truth(second.id, [("a0", "b0")])
+	first_id, second_id = first.id, second.id
+
+	# overridden through the session, and deleted directly in the session file
+	session.upload_scenario("scenario_without_matchings", stats, True)
+	with sqlite3.connect(session_file) as connection:
+		connection.execute("DELETE FROM matching WHERE dataset_id = ?", (second_id,))
+		connection.execute("DELETE FROM dataset WHERE id = ?", (second_id,))
+	connection.close()
+
+	session = MatchingSession(str(session_file), None)
+	assert session.get_ground_truth(first_id) is None
+	assert session.get_ground_truth(second_id) is None
+
+def test_json_encoded_matchings_are_reencoded(tmp_path):
+	session_file = tmp_path / "matching.mt"
+	session = populate_session(session_file, 3)
+	matchings = {matching.id: matching.matchings for matching in session.get_all_matchings(columns=("matchings",))}
+
+	# as stored by former versions
+	with sqlite3.connect(session_file) as connection:
+		for matching_id, value in matchings.items():
+			connection.execute("UPDATE matching SET matchings = ? WHERE id = ?", (dict_with_tuples_to_json(value), matching_id))
+	connection.close()
+
+	session = MatchingSession(str(session_file), None)
+	assert len(list(session.get_all_json_encoded_matchings())) == 3
+	with session.batch():
+		for matching in session.get_all_json_encoded_matchings():
+			session.reencode_matchings(matching.id)
+
+	session = MatchingSession(str(session_file), None)
+	assert list(session.get_all_json_encoded_matchings()) == []
+	assert {matching.id: matching.matchings for matching in session.get_all_matchings(columns=("matchings",))} == matchings
@@ -0,0 +1,101 @@
+import math
+import random
+
+import pytest
+
+from matching_hub.helper import round_dict_values
+from matching_hub.stable_marriage_helper import (
+	build_preference_lists, check_has_ties, check_is_balanced, check_is_complete, check_is_symmetric, compute_features_vectorised,
+	translate_probabilities_to_levels, translate_probabilities_to_levels_vectorised
+)
+
+def original_features(matches, flip_input_matches):
+	pref_of_source, infer_pref_of_target = build_preference_lists(matches)
+	pref_of_target, infer_pref_of_source = build_preference_lists(flip_input_matches)
+	return (
+		check_is_symmetric(pref_of_source, infer_pref_of_source, pref_of_target, infer_pref_of_target),
+		check_is_complete(pref_of_source, pref_of_target),
+		check_has_ties(pref_of_source) or check_has_ties(pref_of_target),
+		check_is_balanced(pref_of_source, pref_of_target)
+	)
+
+def random_matchings(rng):
+	# discretised matchings of both directions, complete or not, with ties, foreign elements and perturbed flipped levels
+	sources, targets = rng.randint(0, 6), rng.randint(0, 6)
+	density = rng.choice([1.0, 0.8, 0.5])
+	tables = ["source", "target"] if rng.random() < 0.8 else ["table", "table"]
+	matches = {}
+	for i in range(sources):
+		for j in range(targets):
+			if rng.random() < density:
+				matches[((tables[0], f"s{i}"), (tables[1], f"t{j}"))] = rng.randint(1, 3)
+	flip_input_matches = {}
+	for (source, target), level in matches.items():
+		if rng.random() < 0.9:
+			flip_input_matches[(target, source)] = level if rng.random() < 0.9 else level + 1
+	if rng.random() < 0.2:
+		flip_input_matches[((tables[1], "foreign"), (tables[0], "s0"))] = 1
+	if rng.random() < 0.3:
+		# the same entries listed in another order
+		items = list(flip_input_matches.items())
+		rng.shuffle(items)
+		flip_input_matches = dict(items)
+	return matches, flip_input_matches
+
+@pytest.mark.parametrize("seed", range(5))
+def test_vectorised_features_match_the_original_checks(seed):
+	rng = random.Random(seed)
+	for _ in range(200):
+		matches, flip_input_matches = random_matchings(rng)
+		assert compute_features_vectorised(matches, flip_input_matches) == tuple(map(bool, original_features(matches, flip_input_matches)))
+
+def test_vectorised_features_of_symmetric_complete_matchings():
+	matches = {(("source", f"s{i}"), ("target", f"t{j}")): (i + j) % 3 + 1 for i in range(4) for j in range(4)}
+	flip_input_matches = {(target, source): level for (source, target), level in matches.items()}
+	assert compute_features_vectorised(matches, flip_input_matches) == (True, True, True, True)
+	assert compute_features_vectorised({}, {}) == tuple(map(bool, original_features({}, {})))
+
+def original_levels(prob_dict, precision):
+	# without a precision, probabilities are not rounded, whereas round_dict_values would round them to integers
+	return translate_probabilities_to_levels(prob_dict if precision is None else round_dict_values(prob_dict, precision))
+
+def random_probabilities(rng):
+	# probabilities with ties, values at a half of the last digit kept by rounding, and rows whose keys are interleaved
+	values = [
+		lambda: rng.random(),
+		lambda: rng.randint(0, 8) / 8,
+		lambda: rng.randint(0, 200) * 0.005,
+		lambda: rng.randint(0, 2000) * 0.0005 + 0.00005,
+		lambda: rng.choice([0.125, 0.375, 0.005, 0.015, 0.025, 0.0045, 2.675, 1e17 + 0.5, -0.125, 0.0]),
+	]
+	rows = [f"s{i}" for i in range(rng.randint(1, 4))]
+	columns = [f"t{j}" for j in range(rng.randint(1, 6))]
+	keys = [(("source", row), ("target", column)) for row in rows for column in columns]
+	rng.shuffle(keys)
+	return {key: rng.choice(values)() for key in keys}
+
+@pytest.mark.parametrize("precision", [None, 1, 2, 3])
+@pytest.mark.parametrize("seed", range(3))
+def test_vectorised_levels_match_the_original_levels(seed, precision):
+	rng = random.Random(seed)
+	for _ in range(300):
+		prob_dict = random_probabilities(rng)
+		expected = original_levels(prob_dict, precision)
+		levels = translate_probabilities_to_levels_vectorised(prob_dict, precision)
+		assert levels == expected
+		assert list(levels.items()) == list(expected.items())
+
+@pytest.mark.parametrize("precision", [None, 1, 2, 3])
+@pytest.mark.parametrize("prob_dict", [
+	{},
+	# exact ties in rows whose keys are not contiguous
+	{(("source", "b"), ("target", "x")): 0.5, (("source", "a"), ("target", "x")): 0.5, (("source", "b"), ("target", "y")): 0.5, (("source", "a"), ("target", "y")): 0.25},
+	# values at a half, which python rounds by their exact decimal value
+	{(("source", "a"), ("target", t)): v for t, v in zip("uvwxyz", [0.125, 0.12, 0.13, 0.005, 0.015, 0.0149])},
+	{(("source", "a"), ("target", "x")): math.nan, (("source", "b"), ("target", "x")): 0.3, (("source", "a"), ("target", "y")): 0.2},
+])
+def test_vectorised_levels_of_edge_cases(prob_dict, precision):
+	expected = original_levels(prob_dict, precision)
+	levels = translate_probabilities_to_levels_vectorised(prob_dict, precision)
+	assert levels == expected
+	assert list(levels.items()) == list(expected.items())